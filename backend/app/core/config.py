@@ -4,11 +4,89 @@ import os
 # --- AUDIO CONSTANTS ---
 SAMPLE_RATE = 24000
 CHUNK_SIZE = 1920  # Audio chunk size in frames (Must be multiple of 1920 for Mimi)
+NUM_CODEBOOKS = 8  # Mimi codebooks per 80 ms frame consumed/produced by the LM
 
 # --- MODEL SETTINGS ---
-MODEL_TYPE = "nvidia/personaplex-7b-v1"
+MODEL_TYPE = "nvidia/personaplex-7b-v1"  # Default model variant
+MODEL_VARIANTS = os.getenv("MODEL_VARIANTS", "nvidia/personaplex-7b-v1,kyutai/moshiko-pytorch-bf16").split(",")
+MODEL_MEMORY_BUDGET_GB = float(os.getenv("MODEL_MEMORY_BUDGET_GB", "40"))  # Resident model weights budget
 DEVICE = os.getenv("DEVICE", "cuda")  # or "cpu"
+ENGINE_BACKEND = os.getenv("ENGINE_BACKEND", "personaplex")  # "personaplex", "standin" or "mock"
+
+# --- LAYER STREAMING (low-RAM hosts) ---
+LAYER_STREAMING = os.getenv("LAYER_STREAMING", "0") == "1"  # Stream transformer layers from a memory-mapped file
+LAYER_STREAM_WINDOW = int(os.getenv("LAYER_STREAM_WINDOW", "4"))  # Layers resident at once: the running one plus those prefetched (>= 2)
+LAYER_STREAM_DIR = os.getenv("LAYER_STREAM_DIR", os.path.expanduser("~/.cache/personaplex/layer-stream"))
+
+# --- STAND-IN ENGINE (GPU-free load testing) ---
+STANDIN_COMPUTE_MS = float(os.getenv("STANDIN_COMPUTE_MS", "40"))  # Per-frame compute at batch size 1
+STANDIN_COMPUTE_MODE = os.getenv("STANDIN_COMPUTE_MODE", "sleep")  # "sleep" or "burn" (real CPU)
+STANDIN_DELAY_FRAMES = int(os.getenv("STANDIN_DELAY_FRAMES", "2"))  # Initial None steps
+STANDIN_OUTPUT = os.getenv("STANDIN_OUTPUT", "echo")  # "echo" (delayed input) or "tone"
+STANDIN_BATCH_SCALING = os.getenv("STANDIN_BATCH_SCALING", "1:1.0")  # "batch:factor,..." cost curve
+STANDIN_SEED = int(os.getenv("STANDIN_SEED", "0"))
+STANDIN_MODEL_MB = float(os.getenv("STANDIN_MODEL_MB", "1024"))  # Simulated model footprint
+STANDIN_DECODE_SHARE = float(os.getenv("STANDIN_DECODE_SHARE", "0.3"))  # Share of frame cost scaling with decoded codebooks
+STANDIN_VOICE_PROMPT_STEPS = int(os.getenv("STANDIN_VOICE_PROMPT_STEPS", "25"))  # Prefill steps of a voice prompt (plus one per persona word)
+
+# --- QUALITY LADDER ---
+QUALITY_LADDER = [int(n) for n in os.getenv("QUALITY_LADDER", "8,6,4").split(",")]  # Decoded codebooks per rung
+QUALITY_MODE = os.getenv("QUALITY_MODE", "both")  # "both", "node", "session" or "off"
+QUALITY_STEP_DOWN_RTF = float(os.getenv("QUALITY_STEP_DOWN_RTF", "0.9"))  # Step down at this real-time factor
+QUALITY_STEP_UP_RTF = float(os.getenv("QUALITY_STEP_UP_RTF", "0.7"))  # Step back up below this one
+QUALITY_HOLD_SECONDS = float(os.getenv("QUALITY_HOLD_SECONDS", "3"))  # Minimum time on a rung
+QUALITY_WINDOW_SECONDS = float(os.getenv("QUALITY_WINDOW_SECONDS", "1"))  # RTF measurement window
+
+# --- CODEC SERVICE ---
+SERVICE_MODE = os.getenv("SERVICE_MODE", "full")  # "full" (LM + codec) or "codec" (Mimi only, no LM)
+CODEC_BACKEND = os.getenv("CODEC_BACKEND", "mimi")  # "mimi" or "tiny" (seeded CPU test model)
+CODEC_DEVICE = os.getenv("CODEC_DEVICE", DEVICE)
+CODEC_MAX_BATCH = int(os.getenv("CODEC_MAX_BATCH", "16"))  # Items per forward pass
+CODEC_MAX_BATCH_SECONDS = float(os.getenv("CODEC_MAX_BATCH_SECONDS", "600"))  # Padded audio per forward pass
 
 # --- HUGGINGFACE SETTINGS ---
 HF_TOKEN = os.getenv("HF_TOKEN", None)  # Required for PersonaPlex model access
 
+# --- VOICE STORE ---
+VOICE_STORE_DIR = os.getenv("VOICE_STORE_DIR", os.path.expanduser("~/.cache/personaplex/voice-store"))
+VOICE_CACHE_SIZE = int(os.getenv("VOICE_CACHE_SIZE", "64"))  # Device-resident voice embeddings (LRU)
+
+# --- SESSIONS ---
+SESSION_RESUME_TTL = float(os.getenv("SESSION_RESUME_TTL", "30"))  # Seconds a dropped session stays resumable
+SESSION_CHECKPOINT_BUDGET_MB = float(os.getenv("SESSION_CHECKPOINT_BUDGET_MB", "4096"))  # Host RAM for swapped-out session checkpoints
+SESSION_SWAP_DIR = os.getenv("SESSION_SWAP_DIR", None)  # Spill checkpoints past the budget to disk (else drop parked sessions)
+SESSION_IDLE_SECONDS = float(os.getenv("SESSION_IDLE_SECONDS", "2"))  # Silence after which a connected session gives up the engine slot
+
+# --- HOT SWAP ---
+DRAIN_TIMEOUT = float(os.getenv("DRAIN_TIMEOUT", "600"))  # Seconds old replicas keep serving live sessions
+
+# --- LOAD REPORTING / GATEWAY ---
+NODE_MAX_SESSIONS = int(os.getenv("NODE_MAX_SESSIONS", "0"))  # Session cap overriding the measured capacity (0 = measured)
+GATEWAY_NODES = [n for n in os.getenv("GATEWAY_NODES", "http://localhost:8000").split(",") if n]
+GATEWAY_POLL_INTERVAL = float(os.getenv("GATEWAY_POLL_INTERVAL", "2"))  # Seconds between node polls
+GATEWAY_NODE_TIMEOUT = float(os.getenv("GATEWAY_NODE_TIMEOUT", "1"))  # Poll timeout before a node counts as down
+
+# --- PRIORITY TIERS ---
+PRIORITY_TIERS = os.getenv("PRIORITY_TIERS", "premium:80,standard:160,internal:400")  # tier:frame deadline ms, highest first
+DEFAULT_PRIORITY = os.getenv("DEFAULT_PRIORITY", "standard")  # Tier for sessions that do not ask for one
+
+# --- CAPACITY / ADMISSION ---
+CAPACITY_HEADROOM = float(os.getenv("CAPACITY_HEADROOM", "0.8"))  # Share of each 80 ms frame budget admission may fill
+CAPACITY_CALIBRATION_FRAMES = int(os.getenv("CAPACITY_CALIBRATION_FRAMES", "8"))  # Timed steps per batch size at warmup
+ADMISSION_QUEUE_MAX = int(os.getenv("ADMISSION_QUEUE_MAX", "16"))  # Callers waiting for a slot before rejecting
+ADMISSION_QUEUE_TIMEOUT = float(os.getenv("ADMISSION_QUEUE_TIMEOUT", "120"))  # Max seconds a caller waits in the queue
+ADMISSION_SESSION_SECONDS = float(os.getenv("ADMISSION_SESSION_SECONDS", "300"))  # Initial mean call length for wait estimates
+
+# --- PROMPT PREFILL ---
+PREFILL_BATCH_WINDOW_MS = float(os.getenv("PREFILL_BATCH_WINDOW_MS", "50"))  # Collect session configs this long, then prefill them together (0 = one by one)
+PREFILL_BATCH_MAX = int(os.getenv("PREFILL_BATCH_MAX", "16"))  # Sessions per batched prefill
+
+# --- SESSION LOG ---
+SESSION_LOG_DIR = os.getenv("SESSION_LOG_DIR", os.path.expanduser("~/.cache/personaplex/session-log"))  # "" disables
+SESSION_LOG_ROTATE_MB = float(os.getenv("SESSION_LOG_ROTATE_MB", "64"))  # Start a new file past this size
+SESSION_LOG_KEEP = int(os.getenv("SESSION_LOG_KEEP", "30"))  # Rotated files kept (oldest deleted first)
+
+# --- PROFILING ---
+PROFILE_DIR = os.getenv("PROFILE_DIR", "/tmp/personaplex-profiles")
+PROFILE_MAX_SECONDS = 120.0  # Hard cap on a single on-demand capture
+PROFILE_SAMPLE_INTERVAL = 0.005  # Python stack sampler period (seconds)
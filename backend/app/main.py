@@ -3,7 +3,7 @@ import logging
 import uvicorn
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from backend.app.routers import websocket, admin
+from backend.app.core.config import SERVICE_MODE
 
 # Configure Logging
 logging.basicConfig(level=logging.INFO)
@@ -20,8 +20,15 @@ app.add_middleware(
 )
 
 # Include Routers
-app.include_router(websocket.router)
-app.include_router(admin.router)
+if SERVICE_MODE == "codec":
+    # Codec-only node: never import the engine, so the LM is not loaded
+    from backend.app.routers import codec
+    app.include_router(codec.router)
+else:
+    from backend.app.routers import websocket, admin, codec
+    app.include_router(websocket.router)
+    app.include_router(admin.router)
+    app.include_router(codec.router)
 
 if __name__ == "__main__":
     # HOSTING NOTE:
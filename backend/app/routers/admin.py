@@ -2,14 +2,30 @@
 API router for administrative tasks like generating voice samples.
 """
 
+import asyncio
+import io
 import os
+import re
 import wave
 import logging
+from functools import partial
 from pathlib import Path
-from fastapi import APIRouter, HTTPException, BackgroundTasks
-from pydantic import BaseModel
+from fastapi import APIRouter, HTTPException, BackgroundTasks, Request
+from fastapi.responses import FileResponse
+from pydantic import BaseModel, Field
 
-from backend.app.services.engine import engine, PERSONAPLEX_VOICES
+from backend.app.core.config import ENGINE_BACKEND, DRAIN_TIMEOUT, SAMPLE_RATE, CHUNK_SIZE
+from backend.app.services.admission import admission
+from backend.app.services.engine import PERSONAPLEX_VOICES
+from backend.app.services.prefill import prefill
+from backend.app.services.profiler import profiler
+from backend.app.services.quality import quality
+from backend.app.services.replicas import replicas
+from backend.app.services.residency import residency
+from backend.app.services.runtime import runtime
+from backend.app.services.scheduler import scheduler
+from backend.app.services.session_log import session_log
+from backend.app.services.telemetry import telemetry
 
 logger = logging.getLogger("PersonaPlex-Admin")
 
@@ -24,6 +40,38 @@ class GenerateSamplesResponse(BaseModel):
     voices_generated: list[str] = []
 
 
+class EnrollVoiceResponse(BaseModel):
+    name: str
+    digest: str
+    source: str
+
+
+VOICE_NAME_PATTERN = re.compile(r"^[A-Za-z0-9_-]{1,64}$")
+
+
+class ReloadRequest(BaseModel):
+    variant: str | None = None  # Resident model variant to reload (default: the pinned default model)
+    backend: str = ENGINE_BACKEND
+    model_id: str | None = None
+    voice_prompt_dir: str | None = None
+    drain_timeout: float = DRAIN_TIMEOUT
+
+
+class FrameLatencyReport(BaseModel):
+    """Per-frame latency samples (ms) a client measured from the frame header since its last report."""
+    rtt_ms: list[float] = Field([], alias="rttMs", max_length=1000)
+    network_ms: list[float] = Field([], alias="networkMs", max_length=1000)
+    server_ms: list[float] = Field([], alias="serverMs", max_length=1000)
+    compute_ms: list[float] = Field([], alias="computeMs", max_length=1000)
+    playout_ms: list[float] = Field([], alias="playoutMs", max_length=1000)
+    end_to_end_ms: list[float] = Field([], alias="endToEndMs", max_length=1000)
+
+
+class ProfileRequest(BaseModel):
+    seconds: float | None = None
+    frames: int | None = None
+
+
 def save_audio_to_wav(audio_bytes: bytes, output_path: Path, sample_rate: int = 24000):
     """Save raw float32 audio bytes to a WAV file."""
     import numpy as np
@@ -42,6 +90,51 @@ def save_audio_to_wav(audio_bytes: bytes, output_path: Path, sample_rate: int =
         wav_file.writeframes(audio_int16.tobytes())
 
 
+def _admin_tier() -> str:
+    """Admin engine jobs run in the lowest priority tier."""
+    return next(reversed(scheduler.tiers))
+
+
+def _generate_sample(replica, voice_id: str) -> bytes:
+    """Speak a sample with `voice_id` (runs on the engine thread, see scheduler.run)."""
+    import numpy as np
+    
+    engine = replica.engine
+    # Keep the live session's state safe while we drive the engine directly
+    replica.sessions.release_slot()
+    engine.reset()
+    
+    # Configure with this voice - try to get exact phrase
+    engine.configure(
+        persona="You are demonstrating your voice. When asked, repeat EXACTLY: 'The quick brown fox jumps over the lazy dog.' Say nothing else, just that sentence.",
+        voice_id=voice_id
+    )
+    
+    # Feed ~3 seconds of silence to prompt the AI to speak its greeting
+    duration = 3.0  # seconds
+    silence = np.zeros(int(SAMPLE_RATE * duration), dtype=np.float32)
+    
+    output_audio = b""
+    for i in range(0, len(silence), CHUNK_SIZE):
+        chunk = silence[i:i+CHUNK_SIZE]
+        if len(chunk) < CHUNK_SIZE:
+            chunk = np.pad(chunk, (0, CHUNK_SIZE - len(chunk)))
+        
+        result = engine.process_audio_frame(chunk.tobytes())
+        if result:
+            output_audio += result
+    
+    # Leave a clean engine behind; the next session swaps its own state in
+    engine.reset()
+    return output_audio
+
+
+def _enroll_voice(replica, name: str, wav_bytes: bytes) -> dict:
+    """Enroll a voice on the engine thread (the prompt encoding drives the live model)."""
+    replica.sessions.release_slot()
+    return replica.engine.wrapper.enroll_voice(name, wav_bytes)
+
+
 @router.post("/generate-voice-samples", response_model=GenerateSamplesResponse)
 async def generate_voice_samples():
     """
@@ -51,7 +144,8 @@ async def generate_voice_samples():
     The samples are generated by having the AI speak a greeting phrase
     with each voice profile.
     """
-    if engine.is_mock:
+    engine = replicas.active.engine
+    if engine.backend != "personaplex":
         raise HTTPException(
             status_code=503,
             detail="PersonaPlex engine not loaded. Cannot generate real voice samples."
@@ -69,46 +163,18 @@ async def generate_voice_samples():
     generated = []
     errors = []
     
-    # Sample greeting - short and clear
-    # We'll generate by simulating a conversation start
-    
     for voice_id in PERSONAPLEX_VOICES:
         try:
             logger.info(f"Generating sample for voice: {voice_id}")
             
-            # Reset engine state
-            engine.reset()
-            
-            # Configure with this voice - try to get exact phrase
-            engine.configure(
-                persona="You are demonstrating your voice. When asked, repeat EXACTLY: 'The quick brown fox jumps over the lazy dog.' Say nothing else, just that sentence.",
-                voice_id=voice_id
+            # One engine-thread job per voice, so live sessions keep stepping between voices
+            output_audio, _, _ = await scheduler.run(
+                _admin_tier(), partial(_generate_sample, replicas.active, voice_id), frame=False
             )
             
-            # Generate ~3 seconds of audio by processing silence
-            # This prompts the AI to speak its greeting
-            import numpy as np
-            
-            sample_rate = 24000
-            duration = 3.0  # seconds
-            chunk_size = 1920
-            
-            # Feed silence to prompt the AI to speak
-            silence = np.zeros(int(sample_rate * duration), dtype=np.float32)
-            
-            output_audio = b""
-            for i in range(0, len(silence), chunk_size):
-                chunk = silence[i:i+chunk_size]
-                if len(chunk) < chunk_size:
-                    chunk = np.pad(chunk, (0, chunk_size - len(chunk)))
-                
-                result = engine.process_audio_frame(chunk.tobytes())
-                if result:
-                    output_audio += result
-            
             if len(output_audio) > 0:
                 output_path = SAMPLES_DIR / f"{voice_id}.wav"
-                save_audio_to_wav(output_audio, output_path, sample_rate)
+                save_audio_to_wav(output_audio, output_path, SAMPLE_RATE)
                 generated.append(voice_id)
                 logger.info(f"✓ Generated: {output_path}")
             else:
@@ -119,9 +185,6 @@ async def generate_voice_samples():
             errors.append(f"{voice_id}: {str(e)}")
             logger.error(f"Error generating {voice_id}: {e}")
     
-    # Reset engine after all generation
-    engine.reset()
-    
     if errors:
         return GenerateSamplesResponse(
             status="partial",
@@ -139,8 +202,299 @@ async def generate_voice_samples():
 @router.get("/health")
 async def health_check():
     """Check if the engine is loaded and ready."""
+    engine = replicas.active.engine
     return {
         "status": "ok",
         "engine_loaded": not engine.is_mock,
+        "backend": engine.backend,
         "wrapper_ready": engine.wrapper is not None
     }
+
+
+@router.get("/load")
+async def node_load():
+    """Readiness and load of this node, polled by the gateway (backend/gateway)."""
+    engine = replicas.active.engine
+    loading = any(
+        m.state == "loading" or (m.manager and m.manager.loading and m.manager.loading["status"] == "loading")
+        for m in residency.models.values()
+    )
+    return {
+        "ready": engine.backend == ENGINE_BACKEND,
+        "backend": engine.backend,
+        "loading": loading,
+        "sessions": sum(m.manager.connections for m in residency.resident()),
+        "max_sessions": admission.capacity,
+        "queued": admission.queued,
+    }
+
+
+@router.get("/capacity")
+async def capacity_status():
+    """
+    Measured capacity profile (per batch size), the admission limit derived
+    from it, admitted sessions, queue depth and admission counters.
+    """
+    return admission.stats()
+
+
+def _require_voice_store():
+    engine = replicas.active.engine
+    if engine.wrapper is None or engine.wrapper.voice_store is None:
+        raise HTTPException(
+            status_code=503,
+            detail="PersonaPlex engine not loaded. Voice store unavailable."
+        )
+    return engine.wrapper.voice_store
+
+
+@router.get("/voices")
+async def list_voices():
+    """List built-in and enrolled voices plus voice-store cache statistics."""
+    store = _require_voice_store()
+    return {
+        "builtin": PERSONAPLEX_VOICES,
+        "stored": store.list(),
+        "cache": store.stats(),
+    }
+
+
+@router.post("/voices/{name}", response_model=EnrollVoiceResponse)
+async def enroll_voice(name: str, request: Request):
+    """
+    Enroll a custom voice from a reference WAV sent as the raw request body:
+
+        curl -X POST .../api/admin/voices/alice --data-binary @alice.wav
+    
+    The embedding is computed once and stored by content hash.
+    """
+    _require_voice_store()
+    if not VOICE_NAME_PATTERN.match(name) or name in PERSONAPLEX_VOICES:
+        raise HTTPException(status_code=400, detail=f"Invalid or reserved voice name: {name}")
+    
+    wav_bytes = await request.body()
+    try:
+        with wave.open(io.BytesIO(wav_bytes)) as wav_file:
+            if wav_file.getnframes() == 0:
+                raise HTTPException(status_code=400, detail="Reference WAV is empty.")
+    except (wave.Error, EOFError) as e:
+        raise HTTPException(status_code=400, detail=f"Invalid WAV file: {e}")
+    
+    try:
+        entry, _, _ = await scheduler.run(
+            _admin_tier(), partial(_enroll_voice, replicas.active, name, wav_bytes), frame=False
+        )
+    except Exception as e:
+        logger.error(f"Voice enrollment failed for {name}: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail=f"Voice enrollment failed: {e}")
+    
+    logger.info(f"Enrolled voice {name} ({entry['digest'][:12]})")
+    return EnrollVoiceResponse(name=name, digest=entry["digest"], source=entry["source"])
+
+
+@router.delete("/voices/{name}")
+async def delete_voice(name: str):
+    """Remove an enrolled voice from the index."""
+    store = _require_voice_store()
+    if name not in store or name in PERSONAPLEX_VOICES:
+        raise HTTPException(status_code=404, detail=f"Unknown enrolled voice: {name}")
+    store.remove(name)
+    return {"status": "ok", "name": name}
+
+
+@router.get("/latency")
+async def latency_stats():
+    """Aggregated client playout latency, jitter and underruns across sessions."""
+    return telemetry.snapshot()
+
+
+@router.post("/latency/frames", status_code=204)
+async def report_frame_latency(report: FrameLatencyReport):
+    """
+    Client-side per-frame latency breakdown (network vs. compute vs. playout),
+    measured with the negotiated frame header. Feeds the fleet percentiles in GET /latency.
+    """
+    for metric in ("rtt_ms", "network_ms", "server_ms", "compute_ms", "playout_ms", "end_to_end_ms"):
+        for value in getattr(report, metric):
+            telemetry.record(f"client_frame_{metric}", value)
+
+
+@router.get("/quality")
+async def quality_stats():
+    """
+    Adaptive quality ladder: node RTF and rung, measured cost per rung for
+    each resident model, and per session the time and frames at each rung
+    plus the compute saved.
+    """
+    return {
+        **quality.stats(),
+        "frame_ms": {
+            m.model_id: m.manager.active.engine.rung_costs.describe(quality.levels)
+            for m in residency.resident()
+        },
+    }
+
+
+@router.get("/scheduler")
+async def scheduler_status():
+    """
+    Priority tiers with their frame deadlines, frames, deadline misses and
+    pending jobs (queue-wait and lateness percentiles are in /latency).
+    """
+    return scheduler.status()
+
+
+@router.get("/prefill")
+async def prefill_stats():
+    """
+    Batched prompt prefill: window, configs seen and engine jobs per batch
+    size (config-to-prefilled and job time percentiles are in /latency).
+    """
+    return prefill.stats()
+
+
+@router.get("/layers")
+async def layer_streaming_stats():
+    """Layer streaming (LAYER_STREAMING=1): resident window, prefetch hit rate, page faults and step time."""
+    streamer = getattr(replicas.active.engine.wrapper, "layer_streamer", None)
+    if streamer is None:
+        raise HTTPException(status_code=404, detail="Layer streaming is not enabled.")
+    return streamer.stats()
+
+
+@router.get("/runtime")
+async def runtime_stats():
+    """
+    Process gauges for soak testing and leak hunting: RSS, device memory, open
+    fds, threads, tasks, GC objects, event-loop lag (max since the previous
+    call) and the size of per-engine session state.
+    """
+    runtime.ensure_started()
+    return await runtime.snapshot()
+
+
+@router.get("/session-log")
+async def session_log_summary(since: float | None = None, until: float | None = None,
+                              bucket: float = 3600, by: str | None = None):
+    """
+    Ended sessions aggregated over time: `since`/`until` in unix seconds
+    (default: the last 24 hours), `bucket` seconds per row, optionally
+    grouped `by` voice, persona, tier or model. Per bucket: sessions,
+    duration, frames, deadline misses, bytes in/out, prefill time, per-stage
+    latency percentiles and peak memory.
+    """
+    if not session_log.enabled:
+        raise HTTPException(status_code=404, detail="Session log is disabled (SESSION_LOG_DIR is empty).")
+    loop = asyncio.get_running_loop()
+    try:
+        result = await loop.run_in_executor(None, session_log.aggregate, since, until, bucket, by)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {**result, "log": session_log.stats()}
+
+
+@router.get("/sessions")
+async def session_stats():
+    """Connected/parked sessions and state swap counts (swap latency is in /latency)."""
+    return {
+        m.model_id: {r.generation: r.sessions.stats() for r in m.manager.replicas}
+        for m in residency.resident()
+    }
+
+
+@router.post("/reload", status_code=202)
+async def reload_engine(request: ReloadRequest):
+    """
+    Hot-swap the model checkpoint and/or voice pack with zero downtime.
+    The new replica loads in the background; once ready it takes all new
+    sessions while the old one drains (see GET /replicas for progress).
+    """
+    manager = replicas
+    if request.variant is not None:
+        try:
+            if not residency.is_resident(request.variant):
+                raise HTTPException(status_code=409, detail=f"Model '{request.variant}' is not resident")
+        except KeyError as e:
+            raise HTTPException(status_code=404, detail=e.args[0])
+        manager = residency.models[request.variant].manager
+    try:
+        return await manager.reload(
+            backend=request.backend,
+            model_id=request.model_id,
+            voice_prompt_dir=request.voice_prompt_dir,
+            drain_timeout=request.drain_timeout,
+        )
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+
+@router.get("/replicas")
+async def replica_status():
+    """Loaded replicas, their session counts and drain progress."""
+    return replicas.status()
+
+
+@router.get("/models")
+async def model_residency():
+    """Model variants with residency state, load/evict counts and residency time."""
+    return residency.stats()
+
+
+@router.post("/models/{variant:path}/load", status_code=202)
+async def load_model(variant: str):
+    """Preload a model variant (evicting idle ones if the memory budget requires it)."""
+    if variant not in residency.models:
+        raise HTTPException(status_code=404, detail=f"Unknown model variant: {variant}")
+    try:
+        await residency.acquire(variant)
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return residency.models[variant].describe()
+
+
+@router.delete("/models/{variant:path}")
+async def evict_model(variant: str):
+    """Evict an idle, unpinned model variant to free its memory."""
+    if variant not in residency.models:
+        raise HTTPException(status_code=404, detail=f"Unknown model variant: {variant}")
+    try:
+        residency.evict(variant)
+    except ValueError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    return residency.models[variant].describe()
+
+
+@router.post("/profiler")
+async def start_profile(request: ProfileRequest):
+    """
+    Arm an on-demand profiler capture of the live serving loop.
+    The capture disarms itself after `seconds` or `frames`, whichever comes first.
+    """
+    if (request.seconds is not None and request.seconds <= 0) or (request.frames is not None and request.frames <= 0):
+        raise HTTPException(status_code=400, detail="seconds and frames must be positive.")
+    try:
+        return await profiler.arm(seconds=request.seconds, frames=request.frames)
+    except RuntimeError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+
+@router.get("/profiler")
+async def profile_status():
+    """List the current and past profiler captures."""
+    return profiler.status()
+
+
+@router.delete("/profiler")
+async def stop_profile():
+    """Stop the running capture early; artifacts are still written."""
+    profiler.disarm("manual")
+    return profiler.status()
+
+
+@router.get("/profiler/{capture_id}/{artifact}")
+async def download_profile(capture_id: str, artifact: str):
+    """Download a capture artifact: `trace` (Chrome trace) or `stacks` (collapsed stacks)."""
+    path = profiler.artifact_path(capture_id, artifact)
+    if path is None:
+        raise HTTPException(status_code=404, detail="Capture artifact not found or not ready.")
+    return FileResponse(path, filename=f"{capture_id}-{path.name}")
@@ -0,0 +1,144 @@
+"""
+API router for the standalone Mimi codec (no LM).
+
+Requests carry many independent items; results stream back as NDJSON, one
+line per item as its batch completes (in completion order, matched by `id`),
+followed by a summary line with the request's throughput.
+"""
+
+import base64
+import io
+import json
+import logging
+import time
+import wave
+from typing import Literal
+
+import numpy as np
+from fastapi import APIRouter, HTTPException
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel
+
+from backend.app.core.config import NUM_CODEBOOKS, SAMPLE_RATE
+from backend.app.services.codec import get_codec
+
+logger = logging.getLogger("PersonaPlex-CodecAPI")
+
+router = APIRouter(prefix="/api/codec", tags=["codec"])
+
+
+class EncodeItem(BaseModel):
+    id: str
+    audio: str  # base64
+    format: Literal["wav", "f32"] = "wav"  # 24 kHz mono WAV, or raw float32 PCM
+
+
+class EncodeRequest(BaseModel):
+    items: list[EncodeItem]
+
+
+class DecodeItem(BaseModel):
+    id: str
+    codes: list[list[int]]  # [codebooks][frames]
+
+
+class DecodeRequest(BaseModel):
+    items: list[DecodeItem]
+    format: Literal["wav", "f32"] = "f32"
+
+
+def _read_audio(item: EncodeItem) -> np.ndarray:
+    data = base64.b64decode(item.audio)
+    if item.format == "f32":
+        return np.frombuffer(data, dtype=np.float32)
+    with wave.open(io.BytesIO(data)) as wav_file:
+        if wav_file.getframerate() != SAMPLE_RATE or wav_file.getnchannels() != 1 or wav_file.getsampwidth() != 2:
+            raise ValueError(f"expected 16-bit mono {SAMPLE_RATE} Hz WAV")
+        frames = wav_file.readframes(wav_file.getnframes())
+    return np.frombuffer(frames, dtype=np.int16).astype(np.float32) / 32768.0
+
+
+def _write_audio(pcm: np.ndarray, fmt: str) -> str:
+    if fmt == "f32":
+        return base64.b64encode(pcm.astype(np.float32).tobytes()).decode()
+    buffer = io.BytesIO()
+    with wave.open(buffer, "w") as wav_file:
+        wav_file.setnchannels(1)
+        wav_file.setsampwidth(2)
+        wav_file.setframerate(SAMPLE_RATE)
+        wav_file.writeframes((np.clip(pcm, -1.0, 1.0) * 32767).astype(np.int16).tobytes())
+    return base64.b64encode(buffer.getvalue()).decode()
+
+
+def _summary(start: float, items: int, audio_seconds: float) -> str:
+    elapsed = time.perf_counter() - start
+    return json.dumps({
+        "type": "summary",
+        "items": items,
+        "audio_seconds": round(audio_seconds, 3),
+        "wall_seconds": round(elapsed, 3),
+        "audio_hours_per_hour": round(audio_seconds / elapsed, 2) if elapsed else None,
+    }) + "\n"
+
+
+@router.post("/encode")
+def encode(request: EncodeRequest):
+    """Tokenize audio items into Mimi codes ([codebooks][frames] per item), streamed as NDJSON."""
+    try:
+        audio = [_read_audio(item) for item in request.items]
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"Invalid audio: {e}")
+    codec = get_codec()
+
+    def stream():
+        start = time.perf_counter()
+        for index, codes in codec.iter_encode(audio):
+            yield json.dumps({"id": request.items[index].id, "frames": codes.shape[-1], "codes": codes.tolist()}) + "\n"
+        yield _summary(start, len(audio), sum(len(a) for a in audio) / SAMPLE_RATE)
+
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
+
+
+@router.post("/decode")
+def decode(request: DecodeRequest):
+    """Decode Mimi code arrays back to audio (base64 WAV or float32 PCM), streamed as NDJSON."""
+    # Validated before the 200 is sent: errors inside the NDJSON stream would only cut it short
+    codes = []
+    for item in request.items:
+        try:
+            item_codes = np.asarray(item.codes, dtype=np.int64)
+        except ValueError:
+            item_codes = None  # Ragged rows
+        shape = item_codes.shape if item_codes is not None else ()
+        if len(shape) != 2 or shape[0] != NUM_CODEBOOKS or shape[1] == 0:
+            raise HTTPException(
+                status_code=422,
+                detail=f"Item '{item.id}': codes must be shaped [{NUM_CODEBOOKS} codebooks][frames > 0]",
+            )
+        codes.append(item_codes)
+    codec = get_codec()
+    for item, item_codes in zip(request.items, codes):
+        # Out-of-range codes would index past the codebook embeddings mid-stream
+        if item_codes.min() < 0 or item_codes.max() >= codec.cardinality:
+            raise HTTPException(
+                status_code=422,
+                detail=f"Item '{item.id}': codes must be in [0, {codec.cardinality})",
+            )
+
+    def stream():
+        start = time.perf_counter()
+        frames = 0
+        for index, pcm in codec.iter_decode(codes):
+            frames += codes[index].shape[-1]
+            yield json.dumps({"id": request.items[index].id, "samples": len(pcm), "audio": _write_audio(pcm, request.format)}) + "\n"
+        yield _summary(start, len(codes), frames * codec.frame_size / SAMPLE_RATE)
+
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
+
+
+@router.get("/stats")
+def codec_stats():
+    """Codec backend and cumulative encode/decode throughput (audio-hours per hour)."""
+    codec = get_codec()
+    return {"backend": codec.backend, "device": str(codec.device), "max_batch": codec.max_batch,
+            **codec.stats.snapshot()}
@@ -1,12 +1,29 @@
 
 import json
 import logging
+import math
+import time
+from functools import partial
 from typing import Literal
 
 from fastapi import APIRouter, WebSocket, WebSocketDisconnect
-from pydantic import BaseModel, ValidationError
+from pydantic import BaseModel, Field, ValidationError
 
-from backend.app.services.engine import engine
+from backend.app.core.config import NUM_CODEBOOKS
+from backend.app.services.admission import admission
+from backend.app.services.egress import EgressChunk
+from backend.app.services.engine import EngineShutDown
+from backend.app.services.frame_header import now_ms, pack_server_header, split_client_frame
+from backend.app.services.ingest import FRAME_BYTES, FrameAggregator, IngestStats
+from backend.app.services.prefill import prefill
+from backend.app.services.profiler import profiler
+from backend.app.services.quality import quality
+from backend.app.services.residency import residency
+from backend.app.services.runtime import runtime
+from backend.app.services.scheduler import scheduler
+from backend.app.services.session_log import session_log
+from backend.app.services.sessions import SlotBusy
+from backend.app.services.telemetry import telemetry
 
 logger = logging.getLogger("PersonaPlex-Router")
 router = APIRouter()
@@ -16,23 +33,106 @@ class ConfigPayload(BaseModel):
     type: Literal["config"]
     persona: str
     voice: str
+    model: str | None = None  # Model variant (see MODEL_VARIANTS); None keeps the current one
+    frame_header: bool = Field(False, alias="frameHeader")  # Per-frame seq/timestamp header (frame_header.py)
+
+class PlayoutStatsPayload(BaseModel):
+    """Periodic client playout report (cumulative counters since connect)."""
+    type: Literal["playout_stats"]
+    buffer_ms: float = Field(alias="bufferMs")
+    target_ms: float = Field(alias="targetMs")
+    jitter_ms: float = Field(alias="jitterMs")
+    underruns: int
+    underrun_ms: float = Field(alias="underrunMs")
+    output_latency_ms: float = Field(0.0, alias="outputLatencyMs")
+    playout_latency_ms: float = Field(alias="playoutLatencyMs")
+
+# Codes mode: int16 Mimi codes per 80 ms frame in, int16 text + audio tokens per step out
+CODES_FRAME_BYTES = 2 * NUM_CODEBOOKS
+CODES_BYTES_PER_SECOND = CODES_FRAME_BYTES * 12.5
 
 @router.websocket("/ws")
 async def websocket_endpoint(websocket: WebSocket):
     """
     Main Duplex Loop.
     Maintains the connection - reading user audio, writing AI audio.
+    
+    Pass `?resume=<token>` to continue a dropped session within its resume window.
+    A config message naming another model variant moves the session to it
+    (a `loading` message is sent first if the variant is not resident).
+    `?priority=<tier>` selects the session's frame deadline (see scheduler.py).
+    """
+    await duplex_loop(websocket, codes=False)
+
+@router.websocket("/ws/codes")
+async def codes_websocket_endpoint(websocket: WebSocket):
+    """
+    Codes-in / codes-out duplex loop for edge relays that run Mimi themselves.
+    Binary messages carry little-endian int16 [frames, 8] Mimi codes; replies
+    carry int16 [steps, 9] tokens (text token, then 8 audio codebooks). Only
+    the LM runs here. Text messages, resume and frame headers work as on /ws.
     """
+    await duplex_loop(websocket, codes=True)
+
+async def duplex_loop(websocket: WebSocket, codes: bool):
     await websocket.accept()
-    logger.info("Client Connected via WebSocket")
+    runtime.ensure_started()  # Event-loop lag watchdog
+    
+    # Wait for capacity (queued callers get position/ETA updates, see admission.py)
+    resume_token = websocket.query_params.get("resume")
+    admitted_at = await admission.admit(websocket, priority=resume_token is not None)
+    if admitted_at is None:
+        return
+    try:
+        await _serve(websocket, codes, resume_token)
+    finally:
+        admission.release(admitted_at)
+
+def _engine_step(sessions, session, engine, frame: bytes, codes: bool,
+                 codebooks: int) -> tuple[bytes | EgressChunk, float]:
+    """
+    One inference step on the scheduler's engine thread; returns the reply and
+    the CPU time spent. Decoded audio may still be on its way to the host
+    (EgressChunk): the loop reads it, so the engine can start the next step.
+    """
+    cpu_start = time.thread_time()
+    sessions.activate(session)
+    if codes:
+        reply = engine.process_codes(frame)
+    else:
+        reply = engine.step_audio_frame(frame, codebooks)
+    return reply, time.thread_time() - cpu_start
+
+async def _serve(websocket: WebSocket, codes: bool, resume_token: str | None):
+    tier = scheduler.tier(websocket.query_params.get("priority"))
+    # New sessions start from a clean engine state on first use; resumed
+    # sessions get their checkpointed state swapped back in.
+    manager, replica, session, resumed = residency.open_session(websocket, resume_token)
+    engine, sessions = replica.engine, replica.sessions
+    logger.info(
+        f"Client Connected via WebSocket (session {session.id}, model {manager.model_id}, "
+        f"replica {replica.generation}, resumed={resumed}, priority {tier})"
+    )
+    await websocket.send_text(json.dumps({
+        "type": "session", "token": session.token, "resumed": resumed,
+        "model": manager.model_id, "frameHeader": session.frame_header, "priority": tier,
+    }))
     
-    # NEW: Reset engine state for new session (Clear buffer & history)
-    engine.reset()
+    frame_bytes = CODES_FRAME_BYTES if codes else FRAME_BYTES
+    aggregator = FrameAggregator(frame_bytes)
+    ingest_stats = IngestStats(bytes_per_second=CODES_BYTES_PER_SECOND) if codes else IngestStats()
+    last_playout = None
+    # Decode quality ladder (codes sessions are decoded by the relay, not here)
+    session_quality = None if codes else quality.open(session.id, engine.rung_costs)
+    # Written as one record to the session log when the session ends (session_log.py)
+    summary = session_log.open(session.id, tier, scheduler.tiers[tier], codes=codes, resumed=resumed)
     
     try:
         while True:
             # 1. AWAIT INPUT
             message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                raise WebSocketDisconnect(message.get("code", 1000))
             
             # 2. HANDLE CONFIGURATION
             if "text" in message:
@@ -41,7 +141,48 @@ async def websocket_endpoint(websocket: WebSocket):
                     # Pydantic Validation
                     if data.get("type") == "config":
                         config = ConfigPayload(**data)
-                        engine.configure(config.persona, config.voice)
+                        if config.model and config.model != manager.model_id:
+                            try:
+                                if not residency.is_resident(config.model):
+                                    await websocket.send_text(json.dumps({"type": "loading", "model": config.model}))
+                                target = await residency.acquire(config.model)
+                            except (KeyError, RuntimeError) as e:
+                                # Unknown or unloadable model variant: keep serving the current one
+                                message = e.args[0] if e.args else str(e)
+                                logger.error(f"Model switch failed: {message}")
+                                await websocket.send_text(json.dumps({"type": "error", "message": message}))
+                                continue
+                            # Session state is model-specific: start a fresh session on the new variant
+                            residency.close_session(manager, replica, websocket, session, resumable=False)
+                            manager = target
+                            replica, session, _ = manager.open_session(websocket)
+                            engine, sessions = replica.engine, replica.sessions
+                            aggregator = FrameAggregator(frame_bytes)
+                            if session_quality is not None:
+                                session_quality.costs = engine.rung_costs
+                            await websocket.send_text(json.dumps({
+                                "type": "session", "token": session.token, "resumed": False, "model": manager.model_id,
+                            }))
+                        # Prefilled together with other sessions configuring at the same time (prefill.py)
+                        prefill_start = time.monotonic()
+                        await prefill.configure(tier, sessions, session, engine, config.persona, config.voice)
+                        summary.configured(config.voice, config.persona, 1000 * (time.monotonic() - prefill_start))
+                        session.frame_header = config.frame_header
+                        # Clients switch their frames to the negotiated format on this acknowledgement
+                        await websocket.send_text(json.dumps({
+                            "type": "configured", "frameHeader": session.frame_header,
+                        }))
+                    elif data.get("type") == "playout_stats":
+                        stats = PlayoutStatsPayload(**data)
+                        telemetry.record("playout_latency_ms", stats.playout_latency_ms)
+                        telemetry.record("playout_jitter_ms", stats.jitter_ms)
+                        telemetry.record("playout_target_ms", stats.target_ms)
+                        # Client counters are cumulative per session; aggregate the deltas
+                        prev_underruns = last_playout.underruns if last_playout else 0
+                        prev_underrun_ms = last_playout.underrun_ms if last_playout else 0.0
+                        telemetry.increment("playout_underruns", max(0, stats.underruns - prev_underruns))
+                        telemetry.increment("playout_underrun_ms", max(0.0, stats.underrun_ms - prev_underrun_ms))
+                        last_playout = stats
                 except json.JSONDecodeError:
                     logger.error("Failed to parse config JSON")
                 except ValidationError as e:
@@ -49,15 +190,85 @@ async def websocket_endpoint(websocket: WebSocket):
 
             # 3. HANDLE AUDIO STREAM (HOT PATH)
             elif "bytes" in message:
-                user_audio_chunk = message["bytes"]
+                cpu_start = time.thread_time()
+                payload = message["bytes"]
+                if session.frame_header:
+                    server_recv = now_ms()
+                    try:
+                        seq, capture_ts, payload = split_client_frame(payload)
+                    except ValueError as e:
+                        logger.warning(f"Session {session.id}: dropped a binary message ({e})")
+                        continue
+                ingest_stats.on_message(len(payload))
+                
+                # Coalesce small messages into whole model frames
+                user_audio_chunk = aggregator.push(payload)
+                if user_audio_chunk is None:
+                    ingest_stats.cpu_seconds += time.thread_time() - cpu_start
+                    continue
                 
-                # --- INFERENCE STEP ---
-                ai_audio_chunk = engine.process_audio_frame(user_audio_chunk)
+                if replica.state == "retired":
+                    # Drained past its timeout and shut down (replicas.py): reconnect to the new replica
+                    await websocket.close(code=1012)
+                    raise WebSocketDisconnect(1012)
+
+                # --- INFERENCE STEP (engine thread, in deadline order) ---
+                ingest_stats.cpu_seconds += time.thread_time() - cpu_start
+                codebooks = quality.codebooks(session_quality) if session_quality else NUM_CODEBOOKS
+                ready_at = time.monotonic()
+                try:
+                    (ai_audio_chunk, step_cpu), compute_start, compute_end = await scheduler.run(
+                        tier, partial(_engine_step, sessions, session, engine, user_audio_chunk, codes, codebooks),
+                        ready_at=ready_at,
+                    )
+                except EngineShutDown:
+                    # The replica was retired while this step was queued
+                    await websocket.close(code=1012)
+                    raise WebSocketDisconnect(1012)
+                if isinstance(ai_audio_chunk, EgressChunk):
+                    ai_audio_chunk = await ai_audio_chunk.read()
+                finished = time.monotonic()
+                cpu_start = time.thread_time()
+                if session_quality is not None:
+                    new_codebooks = quality.observe(
+                        session_quality, (compute_end - compute_start) / 1000, len(user_audio_chunk) // frame_bytes
+                    )
+                    if new_codebooks is not None:
+                        await websocket.send_text(json.dumps({"type": "quality", "codebooks": new_codebooks}))
+                ingest_stats.engine_calls += 1
+                ingest_stats.cpu_seconds += step_cpu + time.thread_time() - cpu_start
+                if profiler.armed:
+                    profiler.on_frame()
                 
                 # --- RESPONSE STEP ---
-                await websocket.send_bytes(ai_audio_chunk)
+                sent_bytes = 0
+                if ai_audio_chunk:
+                    if session.frame_header:
+                        header = pack_server_header(seq, capture_ts, server_recv, compute_start, compute_end)
+                        telemetry.record("frame_compute_ms", compute_end - compute_start)
+                        ai_audio_chunk = header + ai_audio_chunk
+                    await websocket.send_bytes(ai_audio_chunk)
+                    sent_bytes = len(ai_audio_chunk)
+                summary.frame(ready_at, finished, compute_end - compute_start,
+                              1000 * (time.monotonic() - finished), sent_bytes)
 
     except WebSocketDisconnect:
         logger.info("Client Disconnected")
+    except SlotBusy as e:
+        # Another session is streaming on an engine that serves one at a time (sessions.py)
+        logger.warning(f"Session {session.id} refused: {e}")
+        try:
+            await websocket.send_text(json.dumps({
+                "type": "rejected", "reason": "engine busy", "retryAfter": math.ceil(sessions.idle_seconds),
+            }))
+            await websocket.close(code=1013)  # Try again later
+        except Exception:
+            pass
     except Exception as e:
         logger.error(f"Unexpected Error: {e}")
+    finally:
+        residency.close_session(manager, replica, websocket, session)
+        logger.info(f"Session {session.id} ingest stats: {ingest_stats.summary()}")
+        session_log.write(summary, ingest_stats.bytes_in, manager.model_id)
+        if session_quality is not None:
+            logger.info(f"Session {session.id} quality: {quality.close(session_quality)}")
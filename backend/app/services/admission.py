@@ -0,0 +1,211 @@
+"""
+WebSocket admission control against the node's measured capacity.
+
+Capacity is the number of concurrent sessions the node can keep in real
+time, from the profiles its engines measured at warmup (see
+PersonaPlexEngine.calibrate_capacity), or NODE_MAX_SESSIONS when set. It is
+node-wide, not per model variant: every variant steps on the same engine
+thread, and a session only picks its variant after admission, so the
+slowest resident variant sets the limit.
+
+Capacity is checked against engaged sessions: admitted callers minus
+connected sessions that have not stepped for SESSION_IDLE_SECONDS (mic
+paused). Idle sessions hold no claim on the engine (their state is swapped
+out, see sessions.py), and parked or swapped-out sessions have no socket, so
+on a real model whose profile allows one session a paused caller does not
+keep the next one out. A caller
+beyond capacity is queued FIFO and told its position and an estimated wait
+(position x mean call length / capacity), refreshed as the queue moves. When
+the queue is full, or the caller has waited ADMISSION_QUEUE_TIMEOUT, it gets a
+`rejected` message with a retry-after hint and the socket is closed with 1013
+(try again later). Resumed sessions go to the front of the queue.
+
+Audio and text a queued caller sends are discarded: no session exists yet.
+"""
+
+import asyncio
+import json
+import logging
+import math
+import time
+from collections import deque
+from dataclasses import dataclass, field
+
+from fastapi import WebSocket
+
+from backend.app.core.config import (
+    NODE_MAX_SESSIONS, ADMISSION_QUEUE_MAX, ADMISSION_QUEUE_TIMEOUT, ADMISSION_SESSION_SECONDS,
+)
+from backend.app.services.residency import residency
+from backend.app.services.telemetry import telemetry
+
+logger = logging.getLogger("PersonaPlex-Admission")
+
+POSITION_UPDATE_SECONDS = 2.0  # Refresh a queued caller's position/ETA at most this often
+EWMA_ALPHA = 0.1  # Smoothing of the mean call length
+
+
+@dataclass
+class _Waiter:
+    admitted: asyncio.Future
+    enqueued_at: float = field(default_factory=time.monotonic)
+
+
+class AdmissionController:
+    """Counts admitted sessions and queues callers beyond the node's capacity."""
+
+    def __init__(self, max_sessions: int = NODE_MAX_SESSIONS, queue_max: int = ADMISSION_QUEUE_MAX,
+                 queue_timeout: float = ADMISSION_QUEUE_TIMEOUT, session_seconds: float = ADMISSION_SESSION_SECONDS):
+        self.max_sessions = max_sessions
+        self.queue_max = queue_max
+        self.queue_timeout = queue_timeout
+        self.mean_session_seconds = session_seconds
+        self.active = 0
+        self._queue: deque[_Waiter] = deque()
+        self.counters = {"admitted": 0, "queued": 0, "rejected": 0, "timed_out": 0, "abandoned": 0}
+
+    # --- Capacity ---
+
+    @property
+    def profile(self) -> dict | None:
+        """Capacity profile of the slowest resident variant (None before any was measured)."""
+        profiles = [r.manager.active.engine.capacity_profile for r in residency.resident()]
+        return min(filter(None, profiles), key=lambda p: p["sessions"], default=None)
+
+    @property
+    def capacity(self) -> int | None:
+        """Concurrent sessions this node admits (None: unlimited, e.g. the MOCK engine)."""
+        if self.max_sessions:
+            return self.max_sessions
+        return self.profile["sessions"] if self.profile else None
+
+    @property
+    def engaged(self) -> int:
+        """Admitted sessions that hold or may claim the engine slot (idle connected sessions excluded)."""
+        return self.active - sum(r.manager.idle_sessions for r in residency.resident())
+
+    def _has_slot(self) -> bool:
+        return self.capacity is None or self.engaged < self.capacity
+
+    @property
+    def queued(self) -> int:
+        return len(self._queue)
+
+    def estimated_wait(self, position: int) -> float:
+        """Seconds until the caller at `position` (1-based) gets a slot, if calls end at the mean rate."""
+        return position * self.mean_session_seconds / max(self.capacity or 1, 1)
+
+    # --- Admission ---
+
+    async def admit(self, websocket: WebSocket, priority: bool = False) -> float | None:
+        """
+        Wait for a slot for an accepted socket. Returns the admission time, or
+        None if the caller was rejected or left (the socket is then finished).
+        """
+        self._promote()  # Capacity may have grown (e.g. a faster replica took over)
+        if self._has_slot() and (priority or not self._queue):
+            return self._take_slot()
+        if len(self._queue) >= self.queue_max and not priority:
+            await self._reject(websocket, "queue_full")
+            return None
+
+        waiter = _Waiter(asyncio.get_running_loop().create_future())
+        if priority:
+            self._queue.appendleft(waiter)
+        else:
+            self._queue.append(waiter)
+        self.counters["queued"] += 1
+        receiver = asyncio.create_task(self._discard_until_disconnect(websocket))
+        admitted_at = None
+        try:
+            admitted_at = await self._wait(websocket, waiter, receiver)
+            return admitted_at
+        finally:
+            receiver.cancel()
+            if waiter in self._queue:
+                self._queue.remove(waiter)
+            elif admitted_at is None and waiter.admitted.done():
+                # Handed a slot just as the caller left or timed out: pass it on
+                self.release(waiter.admitted.result(), record=False)
+            telemetry.record("admission_wait_ms", 1000 * (time.monotonic() - waiter.enqueued_at))
+
+    async def _wait(self, websocket: WebSocket, waiter: _Waiter, receiver: asyncio.Task) -> float | None:
+        deadline = waiter.enqueued_at + self.queue_timeout
+        last_position = None
+        while True:
+            self._promote()  # Sessions may have gone idle since the last pass
+            if waiter.admitted.done():
+                return waiter.admitted.result()
+            position = self._queue.index(waiter) + 1 if waiter in self._queue else None
+            if position is not None and position != last_position:
+                last_position = position
+                await websocket.send_text(json.dumps({
+                    "type": "queued", "position": position,
+                    "etaSeconds": round(self.estimated_wait(position)),
+                }))
+
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                self.counters["timed_out"] += 1
+                await self._reject(websocket, "timeout")
+                return None
+            done, _ = await asyncio.wait(
+                {waiter.admitted, receiver}, timeout=min(remaining, POSITION_UPDATE_SECONDS),
+                return_when=asyncio.FIRST_COMPLETED,
+            )
+            if receiver in done and not waiter.admitted.done():
+                self.counters["abandoned"] += 1
+                return None
+
+    def _take_slot(self) -> float:
+        self.active += 1
+        self.counters["admitted"] += 1
+        return time.monotonic()
+
+    def release(self, admitted_at: float, record: bool = True):
+        """A session ended: record its length and hand the slot to the next caller."""
+        self.active -= 1
+        if record:
+            duration = time.monotonic() - admitted_at
+            self.mean_session_seconds += EWMA_ALPHA * (duration - self.mean_session_seconds)
+        self._promote()
+
+    def _promote(self):
+        while self._queue and self._has_slot():
+            waiter = self._queue.popleft()
+            if not waiter.admitted.done():
+                waiter.admitted.set_result(self._take_slot())
+
+    async def _reject(self, websocket: WebSocket, reason: str):
+        self.counters["rejected"] += 1
+        retry_after = max(1, math.ceil(self.estimated_wait(len(self._queue) + 1)))
+        logger.warning(f"Rejecting caller ({reason}); {self.engaged} engaged, {len(self._queue)} queued")
+        try:
+            await websocket.send_text(json.dumps({"type": "rejected", "reason": reason, "retryAfter": retry_after}))
+            await websocket.close(code=1013)  # Try again later
+        except Exception:
+            pass
+
+    @staticmethod
+    async def _discard_until_disconnect(websocket: WebSocket):
+        while (await websocket.receive())["type"] != "websocket.disconnect":
+            pass
+
+    def stats(self) -> dict:
+        return {
+            "capacity": self.capacity,
+            "source": "NODE_MAX_SESSIONS" if self.max_sessions else ("profile" if self.profile else None),
+            "active": self.active,
+            "engaged": self.engaged,
+            "queued": self.queued,
+            "queue_max": self.queue_max,
+            "queue_timeout_s": self.queue_timeout,
+            "mean_session_s": round(self.mean_session_seconds, 1),
+            "next_wait_s": round(self.estimated_wait(self.queued + 1)) if not self._has_slot() else 0,
+            "counters": self.counters,
+            "profile": self.profile,
+        }
+
+
+# Global Instance
+admission = AdmissionController()
@@ -0,0 +1,194 @@
+"""
+Standalone batched Mimi codec (encode audio to codes, decode codes to audio).
+
+Loads only the Mimi weights, never the LM, so dataset tokenization and token
+stream decoding do not pay for the 7B model. Independent items are grouped
+into batches (similar lengths together, capped by CODEC_MAX_BATCH items and
+CODEC_MAX_BATCH_SECONDS of padded audio) and each batch is one forward pass.
+Mimi is causal, so zero padding at the end of shorter items does not change
+their codes or audio; outputs are trimmed back to each item's own length.
+
+Results are yielded batch by batch, so callers can stream them while later
+batches are still running. Throughput is tracked as audio-hours processed per
+hour of compute.
+
+Python use:
+    from backend.app.services.codec import CodecService
+    codec = CodecService(backend="tiny", device="cpu")
+    for index, codes in codec.iter_encode([pcm_a, pcm_b]):  # float32 numpy arrays
+        ...
+"""
+
+import logging
+import threading
+import time
+from typing import Iterable, Iterator
+
+import numpy as np
+import torch
+
+from backend.app.core.config import (
+    SAMPLE_RATE, HF_TOKEN, MODEL_TYPE, CODEC_BACKEND, CODEC_DEVICE, CODEC_MAX_BATCH, CODEC_MAX_BATCH_SECONDS,
+)
+
+logger = logging.getLogger("PersonaPlex-Codec")
+
+
+def load_mimi(backend: str, device: str, repo_id: str = MODEL_TYPE):
+    """Load just the Mimi codec ("mimi") or the tiny seeded CPU codec ("tiny")."""
+    if backend == "tiny":
+        from backend.app.services.tiny_model import build_tiny_mimi
+        return build_tiny_mimi(device=device)
+    if backend != "mimi":
+        raise ValueError(f"Unknown codec backend: {backend}")
+
+    from huggingface_hub import hf_hub_download
+    from moshi.models import loaders
+
+    weight = hf_hub_download(repo_id=repo_id, filename=loaders.MIMI_NAME, token=HF_TOKEN)
+    mimi = loaders.get_mimi(weight, device=torch.device(device))
+    mimi.eval()
+    return mimi
+
+
+class CodecStats:
+    """Cumulative codec throughput per direction."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.totals = {
+            direction: {"items": 0, "batches": 0, "audio_seconds": 0.0, "compute_seconds": 0.0}
+            for direction in ("encode", "decode")
+        }
+
+    def add(self, direction: str, items: int, audio_seconds: float, compute_seconds: float):
+        with self._lock:
+            total = self.totals[direction]
+            total["items"] += items
+            total["batches"] += 1
+            total["audio_seconds"] += audio_seconds
+            total["compute_seconds"] += compute_seconds
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            result = {}
+            for direction, total in self.totals.items():
+                compute = total["compute_seconds"]
+                result[direction] = {
+                    **total,
+                    "mean_batch_size": round(total["items"] / total["batches"], 2) if total["batches"] else None,
+                    "audio_hours_per_hour": round(total["audio_seconds"] / compute, 2) if compute else None,
+                }
+            return result
+
+
+class CodecService:
+    """Batched, streaming Mimi encode/decode without the LM."""
+
+    def __init__(self, backend: str = CODEC_BACKEND, device: str = CODEC_DEVICE,
+                 max_batch: int = CODEC_MAX_BATCH, max_batch_seconds: float = CODEC_MAX_BATCH_SECONDS):
+        self.backend = backend
+        self.device = torch.device(device)
+        self.max_batch = max_batch
+        self.max_batch_seconds = max_batch_seconds
+        self.stats = CodecStats()
+
+        start = time.perf_counter()
+        self.mimi = load_mimi(backend, device)
+        self.frame_size = int(self.mimi.sample_rate / self.mimi.frame_rate)
+        self.cardinality = self.mimi.cardinality  # Codes per codebook: valid codes are [0, cardinality)
+        # One forward pass at a time: the model is shared between requests
+        self._lock = threading.Lock()
+        logger.info(f"Codec ({backend}) loaded on {device} in {time.perf_counter() - start:.1f}s")
+
+    # --- Batching ---
+
+    def _batches(self, lengths: list[int], samples_per_step: int) -> Iterator[list[int]]:
+        """Group item indices (sorted by length) into batches within the item and padded-audio caps."""
+        max_samples = self.max_batch_seconds * SAMPLE_RATE
+        batch: list[int] = []
+        for index in sorted(range(len(lengths)), key=lambda i: lengths[i]):
+            padded = (len(batch) + 1) * lengths[index] * samples_per_step  # Longest item so far is this one
+            if batch and (len(batch) == self.max_batch or padded > max_samples):
+                yield batch
+                batch = []
+            batch.append(index)
+        if batch:
+            yield batch
+
+    # --- Encode ---
+
+    def iter_encode(self, items: Iterable[np.ndarray]) -> Iterator[tuple[int, np.ndarray]]:
+        """
+        Encode float32 mono 24 kHz PCM arrays. Yields (item index, int16 codes [K, frames])
+        as each batch completes; partial trailing frames are zero padded.
+        """
+        items = [np.asarray(item, dtype=np.float32).reshape(-1) for item in items]
+        num_frames = [max(1, -(-len(item) // self.frame_size)) for item in items]
+
+        for batch in self._batches(num_frames, self.frame_size):
+            frames = max(num_frames[i] for i in batch)
+            pcm = np.zeros((len(batch), 1, frames * self.frame_size), dtype=np.float32)
+            for row, i in enumerate(batch):
+                pcm[row, 0, :len(items[i])] = items[i]
+
+            with self._lock, torch.no_grad():
+                start = time.perf_counter()
+                codes = self.mimi.encode(torch.from_numpy(pcm).to(self.device))
+                codes = codes.to(torch.int16).cpu().numpy()
+                elapsed = time.perf_counter() - start
+
+            self.stats.add("encode", len(batch), sum(len(items[i]) for i in batch) / SAMPLE_RATE, elapsed)
+            for row, i in enumerate(batch):
+                yield i, codes[row, :, :num_frames[i]]
+
+    def encode(self, items: Iterable[np.ndarray]) -> list[np.ndarray]:
+        """Encode all items; results in input order."""
+        results = {}
+        for index, codes in self.iter_encode(items):
+            results[index] = codes
+        return [results[i] for i in range(len(results))]
+
+    # --- Decode ---
+
+    def iter_decode(self, items: Iterable[np.ndarray]) -> Iterator[tuple[int, np.ndarray]]:
+        """Decode integer code arrays [K, frames]. Yields (item index, float32 PCM) as each batch completes."""
+        items = [np.asarray(item, dtype=np.int64) for item in items]
+        num_frames = [item.shape[-1] for item in items]
+
+        for batch in self._batches(num_frames, self.frame_size):
+            frames = max(num_frames[i] for i in batch)
+            codes = np.zeros((len(batch), items[batch[0]].shape[0], frames), dtype=np.int64)
+            for row, i in enumerate(batch):
+                codes[row, :, :num_frames[i]] = items[i]
+
+            with self._lock, torch.no_grad():
+                start = time.perf_counter()
+                pcm = self.mimi.decode(torch.from_numpy(codes).to(self.device))
+                pcm = pcm.to(torch.float32).cpu().numpy()
+                elapsed = time.perf_counter() - start
+
+            audio_seconds = sum(num_frames[i] for i in batch) * self.frame_size / SAMPLE_RATE
+            self.stats.add("decode", len(batch), audio_seconds, elapsed)
+            for row, i in enumerate(batch):
+                yield i, pcm[row, 0, :num_frames[i] * self.frame_size]
+
+    def decode(self, items: Iterable[np.ndarray]) -> list[np.ndarray]:
+        """Decode all items; results in input order."""
+        results = {}
+        for index, pcm in self.iter_decode(items):
+            results[index] = pcm
+        return [results[i] for i in range(len(results))]
+
+
+_codec: CodecService | None = None
+_codec_lock = threading.Lock()
+
+
+def get_codec() -> CodecService:
+    """The shared codec instance, loaded on first use."""
+    global _codec
+    with _codec_lock:
+        if _codec is None:
+            _codec = CodecService()
+        return _codec
@@ -0,0 +1,129 @@
+"""
+Synchronization-free egress path for decoded audio.
+
+Per decoded frame the stage:
+1. converts the PCM to contiguous float32 and clips it to [-1, 1] on the device,
+2. enqueues a non-blocking copy into a pooled (pinned, on CUDA) host buffer on a
+   side stream, so the compute stream can start the next step right away.
+
+`finish()` does not wait for the copies: it returns an EgressChunk that owns
+the host buffer until it is read. The engine thread moves on to the next step
+while the copy lands; the consumer waits for it (`wait()`, or `read()` off the
+event loop) and takes the audio out with `tobytes()`, which returns the buffer
+to the pool. Every chunk must be read exactly once. A buffer is never handed
+out again while its chunk is unread, so there is no validity window to keep
+track of; unread chunks only make the pool allocate another buffer.
+"""
+
+import asyncio
+import logging
+from collections import deque
+
+import torch
+
+logger = logging.getLogger("PersonaPlex-Egress")
+
+
+class EgressChunk:
+    """One engine call's audio in a pooled host buffer, possibly still being copied from the device."""
+
+    def __init__(self, stage: "EgressStage", buffer: torch.Tensor, event, length: int):
+        self._stage = stage
+        self._buffer = buffer
+        self._event = event  # None when nothing was copied from a device
+        self._length = length
+
+    def ready(self) -> bool:
+        """Whether the copy has landed (tobytes() will not block)."""
+        return self._event is None or self._event.query()
+
+    def wait(self):
+        if self._event is not None:
+            self._event.synchronize()
+
+    def tobytes(self) -> bytes:
+        """Wait for the copy, take the audio out and give the buffer back to the stage (once per chunk)."""
+        if self._buffer is None:
+            raise RuntimeError("Egress chunk was already read")
+        self.wait()
+        data = self._buffer[:self._length].numpy().tobytes()
+        self._stage._release(self._buffer, self._event)
+        self._buffer = None
+        return data
+
+    async def read(self) -> bytes:
+        """tobytes() without blocking the event loop while the copy is in flight."""
+        if not self.ready():
+            await asyncio.to_thread(self.wait)
+        return self.tobytes()
+
+
+class EgressStage:
+    """Device-side PCM conversion and asynchronous copy-out into pooled host buffers."""
+
+    def __init__(self, device: torch.device, frame_size: int, max_frames: int = 8, num_buffers: int = 4):
+        self.device = device
+        self.frame_size = frame_size
+        self.use_cuda = device.type == "cuda"
+        self._stream = torch.cuda.Stream(device) if self.use_cuda else None
+        self._capacity = max_frames * frame_size
+        # Free (buffer, event) pairs; chunks put theirs back when read (from any thread)
+        self._free = deque(self._alloc(self._capacity) for _ in range(num_buffers))
+        self._buffer, self._event = self._free.popleft()
+        self._offset = 0
+        self._pending = False
+
+        # Instrumentation (device->host copies issued by this stage)
+        self.copies = 0
+        self.bytes_copied = 0
+        self.buffers = num_buffers
+
+    def _alloc(self, num_samples: int) -> tuple[torch.Tensor, object]:
+        buffer = torch.empty(num_samples, dtype=torch.float32, pin_memory=self.use_cuda)
+        return buffer, torch.cuda.Event() if self.use_cuda else None
+
+    def _release(self, buffer: torch.Tensor, event):
+        self._free.append((buffer, event))
+
+    def begin(self):
+        """Start a new output chunk in a free host buffer (a new one if every buffer is still unread)."""
+        try:
+            self._buffer, self._event = self._free.popleft()
+        except IndexError:
+            self._buffer, self._event = self._alloc(self._capacity)
+            self.buffers += 1
+        self._offset = 0
+        self._pending = False
+
+    def submit(self, pcm: torch.Tensor):
+        """Convert one decoded frame on device and enqueue its copy to host."""
+        samples = pcm.reshape(-1).to(torch.float32).clamp(-1.0, 1.0)
+        n = samples.numel()
+
+        buffer = self._buffer
+        if self._offset + n > buffer.numel():
+            # Rare: more frames in one call than preallocated. Grow (and keep) the buffer.
+            if self._pending:
+                self._event.synchronize()
+            grown, _ = self._alloc(max(2 * buffer.numel(), self._offset + n))
+            grown[:self._offset].copy_(buffer[:self._offset])
+            self._buffer = buffer = grown
+
+        host = buffer[self._offset:self._offset + n]
+        if self.use_cuda:
+            self._stream.wait_stream(torch.cuda.current_stream(self.device))
+            with torch.cuda.stream(self._stream):
+                host.copy_(samples, non_blocking=True)
+            samples.record_stream(self._stream)
+            self._event.record(self._stream)
+            self._pending = True
+        else:
+            host.copy_(samples)
+
+        self._offset += n
+        self.copies += 1
+        self.bytes_copied += 4 * n
+
+    def finish(self) -> EgressChunk:
+        """Hand the chunk over without waiting for its copies (see EgressChunk)."""
+        return EgressChunk(self, self._buffer, self._event if self._pending else None, self._offset)
@@ -2,7 +2,12 @@
 import logging
 import os
 import tarfile
+import tempfile
+import time
+from itertools import chain
 from pathlib import Path
+from functools import partial
+from typing import Any, Callable
 import numpy as np
 import torch
 from huggingface_hub import hf_hub_download
@@ -12,13 +17,28 @@ try:
     from moshi.models import loaders, LMGen
     from moshi.models.compression import MimiModel
     from moshi.models.lm import LMModel
+    from safetensors import safe_open
     MOSHI_AVAILABLE = True
 except ImportError:
     MOSHI_AVAILABLE = False
     loaders = None
     LMGen = None
+    safe_open = None
 
-from backend.app.core.config import SAMPLE_RATE, CHUNK_SIZE, DEVICE, HF_TOKEN
+from backend.app.core.config import (
+    SAMPLE_RATE, CHUNK_SIZE, NUM_CODEBOOKS, DEVICE, HF_TOKEN, MODEL_TYPE, ENGINE_BACKEND, VOICE_STORE_DIR, VOICE_CACHE_SIZE,
+    CAPACITY_HEADROOM, CAPACITY_CALIBRATION_FRAMES, LAYER_STREAMING, LAYER_STREAM_WINDOW, LAYER_STREAM_DIR,
+)
+from backend.app.services.egress import EgressChunk, EgressStage
+from backend.app.services.ingest import sanitize_pcm
+from backend.app.services.layer_stream import LayerStreamer
+from backend.app.services.quality import RungCosts, quality
+from backend.app.services.standin import StandInWrapper
+from backend.app.services.streaming_state import (
+    snapshot_streaming_state, restore_streaming_state, split_streaming_state,
+    detach_streaming_state, attach_streaming_state,
+)
+from backend.app.services.voice_store import VoiceStore, content_digest
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger("PersonaPlex-Engine")
@@ -31,6 +51,35 @@ PERSONAPLEX_VOICES = [
     "VARM0", "VARM1", "VARM2", "VARM3", "VARM4",  # Variety Male
 ]
 
+# LMGen attributes that make up a session's prompts (see PersonaPlexWrapper.prompt_state)
+PROMPT_ATTRIBUTES = (
+    "voice_prompt", "voice_prompt_audio", "voice_prompt_embeddings", "voice_prompt_cache", "text_prompt_tokens",
+)
+
+# Segments of LMGen.step_system_prompts in order, with the prompt attributes each reads
+PROMPT_SEGMENTS = (
+    ("_step_voice_prompt", PROMPT_ATTRIBUTES[:4]),
+    ("_step_audio_silence", ()),
+    ("_step_text_prompt", PROMPT_ATTRIBUTES[4:]),
+    ("_step_audio_silence", ()),
+)
+
+
+def _group_rows(prompts: list[dict], keys: tuple[str, ...]) -> list[tuple[dict, list[int]]]:
+    """Rows of `prompts` that feed a segment the same `keys` (with the first such prompt)."""
+    groups: dict[tuple, tuple[dict, list[int]]] = {}
+    for row, prompt in enumerate(prompts):
+        groups.setdefault(_prompt_key(prompt, keys), (prompt, []))[1].append(row)
+    return list(groups.values())
+
+
+def _prompt_key(prompt: dict, keys: tuple[str, ...]) -> tuple:
+    """Voices compare by name, text prompts by their tokens, anything else by identity."""
+    if prompt.get("voice_prompt") is not None and "voice_prompt" in keys:
+        return (prompt["voice_prompt"],)
+    values = (prompt.get(name) for name in keys)
+    return tuple(tuple(v) if isinstance(v, list) else id(v) if isinstance(v, torch.Tensor) else v for v in values)
+
 
 class PersonaPlexWrapper:
     """
@@ -38,9 +87,10 @@ class PersonaPlexWrapper:
     Uses official moshi-personaplex loaders for proper model initialization.
     """
     
-    def __init__(self, device: str = "cuda", cpu_offload: bool = False):
+    def __init__(self, device: str = "cuda", cpu_offload: bool = False,
+                 repo_id: str | None = None, voice_prompt_dir: str | None = None):
         self.device = torch.device(device)
-        self.repo_id = loaders.DEFAULT_REPO  # nvidia/personaplex-7b-v1
+        self.repo_id = repo_id or loaders.DEFAULT_REPO  # nvidia/personaplex-7b-v1
         
         logger.info(f"Loading PersonaPlex from {self.repo_id}...")
         
@@ -65,11 +115,15 @@ class PersonaPlexWrapper:
             filename=loaders.MOSHI_NAME,
             token=HF_TOKEN
         )
-        self.lm = loaders.get_moshi_lm(
-            lm_weight, 
-            device=self.device,
-            cpu_offload=cpu_offload
-        )
+        self.layer_streamer = None
+        if LAYER_STREAMING:
+            self._load_streamed_lm(lm_weight)
+        else:
+            self.lm = loaders.get_moshi_lm(
+                lm_weight, 
+                device=self.device,
+                cpu_offload=cpu_offload
+            )
         self.lm.eval()
         
         # Create LMGen for streaming inference with voice/text prompt support
@@ -96,21 +150,96 @@ class PersonaPlexWrapper:
         
         # Download and extract voice prompts
         logger.info("Loading voice prompts...")
-        self.voice_prompt_dir = self._get_voice_prompt_dir()
+        self.voice_prompt_dir = voice_prompt_dir or self._get_voice_prompt_dir()
+        self.voice_store = VoiceStore(VOICE_STORE_DIR, self.repo_id, self.device, VOICE_CACHE_SIZE)
         
         # State
         self.current_voice_prompt = None
         self.current_text_prompt = None
+        self.batch_sizes = [1]  # Streaming state is allocated for batch size 1
+        self.interleave_sessions = False  # Swapping the KV cache every frame costs more than the step
         
         logger.info("PersonaPlex loaded successfully!")
-    
-    def _get_voice_prompt_dir(self) -> str:
-        """Download and extract voice prompts from HuggingFace."""
-        voices_tgz = hf_hub_download(
-            repo_id=self.repo_id,
-            filename="voices.tgz",
-            token=HF_TOKEN
-        )
+
+    @classmethod
+    def from_components(cls, mimi, lm_gen, device: str = "cpu", repo_id: str = "components",
+                        text_tokenizer=None) -> "PersonaPlexWrapper":
+        """
+        Wrap already-built Mimi/LMGen modules without downloading anything
+        (e.g. the tiny CPU model in tiny_model.py). No voice store is attached.
+        """
+        self = cls.__new__(cls)
+        self.device = torch.device(device)
+        self.repo_id = repo_id
+        self.mimi = mimi
+        self.lm_gen = lm_gen
+        self.lm = lm_gen.lm
+        self.layer_streamer = None
+        self.frame_size = int(mimi.sample_rate / mimi.frame_rate)
+        self.text_tokenizer = text_tokenizer
+        self.voice_prompt_dir = None
+        self.voice_store = None
+        self.current_voice_prompt = None
+        self.current_text_prompt = None
+        self.batch_sizes = [1]
+        self.interleave_sessions = False
+        self.mimi.streaming_forever(batch_size=1)
+        self.lm_gen.streaming_forever(batch_size=1)
+        return self
+
+    def _load_streamed_lm(self, lm_weight: str):
+        """
+        Build the LM for layer streaming without holding the checkpoint in RAM:
+        the model is created on the meta device, the layer file is written one
+        tensor at a time from the lazily opened safetensors file, and only the
+        remaining (non-layer) weights are loaded and moved to the device.
+        """
+        if self.device.type == "cuda":
+            # LMGen replays its steps as CUDA graphs, which never call the layer hooks
+            raise RuntimeError("LAYER_STREAMING is not supported on CUDA (moshi's CUDA graphs bypass it)")
+        self.lm = loaders.get_moshi_lm(None, device="meta")
+        layers = self._lm_layers()
+        prefix = next(name for name, module in self.lm.named_modules() if module is layers) + "."
+        with safe_open(lm_weight, framework="pt", device="cpu") as checkpoint:
+            self.enable_layer_streaming(source=lambda k, name: checkpoint.get_tensor(f"{prefix}{k}.{name}"),
+                                        checkpoint=lm_weight)
+            rest = {key: checkpoint.get_tensor(key) for key in checkpoint.keys() if not key.startswith(prefix)}
+        self.lm.load_state_dict(rest, strict=False, assign=True)
+        missing = [name for name, tensor in chain(self.lm.named_parameters(), self.lm.named_buffers()) if tensor.is_meta]
+        if missing:
+            raise RuntimeError(f"{lm_weight} has no weights for {len(missing)} LM tensors, e.g. {missing[:3]}")
+        self.lm.to(self.device)
+
+    def _lm_layers(self):
+        return getattr(self.lm, "transformer", self.lm).layers
+
+    def enable_layer_streaming(self, window: int = LAYER_STREAM_WINDOW, directory: str = LAYER_STREAM_DIR,
+                               prefetch: bool = True,
+                               source: Callable[[int, str], torch.Tensor] | None = None,
+                               checkpoint: str | None = None) -> LayerStreamer:
+        """
+        Keep only `window` transformer layers resident (the running one and
+        the ones prefetched behind it), streamed from a memory-mapped layer
+        file written on first use per checkpoint, from the layers or from
+        `source` (see LayerStreamer). The file is rebuilt when the
+        `checkpoint` file `source` reads from changes.
+        """
+        path = os.path.join(directory, self.repo_id.replace("/", "--"), "transformer-layers.bin")
+        self.layer_streamer = LayerStreamer(self._lm_layers(), path, window, self.device, prefetch=prefetch,
+                                            source=source, checkpoint=checkpoint)
+        return self.layer_streamer
+
+    def _get_voice_prompt_dir(self) -> str | None:
+        """Download and extract voice prompts from HuggingFace (None if the checkpoint has none)."""
+        try:
+            voices_tgz = hf_hub_download(
+                repo_id=self.repo_id,
+                filename="voices.tgz",
+                token=HF_TOKEN
+            )
+        except Exception as e:
+            logger.warning(f"No voice prompts for {self.repo_id}: {e}")
+            return None
         voices_tgz = Path(voices_tgz)
         voices_dir = voices_tgz.parent / "voices"
         
@@ -126,18 +255,82 @@ class PersonaPlexWrapper:
         self.voice_prompt_dir = voice_prompt_dir
     
     def load_voice_prompt(self, voice_name: str):
-        """Load a voice prompt embedding file (e.g., NATF0.pt, NATM1.pt)."""
-        if self.voice_prompt_dir is None:
-            logger.warning("Voice prompt directory not set. Skipping voice prompt.")
+        """
+        Load a voice prompt embedding (e.g., NATF0, NATM1 or an enrolled voice).
+        Built-in .pt files are imported into the voice store on first use, after
+        which the embedding is served from the store's device-resident LRU. A
+        built-in voice is imported again when this wrapper's voice pack holds
+        a different file for it (voice pack swap); enrolled voices are kept.
+        """
+        if self.voice_store is None:
+            logger.warning("No voice store attached. Skipping voice prompt.")
             return
+        entry = self.voice_store.index.get(voice_name)
+        if entry is None or entry["source"] == "builtin":
+            if self.voice_prompt_dir is None:
+                logger.warning("Voice prompt directory not set. Skipping voice prompt.")
+                return
+            voice_path = os.path.join(self.voice_prompt_dir, f"{voice_name}.pt")
+            if not os.path.exists(voice_path):
+                logger.warning(f"Voice prompt not found: {voice_path}")
+                return
+            if not self.voice_store.imported_from(voice_name, voice_path):
+                self.voice_store.import_file(voice_name, voice_path)
         
-        voice_path = os.path.join(self.voice_prompt_dir, f"{voice_name}.pt")
-        if os.path.exists(voice_path):
-            self.lm_gen.load_voice_prompt_embeddings(voice_path)
-            self.current_voice_prompt = voice_name
-            logger.info(f"Loaded voice prompt: {voice_name}")
-        else:
-            logger.warning(f"Voice prompt not found: {voice_path}")
+        self._apply_voice_prompt_state(voice_name, self.voice_store.get(voice_name))
+        self.current_voice_prompt = voice_name
+        logger.info(f"Loaded voice prompt: {voice_name}")
+    
+    def _apply_voice_prompt_state(self, voice_name: str, state: dict):
+        """
+        Equivalent of LMGen.load_voice_prompt_embeddings() for tensors already on
+        device. The session gets its own copies: the store's LRU entries are
+        shared by every session using the voice and must never be written through.
+        """
+        self.lm_gen.voice_prompt = voice_name
+        self.lm_gen.voice_prompt_audio = None
+        self.lm_gen.voice_prompt_embeddings = state["embeddings"].clone()
+        self.lm_gen.voice_prompt_cache = state["cache"].clone()
+    
+    def enroll_voice(self, voice_name: str, wav_bytes: bytes) -> dict:
+        """
+        Compute the voice-prompt embedding for a reference WAV and store it.
+        Identical audio is only ever computed once (content-addressed).
+        
+        NOTE: computing the embedding runs the shared streaming model, so it
+        must run on the engine thread with the slot released (the admin
+        endpoint submits it as a scheduler job). The streaming state is reset
+        and LMGen's prompt attributes are restored afterwards.
+        """
+        digest = content_digest(wav_bytes)
+        if self.voice_store.has_object(digest):
+            return self.voice_store.put(voice_name, digest)
+        
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            wav_path = os.path.join(tmp_dir, f"{digest}.wav")
+            with open(wav_path, "wb") as f:
+                f.write(wav_bytes)
+            
+            # LMGen encodes the reference audio during the system-prompt pass and,
+            # with save_voice_prompt_embeddings set, writes <prompt>.pt next to it.
+            save_flag = getattr(self.lm_gen, "save_voice_prompt_embeddings", False)
+            previous = self.prompt_state()
+            try:
+                self.lm_gen.save_voice_prompt_embeddings = True
+                self.lm_gen.load_voice_prompt(wav_path)
+                self.reset()
+                with torch.no_grad():
+                    self.lm_gen.step_system_prompts(self.mimi)
+            finally:
+                # Do not leave LMGen pointing at the temporary WAV once it is deleted
+                self.lm_gen.save_voice_prompt_embeddings = save_flag
+                for name, value in previous.items():
+                    setattr(self.lm_gen, name, value)
+                self.reset()
+            
+            state = torch.load(os.path.join(tmp_dir, f"{digest}.pt"), map_location="cpu")
+        
+        return self.voice_store.put(voice_name, digest, state)
     
     def set_text_prompt(self, text_prompt: str, tokenizer=None):
         """Set the text prompt (persona) for the model."""
@@ -151,12 +344,14 @@ class PersonaPlexWrapper:
         else:
             logger.warning("No tokenizer provided. Text prompts require a tokenizer.")
     
-    def process(self, audio_tensor: torch.Tensor) -> torch.Tensor | None:
+    def process(self, audio_tensor: torch.Tensor, codebooks: int = NUM_CODEBOOKS) -> torch.Tensor | None:
         """
         Process a single frame of audio through the PersonaPlex pipeline.
         
         Args:
             audio_tensor: [1, 1, frame_size] float32 tensor
+            codebooks: audio codebooks passed to Mimi decode (fewer is cheaper
+                and lower fidelity, see quality.py); the LM still sees all 8
             
         Returns:
             Output audio tensor or None if still buffering
@@ -174,7 +369,7 @@ class PersonaPlexWrapper:
                     continue
                 
                 # tokens: [1, 17, 1] - Channel 0 is text, Channels 1-8 are audio
-                audio_tokens = tokens[:, 1:9, :]  # Extract audio channels
+                audio_tokens = tokens[:, 1:1 + codebooks, :]  # Extract audio channels
                 
                 # Decode to audio
                 pcm = self.mimi.decode(audio_tokens)
@@ -185,12 +380,107 @@ class PersonaPlexWrapper:
             
             return output_audio
     
+    def step_codes(self, codes: torch.Tensor) -> torch.Tensor | None:
+        """
+        Run only the LM on Mimi codes encoded elsewhere (edge relays).
+        
+        Args:
+            codes: [1, 8, T] integer codes
+            
+        Returns:
+            [1, 9, n] tokens (text, then 8 audio codebooks) or None if still buffering
+        """
+        with torch.no_grad():
+            steps = []
+            for c in range(codes.shape[-1]):
+                tokens = self.lm_gen.step(codes[:, :, c:c+1])
+                if tokens is not None:
+                    steps.append(tokens[:, :9])
+            return torch.cat(steps, dim=-1) if steps else None
+    
     def reset(self):
         """Reset streaming state for a new session."""
         logger.info("Resetting PersonaPlex state...")
         self.mimi.reset_streaming()
         self.lm_gen.reset_streaming()
     
+    def prefill(self):
+        """Start a fresh stream and run the system-prompt pass (voice prompt, then text prompt)."""
+        self.reset()
+        with torch.no_grad():
+            self.lm_gen.step_system_prompts(self.mimi)
+        self.mimi.reset_streaming()
+    
+    def prompt_state(self) -> dict:
+        """The prompts currently set on LMGen (one entry of prefill_batch)."""
+        return {name: getattr(self.lm_gen, name, None) for name in PROMPT_ATTRIBUTES}
+    
+    @property
+    def batched_prefill(self) -> bool:
+        """Whether LMGen can prefill several prompts in one batched pass (see prefill_batch)."""
+        return hasattr(self.lm_gen, "set_exec_mask") and all(
+            hasattr(self.lm_gen, segment) for segment, _ in PROMPT_SEGMENTS
+        )
+    
+    def prefill_batch(self, prompts: list[dict]) -> list[dict]:
+        """
+        States (as get_state()) of fresh streams prefilled with each of
+        `prompts` (from prompt_state()), computed in one batch-N stream.
+        
+        The system-prompt pass is run segment by segment (PROMPT_SEGMENTS, as
+        LMGen.step_system_prompts does). For each segment, rows that feed it
+        the same prompt are stepped together and LMGen's exec mask freezes
+        the others, so a row whose prompt is done (or not yet at that
+        segment) does not move and every row ends in the state its prompt
+        reaches alone. The batch-N state is then split into batch-1 states.
+        The live batch-1 stream (and its CUDA graphs) is set aside meanwhile
+        and reset afterwards.
+        """
+        batch_size = len(prompts)
+        previous = self.prompt_state()
+        self.reset()
+        single = detach_streaming_state(self.lm_gen)
+        try:
+            with torch.no_grad():
+                self.lm_gen.streaming_forever(batch_size)
+                try:
+                    for segment, keys in PROMPT_SEGMENTS:
+                        for prompt, rows in _group_rows(prompts, keys):
+                            for name in keys:
+                                setattr(self.lm_gen, name, prompt.get(name))
+                            mask = torch.zeros(batch_size, dtype=torch.bool)
+                            mask[rows] = True
+                            self.lm_gen.set_exec_mask(mask)
+                            args = (self.mimi,) if segment == "_step_voice_prompt" else ()
+                            getattr(self.lm_gen, segment)(*args)
+                    rows = split_streaming_state(self.lm_gen, single, batch_size)
+                finally:
+                    for state in detach_streaming_state(self.lm_gen).values():
+                        # Leave the LM's own batch-N streaming context (moshi's LMGen state holds it)
+                        if hasattr(state, "__exit__"):
+                            state.__exit__(None, None, None)
+        finally:
+            attach_streaming_state(self.lm_gen, single)
+            for name, value in previous.items():
+                setattr(self.lm_gen, name, value)
+        self.reset()
+        mimi = snapshot_streaming_state(self.mimi)
+        return [{"mimi": mimi, "lm_gen": row} for row in rows]
+    
+    def get_state(self) -> dict:
+        """Host-side checkpoint of the Mimi and LMGen streaming state."""
+        with torch.no_grad():
+            return {
+                "mimi": snapshot_streaming_state(self.mimi),
+                "lm_gen": snapshot_streaming_state(self.lm_gen),
+            }
+    
+    def set_state(self, state: dict):
+        """Restore a checkpoint taken with get_state() into the live streaming state."""
+        with torch.no_grad():
+            restore_streaming_state(self.mimi, state["mimi"], self.device)
+            restore_streaming_state(self.lm_gen, state["lm_gen"], self.device)
+    
     def warmup(self):
         """Warm up the model with dummy data."""
         logger.info("Warming up PersonaPlex...")
@@ -206,20 +496,72 @@ class PersonaPlexWrapper:
             torch.cuda.synchronize()
         logger.info("Warmup complete.")
     
+    def memory_bytes(self) -> int:
+        """Resident size of the model weights."""
+        modules = [m for m in (self.lm, self.mimi) if m is not None]
+        return sum(p.numel() * p.element_size() for m in modules for p in m.parameters())
+    
     def close(self):
-        """Cleanup resources."""
-        pass  # streaming_forever handles cleanup
+        """Release the model weights and cached device memory."""
+        if self.layer_streamer is not None:
+            self.layer_streamer.close()
+            self.layer_streamer = None
+        self.lm_gen = None
+        self.lm = None
+        self.mimi = None
+        self.voice_store = None
+        if self.device.type == 'cuda':
+            torch.cuda.empty_cache()
+
+
+class EngineShutDown(RuntimeError):
+    """A step reached an engine that was shut down (retired replica)."""
+
+
+def _run_here(step: Callable[[], Any]) -> tuple[Any, float]:
+    """Default calibration step runner: call `step` on this thread; returns (result, ms)."""
+    start = time.perf_counter()
+    result = step()
+    return result, 1000 * (time.perf_counter() - start)
 
 
 class PersonaPlexEngine:
     """
     Main engine class that handles audio processing.
+
+    `step_runner` runs each warmup calibration step and returns (result, ms).
+    An engine loaded while the node serves (residency, replica reload) passes
+    scheduler.timed_runner(), so its steps neither overlap live ones nor are
+    timed while they contend with them.
     """
     
-    def __init__(self):
+    def __init__(self, backend: str = ENGINE_BACKEND, model_id: str | None = None,
+                 voice_prompt_dir: str | None = None,
+                 step_runner: Callable[[Callable[[], Any]], tuple[Any, float]] = _run_here):
         self.is_mock = True
+        self.backend = "mock"
         self.wrapper = None
+        self.egress = None
         self.buffer = np.array([], dtype=np.float32)
+        self.persona = None
+        self.voice_id = None
+        self.capacity_profile = None  # Measured at warmup (calibrate_capacity)
+        self.rung_costs = RungCosts()  # Cost per frame at each quality rung (calibrate_quality, then live)
+
+        if backend == "mock":
+            logger.warning("ENGINE_BACKEND=mock. Using MOCK engine.")
+            return
+
+        if backend == "standin":
+            self.wrapper = StandInWrapper(repo_id=model_id or "standin")
+            self.wrapper.warmup()
+            self.egress = EgressStage(self.wrapper.device, self.wrapper.frame_size)
+            self.is_mock = False
+            self.backend = "standin"
+            self.calibrate_quality(run=step_runner)
+            self.calibrate_capacity(run=step_runner)
+            logger.info("Stand-in engine loaded (no model weights).")
+            return
 
         if not MOSHI_AVAILABLE:
             logger.error("moshi-personaplex not found. Falling back to MOCK engine.")
@@ -227,9 +569,13 @@ class PersonaPlexEngine:
             return
 
         try:
-            self.wrapper = PersonaPlexWrapper(device=DEVICE)
+            self.wrapper = PersonaPlexWrapper(device=DEVICE, repo_id=model_id, voice_prompt_dir=voice_prompt_dir)
             self.wrapper.warmup()
+            self.egress = EgressStage(self.wrapper.device, self.wrapper.frame_size)
             self.is_mock = False
+            self.backend = "personaplex"
+            self.calibrate_quality(run=step_runner)
+            self.calibrate_capacity(run=step_runner)
             logger.info("PersonaPlex Engine loaded successfully!")
         except Exception as e:
             logger.error(f"Failed to load PersonaPlex: {e}", exc_info=True)
@@ -237,12 +583,22 @@ class PersonaPlexEngine:
             self.is_mock = True
 
     def configure(self, persona: str, voice_id: str):
-        """Configure the persona and voice for the session."""
+        """Configure the persona and voice and prefill them (the session's conversation starts over)."""
+        self._set_prompts(persona, voice_id)
+        if self.wrapper is None:
+            return
+        self.buffer = np.array([], dtype=np.float32)
+        self.wrapper.prefill()
+        logger.info(f"Configured persona: {persona[:50] if persona else 'default'}..., voice: {voice_id}")
+
+    def _set_prompts(self, persona: str, voice_id: str):
+        self.persona, self.voice_id = persona, voice_id
         if self.wrapper is None:
             return
         
         # Apply voice prompt
-        if voice_id and voice_id in PERSONAPLEX_VOICES:
+        store = self.wrapper.voice_store
+        if voice_id and (voice_id in PERSONAPLEX_VOICES or (store is not None and voice_id in store)):
             self.wrapper.load_voice_prompt(voice_id)
         else:
             logger.warning(f"Unknown voice ID: {voice_id}. Using default.")
@@ -250,40 +606,146 @@ class PersonaPlexEngine:
         # Apply text prompt (persona)
         if persona:
             self.wrapper.set_text_prompt(persona, self.wrapper.text_tokenizer)
-        
-        logger.info(f"Configured persona: {persona[:50] if persona else 'default'}..., voice: {voice_id}")
 
-    def process_audio_frame(self, audio_frame: bytes) -> bytes:
+    @property
+    def interleave_sessions(self) -> bool:
+        """Whether live sessions may swap in and out of the slot on every frame (sessions.py)."""
+        return self.wrapper is None or self.wrapper.interleave_sessions
+
+    @property
+    def batched_prefill(self) -> bool:
+        """Whether several session configs can be prefilled in one batched pass."""
+        return self.wrapper is not None and self.wrapper.batched_prefill
+
+    def prefill_batch(self, configs: list[tuple[str, str]]) -> list[dict]:
+        """
+        Checkpoints (as checkpoint()) of fresh sessions configured with each
+        (persona, voice) pair, prefilled together (PersonaPlexWrapper.prefill_batch,
+        only when `batched_prefill`).
+        The live state is lost: the caller checkpoints the slot owner first.
+        """
+        prompts = []
+        for persona, voice_id in configs:
+            self._set_prompts(persona, voice_id)
+            prompts.append(self.wrapper.prompt_state())
+        states = self.wrapper.prefill_batch(prompts)
+        self.reset()
+        logger.info(f"Prefilled {len(configs)} session prompts in one batch")
+        return [
+            {"buffer": np.array([], dtype=np.float32), "persona": persona, "voice_id": voice_id, "wrapper": state}
+            for (persona, voice_id), state in zip(configs, states)
+        ]
+
+    def calibrate_quality(self, frames: int = 4, run=_run_here):
         """
-        Process incoming audio bytes and return generated audio bytes.
+        Measure the per-frame cost of every quality rung on this engine, so
+        compute saved can be reported from the start. Each rung starts a fresh
+        stream and steps it past its delay first; the median of the steady-state
+        frames after that seeds the rung's cost. `run` executes and times each
+        step (see step_runner).
         """
+        silence = np.zeros(self.wrapper.frame_size, dtype=np.float32).tobytes()
+        for level, codebooks in enumerate(quality.levels):
+            step = partial(run, partial(self.process_audio_frame, silence, codebooks))
+            self.reset()
+            self._step_past_delay(lambda: step()[0])
+            timings = [step()[1] for _ in range(frames)]
+            self.rung_costs.seed(level, float(np.median(timings)))
+        self.reset()
+        logger.info(f"Quality ladder calibrated (ms/frame per codebook count): "
+                    f"{self.rung_costs.describe(quality.levels)}")
+
+    def _step_past_delay(self, step: Callable[[], Any], limit: int = 64) -> int:
+        """
+        Run `step` on a fresh stream until it returns audio. The first steps
+        of a stream fall inside the model's delay and skip the decode, and the
+        first calls run on cold kernels: neither belongs in a timing.
+        Returns the number of steps taken.
+        """
+        for n in range(1, limit + 1):
+            out = step()
+            if out is not None and len(out) > 0:
+                return n
+        return limit
+
+    def _capacity_step(self, silence: np.ndarray, batch_size: int):
+        if batch_size == 1:
+            return self.process_audio_frame(silence.tobytes())
+        # Only the stand-in takes a batch size (it charges the cost of a batched step)
+        return self.wrapper.process(torch.from_numpy(silence).view(1, 1, -1), batch_size=batch_size)
+
+    def calibrate_capacity(self, frames: int = CAPACITY_CALIBRATION_FRAMES, headroom: float = CAPACITY_HEADROOM,
+                           run=_run_here) -> dict:
+        """
+        Time steady-state model steps (past the stream's initial delay) at
+        every batch size the wrapper supports and derive how many concurrent
+        real-time sessions each can carry within
+        `headroom` of the 80 ms frame budget. The duplex loop steps sessions
+        one at a time, so admission uses the batch-size-1 entry (`sessions`),
+        or a single session on engines that cannot interleave them. `run`
+        executes and times each step (see step_runner).
+        """
+        frame_ms = 1000 * self.wrapper.frame_size / SAMPLE_RATE
+        silence = np.zeros(self.wrapper.frame_size, dtype=np.float32)
+        points = []
+        for batch_size in self.wrapper.batch_sizes:
+            step = partial(run, partial(self._capacity_step, silence, batch_size))
+            self.reset()
+            self._step_past_delay(lambda: step()[0])
+            timings = [step()[1] for _ in range(frames)]
+            step_ms = float(np.median(timings))
+            points.append({
+                "batch_size": batch_size,
+                "step_ms": round(step_ms, 2),
+                "frame_ms_per_session": round(step_ms / batch_size, 2),
+                # At least one session, even if a single one cannot keep up (the quality ladder steps in)
+                "sessions": max(1, int(batch_size * (frame_ms * headroom // step_ms))) if step_ms > 0 else None,
+            })
+        self.reset()
+        self.capacity_profile = {
+            "measured_at": time.time(),
+            "headroom": headroom,
+            "frame_budget_ms": frame_ms,
+            "batch_sizes": points,
+            # Without interleaving only one session can stream at a time (sessions.py)
+            "sessions": points[0]["sessions"] if self.wrapper.interleave_sessions else 1,
+        }
+        logger.info(f"Capacity profile: {points}")
+        return self.capacity_profile
+
+    def process_audio_frame(self, audio_frame: bytes, codebooks: int = NUM_CODEBOOKS) -> bytes:
+        """
+        Process incoming audio bytes and return generated audio bytes, decoding
+        `codebooks` audio codebooks (quality ladder rung).
+        """
+        reply = self.step_audio_frame(audio_frame, codebooks)
+        return reply.tobytes() if isinstance(reply, EgressChunk) else reply
+
+    def step_audio_frame(self, audio_frame: bytes, codebooks: int = NUM_CODEBOOKS) -> bytes | EgressChunk:
+        """
+        process_audio_frame() without waiting for the decoded audio to reach
+        the host: model output comes back as an EgressChunk that the caller
+        must read exactly once (the serving loop does so off the engine thread).
+        Raises EngineShutDown once the engine has been shut down.
+        """
+        self._check_running()
         if self.is_mock:
             # Mock: return low-volume noise
             return np.random.uniform(-0.1, 0.1, len(audio_frame) // 4).astype(np.float32).tobytes()
 
         try:
-            # Convert bytes to float32 numpy
-            audio_np = np.frombuffer(audio_frame, dtype=np.float32)
-
-            # Validate input
-            if not np.isfinite(audio_np).all():
+            # Validate, int16 auto-scale and clip (shared with the edge relay)
+            audio_np = sanitize_pcm(np.frombuffer(audio_frame, dtype=np.float32))
+            if audio_np is None:
                 logger.warning("Invalid audio data (NaN/Inf). Returning silence.")
-                return np.zeros_like(audio_np).tobytes()
-            
-            # Auto-scale if values look like Int16 misinterpreted as Float32
-            max_val = np.abs(audio_np).max()
-            if max_val > 5.0:
-                audio_np = audio_np / 32768.0
-
-            # Clip to [-1, 1]
-            audio_np = np.clip(audio_np, -1.0, 1.0)
+                return bytes(len(audio_frame))
             
             # Add to buffer
             self.buffer = np.concatenate((self.buffer, audio_np))
             
             # Process frames
             FRAME_SIZE = self.wrapper.frame_size if self.wrapper else 1920
-            output_audio = b""
+            self.egress.begin()
             
             while len(self.buffer) >= FRAME_SIZE:
                 chunk = self.buffer[:FRAME_SIZE]
@@ -295,29 +757,80 @@ class PersonaPlexEngine:
                     dtype=torch.float32
                 )
                 
-                out_tensor = self.wrapper.process(chunk_tensor)
+                out_tensor = self.wrapper.process(chunk_tensor, codebooks=codebooks)
                 
                 if out_tensor is not None:
-                    out_np = out_tensor.squeeze().cpu().numpy().astype(np.float32)
-                    output_audio += out_np.tobytes()
+                    self.egress.submit(out_tensor)
 
-            return output_audio
+            return self.egress.finish()
             
         except Exception as e:
             logger.error(f"Error in inference: {e}", exc_info=True)
             return b""
 
+    def process_codes(self, codes_frame: bytes) -> bytes:
+        """
+        Codes-in/codes-out step for edge relays: int16 [frames, 8] Mimi codes in,
+        int16 [steps, 9] tokens (text, then 8 audio codebooks) out. Skips the codec.
+        """
+        self._check_running()
+        codes = np.frombuffer(codes_frame, dtype="<i2").reshape(-1, NUM_CODEBOOKS)
+        if self.is_mock:
+            return np.zeros((len(codes), NUM_CODEBOOKS + 1), dtype="<i2").tobytes()
+
+        try:
+            codes_tensor = torch.from_numpy(codes.T.astype(np.int64)).unsqueeze(0).to(self.wrapper.device)
+            tokens = self.wrapper.step_codes(codes_tensor)
+            if tokens is None:
+                return b""
+            return tokens[0].T.to(torch.int16).cpu().numpy().astype("<i2").tobytes()
+        except Exception as e:
+            logger.error(f"Error in codes inference: {e}", exc_info=True)
+            return b""
+
     def reset(self):
         """Reset state for a new session."""
         self.buffer = np.array([], dtype=np.float32)
+        self.persona = None
+        self.voice_id = None
         if self.wrapper:
             self.wrapper.reset()
 
+    def checkpoint(self) -> dict:
+        """Capture the per-session state (input residue, streaming state, prompts) to host memory."""
+        return {
+            "buffer": self.buffer.copy(),
+            "persona": self.persona,
+            "voice_id": self.voice_id,
+            "wrapper": self.wrapper.get_state() if self.wrapper else None,
+        }
+
+    def restore(self, checkpoint: dict):
+        """Load a checkpoint taken with checkpoint() into the engine."""
+        self.buffer = checkpoint["buffer"]
+        if checkpoint["persona"] is not None or checkpoint["voice_id"] is not None:
+            self._set_prompts(checkpoint["persona"], checkpoint["voice_id"])
+        if self.wrapper and checkpoint["wrapper"] is not None:
+            self.wrapper.set_state(checkpoint["wrapper"])
+
+    def memory_bytes(self) -> int:
+        """Resident model memory of this engine (0 for the MOCK engine)."""
+        return self.wrapper.memory_bytes() if self.wrapper else 0
+
+    def _check_running(self):
+        # A replica's engine is shut down once drained; late steps must fail rather than get MOCK noise
+        if self.backend == "shutdown":
+            raise EngineShutDown("Engine was shut down")
+
     def shutdown(self):
-        """Shutdown the engine."""
+        """Shutdown the engine and free its model memory."""
         if self.wrapper:
             self.wrapper.close()
+        self.wrapper = None
+        self.egress = None
+        self.is_mock = True
+        self.backend = "shutdown"
 
 
 # Global Instance
-engine = PersonaPlexEngine()
+engine = PersonaPlexEngine(model_id=MODEL_TYPE)
@@ -0,0 +1,53 @@
+"""
+Optional per-frame binary header for end-to-end latency telemetry.
+
+Negotiated with `"frameHeader": true` in the config message. The server
+applies the config, then replies `{"type": "configured", "frameHeader": ...}`:
+binary messages it sends after that acknowledgement, and the ones it reads
+after the config, use the new format. Clients therefore hold their audio
+between sending the config and the acknowledgement. Once enabled, every
+binary message in both directions starts with a little-endian header
+followed by float32 PCM (both header sizes are multiples of 4 bytes, so the
+PCM can be viewed in place as a Float32Array):
+
+    client -> server (12 bytes):  u32 seq, f64 capture_ts
+    server -> client (44 bytes):  u32 seq, f64 capture_ts,
+                                  f64 server_recv, f64 compute_start,
+                                  f64 compute_end, f64 server_send
+
+`capture_ts` is the client's wall clock in ms and is echoed untouched; the
+server timestamps are the server's wall clock in ms. Clients only ever take
+differences within one clock, so the two clocks need not be synchronized:
+
+    round trip  = client_recv - capture_ts
+    server      = server_send - server_recv
+    compute     = compute_end - compute_start
+    network     = round trip - server
+
+The seq/capture_ts echoed on an output frame are those of the input frame
+whose engine step emitted it.
+"""
+
+import struct
+import time
+
+CLIENT_HEADER = struct.Struct("<Id")
+SERVER_HEADER = struct.Struct("<Iddddd")
+
+
+def now_ms() -> float:
+    return time.time() * 1000.0
+
+
+def split_client_frame(data: bytes) -> tuple[int, float, memoryview]:
+    """Return (seq, capture_ts, pcm payload) of a headered client message."""
+    if len(data) < CLIENT_HEADER.size:
+        raise ValueError(f"Binary message shorter than the {CLIENT_HEADER.size}-byte frame header")
+    seq, capture_ts = CLIENT_HEADER.unpack_from(data)
+    return seq, capture_ts, memoryview(data)[CLIENT_HEADER.size:]
+
+
+def pack_server_header(seq: int, capture_ts: float, server_recv: float,
+                       compute_start: float, compute_end: float) -> bytes:
+    """Build the header for an output frame; the send timestamp is taken now."""
+    return SERVER_HEADER.pack(seq, capture_ts, server_recv, compute_start, compute_end, now_ms())
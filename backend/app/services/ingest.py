@@ -0,0 +1,92 @@
+"""
+Frame-aligned ingest for the WebSocket audio stream.
+
+Clients may send audio in arbitrarily small messages (older frontends post
+every 128-sample render quantum). The aggregator coalesces them into whole
+model frames so the engine only runs once per frame, not once per message.
+"""
+
+import logging
+import time
+from dataclasses import dataclass, field
+
+import numpy as np
+
+from backend.app.core.config import CHUNK_SIZE, SAMPLE_RATE
+
+logger = logging.getLogger("PersonaPlex-Ingest")
+
+BYTES_PER_SAMPLE = 4  # float32 PCM
+FRAME_BYTES = CHUNK_SIZE * BYTES_PER_SAMPLE
+INT16_PEAK_THRESHOLD = 5.0  # Peaks above this are int16 sample values sent as float32
+
+
+def sanitize_pcm(samples: np.ndarray) -> np.ndarray | None:
+    """
+    Client float32 PCM as the codec expects it: None if it holds NaN/Inf,
+    rescaled if it looks like int16 values, clipped to [-1, 1].
+    """
+    if not np.isfinite(samples).all():
+        return None
+    if len(samples) and np.abs(samples).max() > INT16_PEAK_THRESHOLD:
+        samples = samples / 32768.0
+    return np.clip(samples, -1.0, 1.0)
+
+
+class FrameAggregator:
+    """Coalesces binary audio messages into whole frames before any engine work."""
+
+    def __init__(self, frame_bytes: int = FRAME_BYTES):
+        self.frame_bytes = frame_bytes
+        self._pending = bytearray()
+
+    def push(self, data: bytes) -> bytes | None:
+        """
+        Append a message. Returns all complete frames (as one contiguous
+        chunk) once at least one frame is available, otherwise None.
+        """
+        self._pending += data
+        if len(self._pending) < self.frame_bytes:
+            return None
+
+        ready = len(self._pending) - len(self._pending) % self.frame_bytes
+        frames = bytes(self._pending[:ready])
+        del self._pending[:ready]
+        return frames
+
+    def reset(self):
+        self._pending.clear()
+
+    @property
+    def pending_bytes(self) -> int:
+        return len(self._pending)
+
+
+@dataclass
+class IngestStats:
+    """Per-session ingest counters: message rate and server CPU per second of audio."""
+    started_at: float = field(default_factory=time.monotonic)
+    messages: int = 0
+    bytes_in: int = 0
+    engine_calls: int = 0
+    cpu_seconds: float = 0.0
+    bytes_per_second: float = BYTES_PER_SAMPLE * SAMPLE_RATE  # Input bytes per second of audio
+
+    def on_message(self, num_bytes: int):
+        self.messages += 1
+        self.bytes_in += num_bytes
+
+    @property
+    def audio_seconds(self) -> float:
+        return self.bytes_in / self.bytes_per_second
+
+    def summary(self) -> dict:
+        elapsed = max(time.monotonic() - self.started_at, 1e-9)
+        audio = self.audio_seconds
+        return {
+            "messages": self.messages,
+            "engine_calls": self.engine_calls,
+            "audio_seconds": round(audio, 3),
+            "messages_per_second": round(self.messages / elapsed, 2),
+            "cpu_ms_per_audio_second": round(1000 * self.cpu_seconds / audio, 3) if audio else None,
+        }
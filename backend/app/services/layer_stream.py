@@ -0,0 +1,328 @@
+"""
+Memory-mapped layer streaming for hosts with less memory than the model.
+
+The weights of a stack of transformer layers are written once to a flat
+file (one page-aligned block per layer, plus a JSON index) and the layers'
+own parameters are released. The file is memory-mapped; at any time only a
+window of `window` layers is materialized on the compute device:
+
+- before layer k runs, its weights must be resident (forward pre-hook),
+- a background thread then loads the next layers of the window (wrapping
+  around to layer 0 for the next step) while layer k computes,
+- layers that fall out of the window are released and their mapped pages
+  dropped (MADV_DONTNEED).
+
+The window is the running layer plus the layers prefetched behind it, so
+prefetching needs a window of at least 2. Without prefetch nothing is loaded
+ahead and nothing loaded earlier comes up again before a full pass over the
+stack, so only the running layer is kept resident, whatever the window.
+
+On CPU the parameters are zero-copy views of the mapping and "loading" a
+layer means faulting its pages in ahead of use; on an accelerator the layer
+is copied to the device and its pages are dropped right after the copy.
+Layers only run through their forward hooks: anything that replays the
+stack without calling the modules (CUDA graphs) bypasses the streaming.
+
+The layers may still be on the meta device with their weights supplied
+tensor by tensor (`source`), so a checkpoint can be turned into a layer file
+without ever materializing the whole stack. The index then records the
+checkpoint's size, mtime and SHA-256, and the layer file is rebuilt when any
+of them differs (a re-downloaded or replaced checkpoint with the same layer
+shapes would otherwise keep serving the old weights).
+
+Loads done by the prefetch thread that finish before the layer is needed
+are hits; a layer that is still loading is a wait; one that was never
+requested is loaded synchronously (a miss). Page faults are counted per load
+(getrusage of the loading thread), and the time of a full pass over the
+stack is recorded as the step time.
+"""
+
+import hashlib
+import json
+import logging
+import mmap
+import os
+import resource
+import threading
+import time
+import warnings
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable
+
+import numpy as np
+import torch
+from torch import nn
+
+logger = logging.getLogger("PersonaPlex-LayerStream")
+
+PAGE_SIZE = mmap.PAGESIZE
+RUSAGE_THREAD = getattr(resource, "RUSAGE_THREAD", resource.RUSAGE_SELF)
+
+
+def _align(offset: int) -> int:
+    return -(-offset // PAGE_SIZE) * PAGE_SIZE
+
+
+def checkpoint_fingerprint(path: str, chunk_bytes: int = 8 * 2**20) -> dict:
+    """Size, mtime and SHA-256 of the checkpoint file a layer file is built from."""
+    stat = os.stat(path)
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        while chunk := f.read(chunk_bytes):
+            digest.update(chunk)
+    return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "sha256": digest.hexdigest()}
+
+
+def write_layer_file(layers: nn.ModuleList, path: str,
+                     source: Callable[[int, str], torch.Tensor] | None = None,
+                     checkpoint: dict | None = None) -> dict:
+    """
+    Write every layer's parameters to `path` (one page-aligned block each) and
+    its index to `path`.json. `source(k, name)` supplies the weight of layer k's
+    parameter `name` instead of the layer itself (e.g. read lazily from a
+    checkpoint while the layers are on the meta device); one tensor is held at a time.
+    `checkpoint` (checkpoint_fingerprint) is recorded in the index.
+    """
+    index = {"checkpoint": checkpoint, "layers": []}
+    offset = 0
+    with open(path + ".tmp", "wb") as f:
+        for k, layer in enumerate(layers):
+            start = offset
+            tensors = []
+            for name, param in layer.named_parameters():
+                data = param if source is None else source(k, name)
+                if data.shape != param.shape:
+                    raise ValueError(f"Layer {k} {name}: weight of shape {list(data.shape)}, "
+                                     f"expected {list(param.shape)}")
+                data = data.detach().to("cpu", param.dtype).contiguous()
+                # Raw bytes of any dtype (bf16 has no numpy equivalent)
+                raw = data.view(torch.uint8).numpy().tobytes() if data.numel() else b""
+                tensors.append({"name": name, "dtype": str(data.dtype).removeprefix("torch."),
+                                "shape": list(data.shape), "offset": offset, "nbytes": len(raw)})
+                f.write(raw)
+                offset += len(raw)
+            padding = _align(offset) - offset
+            f.write(b"\0" * padding)
+            offset += padding
+            index["layers"].append({"offset": start, "nbytes": offset - start, "tensors": tensors})
+    os.replace(path + ".tmp", path)
+    with open(path + ".json", "w") as f:
+        json.dump(index, f)
+    return index
+
+
+class LayerStreamer:
+    """Keeps a sliding window of layers resident, streamed from a memory-mapped layer file."""
+
+    def __init__(self, layers: nn.ModuleList, path: str, window: int = 4, device: str | torch.device = "cpu",
+                 prefetch: bool = True, rebuild: bool = False,
+                 source: Callable[[int, str], torch.Tensor] | None = None, checkpoint: str | None = None):
+        if prefetch and window < 2:
+            raise ValueError("Prefetching needs a window of at least 2 layers (the running one and the next)")
+        if window < 1:
+            raise ValueError("The layer window must hold at least one layer")
+        self.layers = layers
+        self.path = path
+        # Without prefetch a wider window would only hold layers that are not needed until the next step
+        self.window = min(window, len(layers)) if prefetch else 1
+        self.device = torch.device(device)
+        self.prefetch = prefetch
+        self.zero_copy = self.device.type == "cpu"
+
+        # The checkpoint `source` reads from: the layer file must have been built from the same bytes
+        fingerprint = checkpoint_fingerprint(checkpoint) if checkpoint else None
+        if rebuild or not self._matches(path, layers, fingerprint):
+            os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+            write_layer_file(layers, path, source, fingerprint)
+        with open(path + ".json") as f:
+            self.index = json.load(f)["layers"]
+        self._file = open(path, "rb")
+        self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        # Release the in-memory weights: from now on they only live in the file
+        self._placeholders = {}
+        for k, layer in enumerate(layers):
+            for name, param in list(layer.named_parameters()):
+                self._placeholders[(k, name)] = torch.empty(0, dtype=param.dtype)
+                if param.is_meta:
+                    # A meta parameter cannot take real data: replace it with an empty one
+                    module_name, _, attr = name.rpartition(".")
+                    setattr(layer.get_submodule(module_name), attr,
+                            nn.Parameter(self._placeholders[(k, name)], requires_grad=param.requires_grad))
+                else:
+                    param.data = self._placeholders[(k, name)]
+
+        self._resident: deque[int] = deque()  # Layers currently materialized, oldest first
+        self._inflight: dict[int, Future] = {}
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="PersonaPlex-Prefetch")
+        self._lock = threading.Lock()
+        self._step_start: float | None = None
+        self.counters = {"hits": 0, "waits": 0, "misses": 0, "loads": 0, "evictions": 0,
+                         "bytes_loaded": 0, "major_faults": 0, "minor_faults": 0,
+                         "load_ms": 0.0, "wait_ms": 0.0, "steps": 0}
+        self._step_ms: deque[float] = deque(maxlen=1000)
+
+        self._hooks = []
+        for k, layer in enumerate(layers):
+            self._hooks.append(layer.register_forward_pre_hook(self._make_pre_hook(k)))
+        self._hooks.append(layers[-1].register_forward_hook(self._on_last_layer))
+        logger.info(f"Streaming {len(layers)} layers from {path} "
+                    f"({self.file_bytes / 2**20:.1f} MiB, window {self.window}, prefetch={prefetch})")
+
+    @staticmethod
+    def _matches(path: str, layers: nn.ModuleList, checkpoint: dict | None) -> bool:
+        """
+        Whether an existing layer file was built from the `checkpoint`
+        fingerprint (size, mtime and SHA-256) and has exactly these layers'
+        parameter names and shapes.
+        """
+        if not os.path.exists(path) or not os.path.exists(path + ".json"):
+            return False
+        with open(path + ".json") as f:
+            index = json.load(f)
+        if index.get("checkpoint") != checkpoint:
+            logger.info(f"Rebuilding {path}: source checkpoint changed "
+                        f"({index.get('checkpoint')} -> {checkpoint})")
+            return False
+        expected = [[(name, list(p.shape)) for name, p in layer.named_parameters()] for layer in layers]
+        return expected == [[(t["name"], t["shape"]) for t in entry["tensors"]] for entry in index["layers"]]
+
+    # --- Loading ---
+
+    def _load(self, k: int) -> dict[str, torch.Tensor]:
+        """Copy layer k from the mapped file to the device (runs on the prefetch thread or inline)."""
+        start = time.perf_counter()
+        usage = resource.getrusage(RUSAGE_THREAD)
+        entry = self.index[k]
+        tensors = {}
+        for spec in entry["tensors"]:
+            raw = np.frombuffer(self._mmap, dtype=np.uint8, count=spec["nbytes"], offset=spec["offset"])
+            if self.zero_copy:
+                raw[::PAGE_SIZE].max(initial=0)  # Fault the pages in now rather than during compute
+                with warnings.catch_warnings():
+                    warnings.simplefilter("ignore")  # Read-only mapping: the weights are never written
+                    tensor = torch.from_numpy(raw)
+            else:
+                tensor = torch.from_numpy(raw.copy())
+            tensors[spec["name"]] = tensor.view(getattr(torch, spec["dtype"])).view(spec["shape"]).to(self.device)
+        if not self.zero_copy:
+            # The copy is on the device: drop the layer's mapped pages
+            self._drop_pages(k)
+        after = resource.getrusage(RUSAGE_THREAD)
+        with self._lock:
+            self.counters["loads"] += 1
+            self.counters["bytes_loaded"] += entry["nbytes"]
+            self.counters["major_faults"] += after.ru_majflt - usage.ru_majflt
+            self.counters["minor_faults"] += after.ru_minflt - usage.ru_minflt
+            self.counters["load_ms"] += 1000 * (time.perf_counter() - start)
+        return tensors
+
+    def _drop_pages(self, k: int):
+        entry = self.index[k]
+        if entry["nbytes"] and hasattr(mmap, "MADV_DONTNEED"):
+            self._mmap.madvise(mmap.MADV_DONTNEED, entry["offset"], entry["nbytes"])
+
+    def _install(self, k: int, tensors: dict[str, torch.Tensor]):
+        for name, param in self.layers[k].named_parameters():
+            param.data = tensors[name]
+        self._resident.append(k)
+
+    def _evict(self, keep: set[int]):
+        for k in [k for k in self._resident if k not in keep]:
+            for name, param in self.layers[k].named_parameters():
+                param.data = self._placeholders[(k, name)]
+            self._resident.remove(k)
+            if self.zero_copy:
+                self._drop_pages(k)
+            self.counters["evictions"] += 1
+
+    def _window_after(self, k: int) -> list[int]:
+        """Layer k followed by the next window-1 layers (wrapping into the next step)."""
+        return [(k + i) % len(self.layers) for i in range(self.window)]
+
+    def ensure(self, k: int):
+        """Make layer k resident, then prefetch the rest of its window and release what fell out."""
+        window = self._window_after(k)
+        self._evict(set(window))
+        if k in self._resident:
+            self.counters["hits"] += 1
+        elif k in self._inflight:
+            future = self._inflight.pop(k)
+            if future.done():
+                self.counters["hits"] += 1
+            else:
+                self.counters["waits"] += 1
+                start = time.perf_counter()
+                future.result()
+                self.counters["wait_ms"] += 1000 * (time.perf_counter() - start)
+            self._install(k, future.result())
+        else:
+            self.counters["misses"] += 1
+            self._install(k, self._load(k))
+
+        if self.prefetch:
+            for j in window[1:]:
+                if j not in self._resident and j not in self._inflight:
+                    self._inflight[j] = self._executor.submit(self._load, j)
+
+    # --- Hooks ---
+
+    def _make_pre_hook(self, k: int):
+        def hook(module, args):
+            if k == 0:
+                self._step_start = time.perf_counter()
+            self.ensure(k)
+        return hook
+
+    def _on_last_layer(self, module, args, output):
+        if self._step_start is not None:
+            self._step_ms.append(1000 * (time.perf_counter() - self._step_start))
+            self.counters["steps"] += 1
+            self._step_start = None
+
+    # --- Reporting ---
+
+    @property
+    def file_bytes(self) -> int:
+        return sum(entry["nbytes"] for entry in self.index)
+
+    def resident_bytes(self) -> int:
+        """Layer weights materialized right now (installed layers and loads in flight)."""
+        return sum(self.index[k]["nbytes"] for k in {*self._resident, *self._inflight})
+
+    def stats(self) -> dict:
+        with self._lock:
+            counters = dict(self.counters)
+        accesses = counters["hits"] + counters["waits"] + counters["misses"]
+        steps = np.fromiter(self._step_ms, dtype=np.float64)
+        return {
+            "layers": len(self.layers),
+            "window": self.window,
+            "prefetch": self.prefetch,
+            "zero_copy": self.zero_copy,
+            "file_mb": round(self.file_bytes / 2**20, 1),
+            "resident_mb": round(self.resident_bytes() / 2**20, 1),
+            "prefetch_hit_rate": round(counters["hits"] / accesses, 4) if accesses else None,
+            "step_ms": {
+                "mean": round(float(steps.mean()), 3),
+                "p50": round(float(np.percentile(steps, 50)), 3),
+                "p95": round(float(np.percentile(steps, 95)), 3),
+            } if len(steps) else None,
+            **{k: round(v, 1) if isinstance(v, float) else v for k, v in counters.items()},
+        }
+
+    def close(self):
+        """Remove the hooks and release the mapping (the layers stay empty)."""
+        for hook in self._hooks:
+            hook.remove()
+        for future in self._inflight.values():
+            future.cancel()
+        self._executor.shutdown(wait=True)
+        self._evict(set())
+        self._inflight.clear()
+        try:
+            self._mmap.close()
+        except BufferError:
+            pass  # Zero-copy views still referenced elsewhere: the mapping goes when they do
+        self._file.close()
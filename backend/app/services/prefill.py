@@ -0,0 +1,153 @@
+"""
+Batched prompt prefill for bursts of session starts.
+
+A config message starts the session's conversation over and runs its voice
+and text prompt through the LM (PersonaPlexEngine.configure). When many
+users connect at once, prefilling them one by one makes the last caller wait
+for all the others. Instead, configs that arrive within
+PREFILL_BATCH_WINDOW_MS of the first one are collected per engine and
+prefilled as one engine job (PersonaPlexEngine.prefill_batch): a single
+batch-N stream in which rows sharing a voice or text prompt step through it
+together and each row is frozen outside its own prompt. The job takes every config pending when it starts (up to
+PREFILL_BATCH_MAX), so configs that arrive while the engine is busy join the
+next batch instead of queueing one by one. The per-session states are handed
+to the sessions as checkpoints and swapped in on their first frame. A config
+that finds nobody to batch with is applied as before.
+
+Only engines whose model supports the batched pass are batched
+(PersonaPlexEngine.batched_prefill: moshi's LMGen with its exec mask, the
+stand-in and the tiny model). On the others every config stays its own
+engine job.
+
+PREFILL_BATCH_WINDOW_MS=0 turns batching off.
+"""
+
+import asyncio
+import logging
+import threading
+import time
+from dataclasses import dataclass
+from functools import partial
+
+from backend.app.core.config import PREFILL_BATCH_WINDOW_MS, PREFILL_BATCH_MAX
+from backend.app.services.engine import PersonaPlexEngine
+from backend.app.services.scheduler import scheduler
+from backend.app.services.sessions import Session, SessionManager, SlotBusy
+from backend.app.services.telemetry import telemetry
+
+logger = logging.getLogger("PersonaPlex-Prefill")
+
+
+@dataclass
+class _Request:
+    sessions: SessionManager
+    session: Session
+    persona: str
+    voice: str
+    tier: str
+    future: asyncio.Future
+
+
+def _configure(sessions: SessionManager, session: Session, engine: PersonaPlexEngine, persona: str, voice: str):
+    """Serial path: prefill one session in the engine slot."""
+    sessions.activate(session)
+    engine.configure(persona, voice)
+
+
+def _configure_batch(engine: PersonaPlexEngine, batch: list[_Request]):
+    """Prefill a batch off-slot and give every session its resulting checkpoint."""
+    sessions = batch[0].sessions
+    sessions.release_slot()
+    checkpoints = engine.prefill_batch([(r.persona, r.voice) for r in batch])
+    for request, checkpoint in zip(batch, checkpoints):
+        sessions.install(request.session, checkpoint)
+
+
+class PrefillBatcher:
+    """Collects session configs per engine over a short window and prefills them together."""
+
+    def __init__(self, window_ms: float = PREFILL_BATCH_WINDOW_MS, max_batch: int = PREFILL_BATCH_MAX):
+        self.window = window_ms / 1000.0
+        self.max_batch = max_batch
+        self._pending: dict[int, list[_Request]] = {}  # Keyed by engine
+        self._flushes: dict[int, asyncio.Task] = {}  # Window, queued or running job per engine
+        self._lock = threading.Lock()  # Pending lists are taken on the engine thread
+        self.batch_sizes: dict[int, int] = {}  # Engine jobs per batch size
+        self.configs = 0
+
+    async def configure(self, tier: str, sessions: SessionManager, session: Session,
+                        engine: PersonaPlexEngine, persona: str, voice: str):
+        """Apply a session's config once it is prefilled (alone or with others arriving within the window)."""
+        self.configs += 1
+        start = time.monotonic()
+        if self.window <= 0 or self.max_batch <= 1 or not engine.batched_prefill:
+            await scheduler.run(tier, partial(_configure, sessions, session, engine, persona, voice), frame=False)
+            self._count(1)
+        else:
+            request = _Request(sessions, session, persona, voice, tier, asyncio.get_running_loop().create_future())
+            key = id(engine)
+            with self._lock:
+                self._pending.setdefault(key, []).append(request)
+            if key not in self._flushes:
+                self._flushes[key] = asyncio.create_task(self._flush(key, engine, delay=self.window))
+            await request.future
+        telemetry.record("config_prefill_ms", 1000 * (time.monotonic() - start))
+
+    async def _flush(self, key: int, engine: PersonaPlexEngine, delay: float):
+        await asyncio.sleep(delay)
+        with self._lock:
+            pending = list(self._pending.get(key, []))
+        # The job runs at the most urgent tier among the sessions waiting now
+        tier = next(t for t in scheduler.tiers if any(r.tier == t for r in pending))
+        batch = []
+        try:
+            _, start_ms, end_ms = await scheduler.run(tier, partial(self._run, key, engine, batch), frame=False)
+        except Exception as e:
+            if not isinstance(e, SlotBusy):  # Refused sessions are reported by the router
+                logger.error(f"Prefill of {len(batch)} sessions failed: {e}", exc_info=True)
+            for request in batch:
+                if not request.future.done():
+                    request.future.set_exception(e)
+        else:
+            if batch:
+                self._count(len(batch))
+                telemetry.record("prefill_job_ms", end_ms - start_ms)
+            for request in batch:
+                if not request.future.done():
+                    request.future.set_result(None)
+        finally:
+            del self._flushes[key]
+            if self._pending.get(key):
+                # Arrived while this job ran: they have waited long enough, no new window
+                self._flushes[key] = asyncio.create_task(self._flush(key, engine, delay=0.0))
+
+    def _run(self, key: int, engine: PersonaPlexEngine, batch: list[_Request]):
+        """Engine thread: take the configs pending now (fills `batch`) and prefill them."""
+        with self._lock:
+            pending = self._pending.get(key, [])
+            batch.extend(pending[:self.max_batch])
+            del pending[:self.max_batch]
+        if len(batch) == 1:
+            r = batch[0]
+            _configure(r.sessions, r.session, engine, r.persona, r.voice)
+        elif batch:
+            _configure_batch(engine, batch)
+
+    def _count(self, size: int):
+        self.batch_sizes[size] = self.batch_sizes.get(size, 0) + 1
+
+    def stats(self) -> dict:
+        jobs = sum(self.batch_sizes.values())
+        return {
+            "window_ms": round(1000 * self.window, 1),
+            "max_batch": self.max_batch,
+            "configs": self.configs,
+            "jobs": jobs,
+            "mean_batch": round(sum(size * n for size, n in self.batch_sizes.items()) / jobs, 2) if jobs else None,
+            "batch_sizes": dict(sorted(self.batch_sizes.items())),
+            "pending": sum(map(len, self._pending.values())),
+        }
+
+
+# Global Instance
+prefill = PrefillBatcher()
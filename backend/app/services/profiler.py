@@ -0,0 +1,224 @@
+"""
+On-demand profiling of the live serving loop.
+
+An admin can arm a capture for N seconds or N frames. While armed, the
+torch profiler records device/operator activity and a background thread
+samples the Python stacks of the event loop thread (the asyncio side) and
+of the scheduler's engine thread (the model steps). The torch profiler only
+records the thread it was started on, so it is started and stopped by
+scheduler jobs on the engine thread. When the capture ends both are written
+to disk as downloadable artifacts:
+
+- trace.json:   Chrome trace (open in chrome://tracing or Perfetto)
+- stacks.folded: collapsed stacks (feed to flamegraph.pl / speedscope)
+
+When disarmed the hot path only pays for a single attribute check.
+"""
+
+import asyncio
+import logging
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from functools import partial
+from pathlib import Path
+
+import torch
+
+from backend.app.core.config import PROFILE_DIR, PROFILE_MAX_SECONDS, PROFILE_SAMPLE_INTERVAL
+from backend.app.services.scheduler import scheduler
+
+logger = logging.getLogger("PersonaPlex-Profiler")
+
+ARTIFACTS = {
+    "trace": "trace.json",
+    "stacks": "stacks.folded",
+}
+
+
+class StackSampler:
+    """Periodically samples the Python stacks of some threads into collapsed stacks (rooted at the thread name)."""
+
+    def __init__(self, threads: dict[str, int], interval: float = PROFILE_SAMPLE_INTERVAL):
+        self.threads = threads
+        self.interval = interval
+        self.samples = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frames = sys._current_frames()
+            for name, thread_id in self.threads.items():
+                frame = frames.get(thread_id)
+                if frame is None:
+                    continue
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append(f"{code.co_name} ({Path(code.co_filename).name}:{frame.f_lineno})")
+                    frame = frame.f_back
+                stack.append(name)
+                self.samples[";".join(reversed(stack))] += 1
+
+    def write_folded(self, path: Path):
+        with open(path, "w") as f:
+            for stack, count in self.samples.most_common():
+                f.write(f"{stack} {count}\n")
+
+
+def _start_on_engine_thread(profiler) -> int:
+    """Scheduler job: start the torch profiler on the engine thread and return the thread's id."""
+    profiler.start()
+    return threading.get_ident()
+
+
+class ProfilerCapture:
+    """
+    Single-slot profiler capture of the real serving loop.
+
+    Only one capture can be armed at a time. The serving loop calls
+    `on_frame()` after each processed frame while `armed` is True.
+    """
+
+    def __init__(self, output_dir: str = PROFILE_DIR):
+        self.output_dir = Path(output_dir)
+        self.armed = False
+        self.captures: dict[str, dict] = {}
+        self._busy = False  # From arm() until the capture is exported or failed to start
+        self._current: dict | None = None
+        self._profiler = None
+        self._sampler = None
+        self._timer = None
+        self._stopping: asyncio.Task | None = None
+
+    @staticmethod
+    def _tier() -> str:
+        # Start/stop are short; the top tier keeps queued frames from shifting the capture window
+        return next(iter(scheduler.tiers))
+
+    async def arm(self, seconds: float | None = None, frames: int | None = None) -> dict:
+        """
+        Start a capture that disarms itself after `seconds` or `frames`,
+        whichever comes first. Must be called from the event loop thread.
+        """
+        if self._busy:
+            raise RuntimeError("A profiler capture is already running.")
+        self._busy = True
+        if seconds is None and frames is None:
+            seconds = 10.0
+        seconds = min(seconds, PROFILE_MAX_SECONDS) if seconds is not None else PROFILE_MAX_SECONDS
+
+        capture_id = uuid.uuid4().hex[:12]
+        capture_dir = self.output_dir / capture_id
+        try:
+            capture_dir.mkdir(parents=True, exist_ok=True)
+            activities = [torch.profiler.ProfilerActivity.CPU]
+            if torch.cuda.is_available():
+                activities.append(torch.profiler.ProfilerActivity.CUDA)
+            profiler = torch.profiler.profile(activities=activities, record_shapes=True)
+            engine_thread, _, _ = await scheduler.run(
+                self._tier(), partial(_start_on_engine_thread, profiler), frame=False
+            )
+        except Exception:
+            self._busy = False
+            raise
+
+        self._profiler = profiler
+        self._sampler = StackSampler({"event-loop": threading.get_ident(), "engine": engine_thread})
+        self._sampler.start()
+        self._current = {
+            "id": capture_id,
+            "status": "running",
+            "started_at": time.time(),
+            "seconds": seconds,
+            "frames_target": frames,
+            "frames": 0,
+            "dir": capture_dir,
+        }
+        self.captures[capture_id] = self._current
+        self._timer = asyncio.get_running_loop().call_later(seconds, self.disarm, "timeout")
+        self.armed = True
+
+        logger.info(f"Profiler armed: {capture_id} (seconds={seconds}, frames={frames})")
+        return self.describe(self._current)
+
+    def on_frame(self):
+        """Hot-path hook: count one serving frame."""
+        capture = self._current
+        capture["frames"] += 1
+        if capture["frames_target"] is not None and capture["frames"] >= capture["frames_target"]:
+            self.disarm("frames")
+
+    def disarm(self, reason: str = "manual"):
+        """Stop the running capture (the torch profiler by an engine job) and export its artifacts."""
+        if not self.armed:
+            return
+        self.armed = False
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+        profiler, sampler, capture = self._profiler, self._sampler, self._current
+        self._profiler = self._sampler = self._current = None
+
+        sampler.stop()
+        capture["status"] = "stopping"
+        capture["stopped_at"] = time.time()
+        capture["reason"] = reason
+        self._stopping = asyncio.get_running_loop().create_task(self._finish(profiler, sampler, capture))
+
+    async def _finish(self, profiler, sampler, capture: dict):
+        try:
+            await scheduler.run(self._tier(), profiler.stop, frame=False)
+            capture["status"] = "exporting"
+            # Trace export can take a while for long captures; keep it off the event loop.
+            await asyncio.to_thread(self._export, profiler, sampler, capture)
+        except Exception as e:
+            capture["status"] = "failed"
+            capture["error"] = str(e)
+            logger.error(f"Failed to stop profiler capture {capture['id']}: {e}")
+        finally:
+            self._busy = False
+
+    def _export(self, profiler, sampler, capture: dict):
+        try:
+            profiler.export_chrome_trace(str(capture["dir"] / ARTIFACTS["trace"]))
+            sampler.write_folded(capture["dir"] / ARTIFACTS["stacks"])
+            capture["status"] = "ready"
+            logger.info(f"Profiler capture {capture['id']} ready ({capture['frames']} frames)")
+        except Exception as e:
+            capture["status"] = "failed"
+            capture["error"] = str(e)
+            logger.error(f"Failed to export profiler capture {capture['id']}: {e}")
+
+    def artifact_path(self, capture_id: str, artifact: str) -> Path | None:
+        """Return the path of a finished artifact, or None if unavailable."""
+        capture = self.captures.get(capture_id)
+        if capture is None or capture["status"] != "ready" or artifact not in ARTIFACTS:
+            return None
+        return capture["dir"] / ARTIFACTS[artifact]
+
+    def status(self) -> dict:
+        return {
+            "armed": self.armed,
+            "current": self.describe(self._current) if self._current else None,
+            "captures": [self.describe(c) for c in self.captures.values()],
+        }
+
+    @staticmethod
+    def describe(capture: dict) -> dict:
+        return {k: v for k, v in capture.items() if k != "dir"}
+
+
+# Global Instance
+profiler = ProfilerCapture()
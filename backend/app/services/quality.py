@@ -0,0 +1,241 @@
+"""
+Adaptive audio-quality ladder.
+
+Each rung decodes fewer of the LM's 8 audio codebooks through Mimi (the
+residual quantizer simply sums fewer codebooks, trading fidelity for decode
+time). Two governors pick the rung:
+
+- node:    compute-busy time / wall time across all sessions on this node
+- session: a session's own compute time / audio time it produced
+
+A governor steps down one rung when its real-time factor (RTF) reaches
+QUALITY_STEP_DOWN_RTF and back up when it falls below QUALITY_STEP_UP_RTF.
+The gap between the two thresholds plus a minimum hold time per rung is the
+hysteresis that keeps it from flapping. A session decodes at the lower of
+the two rungs (QUALITY_MODE can restrict this to one governor or disable it).
+
+Per session, time and frames at each rung are accounted, together with the
+compute saved against the full-quality rung. The cost per frame at each rung
+is kept per engine (RungCosts: model variants differ), seeded by the warmup
+calibration in PersonaPlexEngine and updated from the session's frames.
+"""
+
+import logging
+import time
+from dataclasses import dataclass, field
+
+from backend.app.core.config import (
+    QUALITY_LADDER, QUALITY_MODE, QUALITY_STEP_DOWN_RTF, QUALITY_STEP_UP_RTF,
+    QUALITY_HOLD_SECONDS, QUALITY_WINDOW_SECONDS,
+)
+from backend.app.services.telemetry import telemetry
+
+logger = logging.getLogger("PersonaPlex-Quality")
+
+FRAME_SECONDS = 0.08  # Audio per model frame
+EWMA_ALPHA = 0.1  # Smoothing of the per-rung frame cost
+
+
+class Governor:
+    """One RTF window plus the rung it currently selects (with hysteresis)."""
+
+    def __init__(self, num_levels: int, step_down_rtf: float, step_up_rtf: float,
+                 hold_seconds: float, window_seconds: float):
+        self.num_levels = num_levels
+        self.step_down_rtf = step_down_rtf
+        self.step_up_rtf = step_up_rtf
+        self.hold_seconds = hold_seconds
+        self.window_seconds = window_seconds
+        self.level = 0
+        self.rtf: float | None = None
+        self.changes = 0
+        self._busy = 0.0
+        self._span = 0.0
+        self._window_start = time.monotonic()
+        self._last_change = float("-inf")
+
+    def add(self, busy: float, span: float | None = None) -> bool:
+        """
+        Account `busy` compute seconds. `span` is the time they are measured
+        against (wall time since the window started when None). Returns True
+        when the rung changed.
+        """
+        now = time.monotonic()
+        self._busy += busy
+        if span is not None:
+            self._span += span
+        elapsed = now - self._window_start
+        if elapsed < self.window_seconds:
+            return False
+
+        span_total = self._span if span is not None else elapsed
+        self.rtf = self._busy / span_total if span_total > 0 else 0.0
+        self._busy = self._span = 0.0
+        self._window_start = now
+        if now - self._last_change < self.hold_seconds:
+            return False
+        if self.rtf >= self.step_down_rtf and self.level < self.num_levels - 1:
+            self.level += 1
+        elif self.rtf < self.step_up_rtf and self.level > 0:
+            self.level -= 1
+        else:
+            return False
+        self._last_change = now
+        self.changes += 1
+        return True
+
+
+class RungCosts:
+    """Compute per frame at each rung (EWMA) on one engine."""
+
+    def __init__(self):
+        self.frame_ms: dict[int, float] = {}
+
+    def seed(self, level: int, frame_ms: float):
+        self.frame_ms[level] = frame_ms
+
+    def update(self, level: int, frame_ms: float):
+        previous = self.frame_ms.get(level)
+        self.frame_ms[level] = frame_ms if previous is None else previous + EWMA_ALPHA * (frame_ms - previous)
+
+    def saved_ms(self, level: int, frames: int) -> float | None:
+        """Compute saved by `frames` frames at `level` vs. full quality (None until both are measured)."""
+        if level == 0:
+            return 0.0
+        if 0 not in self.frame_ms or level not in self.frame_ms:
+            return None
+        return max(0.0, self.frame_ms[0] - self.frame_ms[level]) * frames
+
+    def describe(self, levels: list[int]) -> dict:
+        return {levels[lv]: round(ms, 2) for lv, ms in sorted(self.frame_ms.items())}
+
+
+@dataclass
+class SessionQuality:
+    """Per-session ladder state and accounting."""
+    session_id: str
+    governor: Governor
+    costs: RungCosts  # Of the engine the session runs on (replaced on a model switch)
+    level: int = 0  # Rung in effect (lower of node and session governor)
+    since: float = field(default_factory=time.monotonic)
+    seconds: dict[int, float] = field(default_factory=dict)  # Wall time per rung
+    frames: dict[int, int] = field(default_factory=dict)  # Frames decoded per rung
+    compute_ms: dict[int, float] = field(default_factory=dict)  # Compute spent per rung
+    saved_ms: dict[int, float] = field(default_factory=dict)  # Compute saved per rung (once costs are known)
+
+
+class QualityLadder:
+    """Decoded-codebook ladder driven by node and per-session real-time factors."""
+
+    def __init__(self, levels: list[int] = QUALITY_LADDER, mode: str = QUALITY_MODE,
+                 step_down_rtf: float = QUALITY_STEP_DOWN_RTF, step_up_rtf: float = QUALITY_STEP_UP_RTF,
+                 hold_seconds: float = QUALITY_HOLD_SECONDS, window_seconds: float = QUALITY_WINDOW_SECONDS):
+        if mode not in ("both", "node", "session", "off"):
+            raise ValueError(f"Unknown quality mode: {mode}")
+        if step_up_rtf >= step_down_rtf:
+            raise ValueError("QUALITY_STEP_UP_RTF must be below QUALITY_STEP_DOWN_RTF (hysteresis)")
+        self.levels = levels
+        self.mode = mode
+        self._governor_args = (len(levels), step_down_rtf, step_up_rtf, hold_seconds, window_seconds)
+        self.node = Governor(*self._governor_args)
+        self.sessions: dict[str, SessionQuality] = {}  # Live sessions
+        self.totals = {"sessions": 0, "seconds": {}, "frames": {}, "saved_ms": {}}
+
+    # --- Session lifecycle ---
+
+    def open(self, session_id: str, costs: RungCosts) -> SessionQuality:
+        session = SessionQuality(session_id, Governor(*self._governor_args), costs, level=self._target(None))
+        self.sessions[session_id] = session
+        return session
+
+    def codebooks(self, quality: SessionQuality) -> int:
+        return self.levels[quality.level]
+
+    def _target(self, quality: SessionQuality | None) -> int:
+        node = self.node.level if self.mode in ("both", "node") else 0
+        session = quality.governor.level if quality and self.mode in ("both", "session") else 0
+        return max(node, session)
+
+    def observe(self, quality: SessionQuality, compute_seconds: float, frames: int = 1) -> int | None:
+        """
+        Account one engine call of a session (`frames` model frames decoded at
+        its current rung). Returns the new codebook count if the rung changed.
+        """
+        level = quality.level
+        quality.frames[level] = quality.frames.get(level, 0) + frames
+        quality.compute_ms[level] = quality.compute_ms.get(level, 0.0) + 1000 * compute_seconds
+        if frames:
+            quality.costs.update(level, 1000 * compute_seconds / frames)
+        saved = quality.costs.saved_ms(level, frames)
+        if saved is not None:
+            quality.saved_ms[level] = quality.saved_ms.get(level, 0.0) + saved
+
+        self.node.add(compute_seconds)
+        quality.governor.add(compute_seconds, frames * FRAME_SECONDS)
+        target = self._target(quality)
+        if target == level:
+            return None
+        self._close_interval(quality)
+        quality.level = target
+        logger.info(f"Quality rung {level} -> {target} ({self.levels[target]} codebooks, "
+                    f"node RTF {self.node.rtf}, session RTF {quality.governor.rtf})")
+        return self.levels[target]
+
+    def close(self, quality: SessionQuality):
+        """Fold a finished session into the node totals and telemetry."""
+        self.sessions.pop(quality.session_id, None)
+        self._close_interval(quality)
+        report = self.report(quality)
+        self.totals["sessions"] += 1
+        for key in ("seconds", "frames", "saved_ms"):
+            for codebooks, value in report[key].items():
+                self.totals[key][codebooks] = self.totals[key].get(codebooks, 0) + (value or 0)
+        for codebooks, seconds in report["seconds"].items():
+            telemetry.increment(f"quality_{codebooks}cb_seconds", seconds)
+        if report["saved_ms_total"]:
+            telemetry.increment("quality_saved_ms", report["saved_ms_total"])
+        return report
+
+    def _close_interval(self, quality: SessionQuality):
+        now = time.monotonic()
+        quality.seconds[quality.level] = quality.seconds.get(quality.level, 0.0) + now - quality.since
+        quality.since = now
+
+    # --- Reporting ---
+
+    def report(self, quality: SessionQuality) -> dict:
+        seconds = dict(quality.seconds)
+        seconds[quality.level] = seconds.get(quality.level, 0.0) + time.monotonic() - quality.since
+        saved = {self.levels[lv]: quality.saved_ms.get(lv) for lv in sorted(quality.frames)}
+        return {
+            "codebooks": self.levels[quality.level],
+            "session_rtf": _round(quality.governor.rtf),
+            "seconds": {self.levels[lv]: round(s, 2) for lv, s in sorted(seconds.items())},
+            "frames": {self.levels[lv]: n for lv, n in sorted(quality.frames.items())},
+            "compute_ms": {self.levels[lv]: round(ms, 1) for lv, ms in sorted(quality.compute_ms.items())},
+            "saved_ms": {cb: _round(ms, 1) for cb, ms in saved.items()},
+            "saved_ms_total": round(sum(ms or 0.0 for ms in saved.values()), 1),
+        }
+
+    def stats(self) -> dict:
+        return {
+            "mode": self.mode,
+            "ladder": self.levels,
+            "node_codebooks": self.levels[self.node.level],
+            "node_rtf": _round(self.node.rtf),
+            "node_changes": self.node.changes,
+            "sessions": {sid: self.report(q) for sid, q in self.sessions.items()},
+            "closed_sessions": {
+                "sessions": self.totals["sessions"],
+                **{key: {cb: round(v, 2) for cb, v in sorted(self.totals[key].items(), reverse=True)}
+                   for key in ("seconds", "frames", "saved_ms")},
+            },
+        }
+
+
+def _round(value: float | None, digits: int = 3) -> float | None:
+    return None if value is None else round(value, digits)
+
+
+# Global Instance
+quality = QualityLadder()
@@ -0,0 +1,221 @@
+"""
+Engine replicas and zero-downtime hot swap.
+
+A reload loads a new PersonaPlexEngine (checkpoint and/or voice pack) in a
+background thread while the current replica keeps serving. Once it is ready,
+new sessions are routed to it and the previous replica starts draining: its
+live sessions continue until they disconnect or the drain timeout expires
+(remaining sockets are then closed with 1012 "service restart" so clients
+reconnect to the new replica). The engine is only shut down once those
+sessions have left (or after CLOSE_GRACE_SECONDS), by a scheduler job, so
+steps already queued for it run first; a socket still bound to a retired
+replica is closed by its serving loop, and a step that still reaches the
+shut-down engine fails (EngineShutDown) instead of returning MOCK output.
+A drained replica's model memory is freed.
+"""
+
+import asyncio
+import logging
+import time
+
+from fastapi import WebSocket
+
+from backend.app.core.config import ENGINE_BACKEND, DRAIN_TIMEOUT, MODEL_TYPE
+from backend.app.services.engine import engine, PersonaPlexEngine
+from backend.app.services.scheduler import scheduler
+from backend.app.services.sessions import Session, SessionManager
+
+logger = logging.getLogger("PersonaPlex-Replicas")
+
+CLOSE_GRACE_SECONDS = 5.0  # Wait for force-closed sessions to leave before shutting the engine down
+
+
+class Replica:
+    """One loaded engine plus the sessions bound to it."""
+
+    def __init__(self, generation: int, engine: PersonaPlexEngine, model_id: str | None = None,
+                 voice_prompt_dir: str | None = None):
+        self.generation = generation
+        self.engine = engine
+        self.sessions = SessionManager(engine)
+        self.model_id = model_id
+        self.voice_prompt_dir = voice_prompt_dir
+        self.state = "active"
+        self.connections: set[WebSocket] = set()
+        self.loaded_at = time.time()
+        self.drain_started: float | None = None
+        self.drain_timeout: float | None = None
+        self._drained = asyncio.Event()
+
+    def describe(self) -> dict:
+        drain = None
+        if self.drain_started is not None:
+            drain = {
+                "elapsed_s": round(time.time() - self.drain_started, 1),
+                "timeout_s": self.drain_timeout,
+                "remaining_sessions": len(self.connections),
+            }
+        return {
+            "generation": self.generation,
+            "state": self.state,
+            "backend": self.engine.backend,
+            "model_id": self.model_id,
+            "voice_prompt_dir": self.voice_prompt_dir,
+            "sessions": len(self.connections),
+            "loaded_at": self.loaded_at,
+            "drain": drain,
+        }
+
+
+class ReplicaManager:
+    """Routes new sessions of one model variant to its active replica and drains replaced ones."""
+
+    def __init__(self, initial_engine: PersonaPlexEngine, model_id: str = MODEL_TYPE):
+        self.model_id = model_id
+        self.active = Replica(0, initial_engine, model_id)
+        self.replicas: list[Replica] = [self.active]
+        self.loading: dict | None = None
+        self._generation = 0
+        self._task: asyncio.Task | None = None
+
+    # --- Session routing ---
+
+    def holds(self, token: str) -> bool:
+        return any(r.state != "retired" and token in r.sessions.sessions for r in self.replicas)
+
+    def open_session(self, websocket: WebSocket, token: str | None = None) -> tuple[Replica, Session, bool]:
+        """Resume `token` on whichever live replica holds it, else start on the active one."""
+        if token:
+            for replica in self.replicas:
+                if replica.state != "retired" and token in replica.sessions.sessions:
+                    session, resumed = replica.sessions.open(token)
+                    if resumed:
+                        replica.connections.add(websocket)
+                        return replica, session, True
+
+        replica = self.active
+        session, _ = replica.sessions.open()
+        replica.connections.add(websocket)
+        return replica, session, False
+
+    def close_session(self, replica: Replica, websocket: WebSocket, session: Session, resumable: bool = True):
+        if resumable:
+            replica.sessions.park(session)
+        else:
+            replica.sessions.drop(session)
+        replica.connections.discard(websocket)
+        if replica.state == "draining" and not replica.connections:
+            replica._drained.set()
+
+    # --- Hot swap ---
+
+    async def reload(self, backend: str = ENGINE_BACKEND, model_id: str | None = None,
+                     voice_prompt_dir: str | None = None, drain_timeout: float = DRAIN_TIMEOUT):
+        """
+        Start loading a new replica in the background. Raises if a reload is in progress.
+        `model_id` overrides the checkpoint (defaults to this variant's model).
+        """
+        if self.loading is not None and self.loading["status"] == "loading":
+            raise RuntimeError("A reload is already in progress.")
+        self.loading = {
+            "status": "loading",
+            "backend": backend,
+            "model_id": model_id,
+            "voice_prompt_dir": voice_prompt_dir,
+            "started_at": time.time(),
+        }
+        self._task = asyncio.create_task(self._reload(backend, model_id, voice_prompt_dir, drain_timeout))
+        return self.loading
+
+    async def _reload(self, backend, model_id, voice_prompt_dir, drain_timeout):
+        loop = asyncio.get_running_loop()
+        try:
+            new_engine = await loop.run_in_executor(
+                None, lambda: PersonaPlexEngine(
+                    backend, model_id=model_id or self.model_id, voice_prompt_dir=voice_prompt_dir,
+                    step_runner=scheduler.timed_runner(loop),  # Calibrate between live steps
+                )
+            )
+        except Exception as e:
+            logger.error(f"Reload failed: {e}", exc_info=True)
+            self.loading.update(status="failed", error=str(e))
+            return
+
+        # The engine falls back to MOCK on load errors; never swap that in.
+        if new_engine.backend != backend:
+            new_engine.shutdown()
+            self.loading.update(status="failed", error=f"Engine came up as '{new_engine.backend}', not '{backend}'")
+            logger.error(f"Reload failed: {self.loading['error']}")
+            return
+
+        self._generation += 1
+        replica = Replica(self._generation, new_engine, model_id or self.model_id, voice_prompt_dir)
+        old, self.active = self.active, replica
+        self.replicas.append(replica)
+        self.loading.update(status="ready", generation=replica.generation, finished_at=time.time())
+        logger.info(f"Replica {replica.generation} active; draining replica {old.generation}")
+
+        await self._drain(old, drain_timeout)
+
+    async def _drain(self, replica: Replica, timeout: float):
+        replica.state = "draining"
+        replica.drain_started = time.time()
+        replica.drain_timeout = timeout
+        if replica.connections:
+            try:
+                await asyncio.wait_for(replica._drained.wait(), timeout)
+            except asyncio.TimeoutError:
+                logger.warning(
+                    f"Drain timeout for replica {replica.generation}: closing {len(replica.connections)} sessions"
+                )
+                for websocket in list(replica.connections):
+                    try:
+                        await websocket.close(code=1012)  # Service restart: reconnect
+                    except Exception:
+                        pass
+                # Let their serving loops finish the step in flight before the engine goes away
+                try:
+                    await asyncio.wait_for(replica._drained.wait(), CLOSE_GRACE_SECONDS)
+                except asyncio.TimeoutError:
+                    logger.warning(f"{len(replica.connections)} sessions still on replica {replica.generation}")
+        replica.state = "retired"  # No new steps are submitted for it
+        # Queued steps for this engine run before the shutdown (lowest tier)
+        await scheduler.run(next(reversed(scheduler.tiers)), replica.engine.shutdown, frame=False)
+        self._retire(replica)
+
+    def _retire(self, replica: Replica):
+        replica.state = "retired"
+        replica.connections.clear()
+        replica.sessions.sessions.clear()
+        replica.sessions.owner = None
+        replica.engine.shutdown()
+        self.replicas.remove(replica)
+        logger.info(f"Replica {replica.generation} retired; model memory released")
+
+    @property
+    def connections(self) -> int:
+        return sum(len(r.connections) for r in self.replicas)
+
+    @property
+    def idle_sessions(self) -> int:
+        return sum(r.sessions.idle() for r in self.replicas)
+
+    def memory_bytes(self) -> int:
+        return sum(r.engine.memory_bytes() for r in self.replicas)
+
+    def shutdown(self):
+        """Free every replica of this variant (residency eviction)."""
+        for replica in list(self.replicas):
+            self._retire(replica)
+
+    def status(self) -> dict:
+        return {
+            "model_id": self.model_id,
+            "active_generation": self.active.generation,
+            "replicas": [r.describe() for r in self.replicas],
+            "loading": self.loading,
+        }
+
+
+# Global Instance (default model variant)
+replicas = ReplicaManager(engine, MODEL_TYPE)
@@ -0,0 +1,247 @@
+"""
+Model residency: several checkpoints served from one process.
+
+Each model variant (MODEL_VARIANTS) gets its own ReplicaManager once loaded.
+The default variant (MODEL_TYPE) is the global `replicas` and stays pinned;
+other variants are loaded on first request in a background thread while the
+requesting sessions wait on the same load, and idle variants (no connected
+sessions) are evicted least-recently-used first whenever a load would exceed
+MODEL_MEMORY_BUDGET_GB. A load reserves its estimated footprint under a lock
+before it starts, so concurrent loads of different variants cannot both fit
+into the same free budget; once loaded, the measured footprint must fit as
+well or the new variant is unloaded again.
+"""
+
+import asyncio
+import logging
+import time
+
+from fastapi import WebSocket
+
+from backend.app.core.config import ENGINE_BACKEND, MODEL_VARIANTS, MODEL_MEMORY_BUDGET_GB
+from backend.app.services.engine import PersonaPlexEngine
+from backend.app.services.replicas import Replica, ReplicaManager, replicas
+from backend.app.services.scheduler import scheduler
+from backend.app.services.sessions import Session
+
+logger = logging.getLogger("PersonaPlex-Residency")
+
+
+class ModelResidency:
+    """Residency bookkeeping for one model variant."""
+
+    def __init__(self, model_id: str, pinned: bool = False):
+        self.model_id = model_id
+        self.pinned = pinned
+        self.manager: ReplicaManager | None = None
+        self.state = "cold"  # "cold", "loading" or "resident"
+        self.loads = 0
+        self.evictions = 0
+        self.footprint_bytes = 0  # Last measured footprint (used to plan future loads)
+        self.resident_since: float | None = None
+        self.resident_seconds = 0.0  # Accumulated over previous residencies
+        self.last_used = 0.0
+        self.last_error: str | None = None
+        self._load: asyncio.Future | None = None
+
+    def mark_resident(self, manager: ReplicaManager):
+        self.manager = manager
+        self.state = "resident"
+        self.footprint_bytes = manager.memory_bytes()
+        self.resident_since = time.time()
+        self.last_used = time.monotonic()
+
+    def mark_cold(self):
+        if self.resident_since is not None:
+            self.resident_seconds += time.time() - self.resident_since
+        self.manager = None
+        self.state = "cold"
+        self.resident_since = None
+
+    def describe(self) -> dict:
+        residency = self.resident_seconds
+        if self.resident_since is not None:
+            residency += time.time() - self.resident_since
+        return {
+            "model_id": self.model_id,
+            "state": self.state,
+            "pinned": self.pinned,
+            "loads": self.loads,
+            "evictions": self.evictions,
+            "residency_s": round(residency, 1),
+            "idle_s": round(time.monotonic() - self.last_used, 1) if self.state == "resident" else None,
+            "footprint_mb": round(self.footprint_bytes / 2**20, 1),
+            "sessions": self.manager.connections if self.manager else 0,
+            "last_error": self.last_error,
+        }
+
+
+class ResidencyManager:
+    """Keeps the hot model variants loaded within the memory budget."""
+
+    def __init__(self, default: ReplicaManager, variants: list[str] = MODEL_VARIANTS,
+                 budget_bytes: int = int(MODEL_MEMORY_BUDGET_GB * 2**30)):
+        self.default = default
+        self.budget_bytes = budget_bytes
+        self.models: dict[str, ModelResidency] = {
+            model_id: ModelResidency(model_id) for model_id in variants if model_id
+        }
+        pinned = self.models.setdefault(default.model_id, ModelResidency(default.model_id))
+        pinned.pinned = True
+        pinned.loads = 1
+        pinned.mark_resident(default)
+        self._reserved: dict[str, int] = {}  # Budget held by loads in progress
+        self._budget_lock = asyncio.Lock()
+
+    # --- Lookup ---
+
+    def _residency(self, model_id: str) -> ModelResidency:
+        residency = self.models.get(model_id)
+        if residency is None:
+            raise KeyError(f"Unknown model variant '{model_id}'. Available: {sorted(self.models)}")
+        return residency
+
+    def resident(self) -> list[ModelResidency]:
+        return [r for r in self.models.values() if r.state == "resident"]
+
+    def is_resident(self, model_id: str) -> bool:
+        return self._residency(model_id).state == "resident"
+
+    def used_bytes(self) -> int:
+        return sum(r.manager.memory_bytes() for r in self.resident())
+
+    def reserved_bytes(self) -> int:
+        return sum(self._reserved.values())
+
+    # --- Loading and eviction ---
+
+    async def acquire(self, model_id: str) -> ReplicaManager:
+        """
+        Return the ReplicaManager for `model_id`, loading it if it is cold.
+        Concurrent callers for the same cold variant wait on a single load.
+        Raises KeyError for unknown variants and RuntimeError if the load fails
+        or the budget cannot be met.
+        """
+        residency = self._residency(model_id)
+        if residency.state == "resident":
+            residency.last_used = time.monotonic()
+            return residency.manager
+        if residency._load is None:
+            residency._load = asyncio.ensure_future(self._load_variant(residency))
+        return await asyncio.shield(residency._load)
+
+    async def _load_variant(self, residency: ModelResidency) -> ReplicaManager:
+        residency.state = "loading"
+        residency.last_error = None
+        try:
+            # Plan with the last measured footprint, else assume the largest resident one
+            estimate = residency.footprint_bytes or max(
+                (r.footprint_bytes for r in self.resident()), default=0
+            )
+            async with self._budget_lock:
+                self._make_room(estimate, keep=residency.model_id)
+                self._reserved[residency.model_id] = estimate
+
+            loop = asyncio.get_running_loop()
+            start = time.perf_counter()
+            new_engine = await loop.run_in_executor(
+                None, lambda: PersonaPlexEngine(
+                    ENGINE_BACKEND, model_id=residency.model_id,
+                    step_runner=scheduler.timed_runner(loop),  # Calibrate between live steps
+                )
+            )
+            # The engine falls back to MOCK on load errors; never serve that as the variant.
+            if new_engine.backend != ENGINE_BACKEND:
+                new_engine.shutdown()
+                raise RuntimeError(f"Engine came up as '{new_engine.backend}', not '{ENGINE_BACKEND}'")
+
+            async with self._budget_lock:
+                # Swap the reservation for the measured footprint, which must fit too
+                del self._reserved[residency.model_id]
+                try:
+                    self._make_room(new_engine.memory_bytes(), keep=residency.model_id)
+                except RuntimeError:
+                    new_engine.shutdown()
+                    raise
+                residency.loads += 1
+                residency.mark_resident(ReplicaManager(new_engine, residency.model_id))
+            logger.info(
+                f"Model {residency.model_id} resident after {time.perf_counter() - start:.1f}s "
+                f"({residency.footprint_bytes / 2**30:.2f} GB)"
+            )
+            return residency.manager
+        except Exception as e:
+            logger.error(f"Loading model {residency.model_id} failed: {e}")
+            residency.state = "cold"
+            residency.last_error = str(e)
+            raise RuntimeError(f"Model '{residency.model_id}' unavailable: {e}") from e
+        finally:
+            self._reserved.pop(residency.model_id, None)
+            residency._load = None
+
+    def _make_room(self, needed: int, keep: str):
+        """
+        Evict idle variants (LRU first) until `needed` more bytes fit in the
+        budget next to the resident variants and the loads in progress.
+        Raises RuntimeError if they cannot.
+        """
+        candidates = sorted(
+            (r for r in self.resident() if not r.pinned and r.model_id != keep and r.manager.connections == 0),
+            key=lambda r: r.last_used,
+        )
+        while self.used_bytes() + self.reserved_bytes() + needed > self.budget_bytes:
+            if not candidates:
+                raise RuntimeError(
+                    f"Memory budget exceeded ({(self.used_bytes() + self.reserved_bytes() + needed) / 2**30:.2f} GB "
+                    f"of {self.budget_bytes / 2**30:.2f} GB) and no idle model to evict"
+                )
+            self.evict(candidates.pop(0).model_id)
+
+    def evict(self, model_id: str):
+        """Free a resident variant. Raises ValueError if it is pinned or serving sessions."""
+        residency = self._residency(model_id)
+        if residency.state != "resident":
+            raise ValueError(f"Model '{model_id}' is not resident")
+        if residency.pinned:
+            raise ValueError(f"Model '{model_id}' is pinned")
+        if residency.manager.connections:
+            raise ValueError(f"Model '{model_id}' is serving {residency.manager.connections} sessions")
+        residency.manager.shutdown()
+        residency.evictions += 1
+        residency.mark_cold()
+        logger.info(f"Model {model_id} evicted")
+
+    # --- Session routing ---
+
+    def open_session(self, websocket: WebSocket, token: str | None = None
+                     ) -> tuple[ReplicaManager, Replica, Session, bool]:
+        """Resume `token` on whichever resident variant holds it, else start on the default one."""
+        if token:
+            for residency in self.resident():
+                if not residency.manager.holds(token):
+                    continue
+                replica, session, resumed = residency.manager.open_session(websocket, token)
+                residency.last_used = time.monotonic()
+                return residency.manager, replica, session, resumed
+
+        replica, session, _ = self.default.open_session(websocket)
+        return self.default, replica, session, False
+
+    def close_session(self, manager: ReplicaManager, replica: Replica, websocket: WebSocket,
+                      session: Session, resumable: bool = True):
+        manager.close_session(replica, websocket, session, resumable)
+        residency = self.models.get(manager.model_id)
+        if residency is not None:
+            residency.last_used = time.monotonic()
+
+    def stats(self) -> dict:
+        return {
+            "budget_gb": round(self.budget_bytes / 2**30, 2),
+            "used_gb": round(self.used_bytes() / 2**30, 2),
+            "reserved_gb": round(self.reserved_bytes() / 2**30, 2),
+            "models": [r.describe() for r in self.models.values()],
+        }
+
+
+# Global Instance
+residency = ResidencyManager(replicas)
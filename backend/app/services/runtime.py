@@ -0,0 +1,154 @@
+"""
+Process runtime gauges for long-running nodes.
+
+Point-in-time readings that should stay flat over hours of session churn:
+process RSS, device memory (allocated / reserved by the CUDA caching
+allocator), open file descriptors, threads, asyncio tasks, Python objects
+tracked by the GC, and the size of per-engine state that is supposed to be
+bounded (input residue in `engine.buffer`, session registries, in-RAM
+checkpoints, live quality/scheduler entries).
+
+Event-loop lag is measured by a watchdog task that sleeps LAG_INTERVAL_SECONDS
+and records how late it wakes up (`event_loop_lag_ms` in telemetry); the
+largest lag since the previous reading is reported with every snapshot.
+
+Counting GC-tracked objects walks the whole heap while holding the GIL, so it
+runs in an executor and watchdog readings that overlap a count are dropped:
+the gauge should not report lag caused by taking it.
+"""
+
+import asyncio
+import gc
+import logging
+import os
+import resource
+import threading
+import time
+
+import torch
+
+from backend.app.services.admission import admission
+from backend.app.services.quality import quality
+from backend.app.services.residency import residency
+from backend.app.services.scheduler import scheduler
+from backend.app.services.telemetry import telemetry
+
+logger = logging.getLogger("PersonaPlex-Runtime")
+
+LAG_INTERVAL_SECONDS = 0.1  # Event-loop watchdog period
+
+
+def rss_bytes() -> int:
+    """Current resident set size of this process."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except OSError:
+        return _peak_rss_bytes()  # No procfs (macOS): best available figure
+
+
+def _peak_rss_bytes() -> int:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if os.uname().sysname == "Darwin" else peak * 1024  # bytes on macOS, KiB elsewhere
+
+
+def _open_fds() -> int | None:
+    for path in ("/proc/self/fd", "/dev/fd"):
+        try:
+            return len(os.listdir(path))
+        except OSError:
+            continue
+    return None
+
+
+class RuntimeMonitor:
+    """Event-loop lag watchdog plus process and engine-state gauges."""
+
+    def __init__(self, interval: float = LAG_INTERVAL_SECONDS):
+        self.interval = interval
+        self.started_at = time.time()
+        self.max_lag_ms = 0.0  # Since the previous snapshot
+        self._watchdog: asyncio.Task | None = None
+        self._counts = 0  # GC object counts started (watchdog readings overlapping one are dropped)
+        self._counting = False
+
+    def ensure_started(self):
+        """Start the lag watchdog on the running loop (idempotent)."""
+        if self._watchdog is None or self._watchdog.done():
+            self._watchdog = asyncio.create_task(self._watch())
+
+    async def _watch(self):
+        while True:
+            counts = self._counts
+            expected = time.perf_counter() + self.interval
+            await asyncio.sleep(self.interval)
+            if self._counting or counts != self._counts:
+                continue
+            lag_ms = max(0.0, 1000 * (time.perf_counter() - expected))
+            telemetry.record("event_loop_lag_ms", lag_ms)
+            self.max_lag_ms = max(self.max_lag_ms, lag_ms)
+
+    @staticmethod
+    def _device() -> dict | None:
+        if not torch.cuda.is_available():
+            return None
+        return {
+            "allocated_mb": round(torch.cuda.memory_allocated() / 2**20, 1),
+            "reserved_mb": round(torch.cuda.memory_reserved() / 2**20, 1),
+            "peak_allocated_mb": round(torch.cuda.max_memory_allocated() / 2**20, 1),
+        }
+
+    @staticmethod
+    def _engines() -> list[dict]:
+        engines = []
+        for model in residency.resident():
+            for replica in model.manager.replicas:
+                sessions = replica.sessions.sessions.values()
+                engines.append({
+                    "model": model.model_id,
+                    "generation": replica.generation,
+                    "buffer_samples": len(replica.engine.buffer),
+                    "connections": len(replica.connections),
+                    "sessions": len(replica.sessions.sessions),
+                    "parked": sum(not s.connected for s in sessions),
+                    "checkpoints_in_ram": sum(s.checkpoint is not None for s in sessions),
+                    "checkpoints_on_disk": sum(s.checkpoint_path is not None for s in sessions),
+                })
+        return engines
+
+    async def _gc_objects(self) -> int:
+        self._counts += 1
+        self._counting = True
+        try:
+            return await asyncio.get_running_loop().run_in_executor(None, lambda: len(gc.get_objects()))
+        finally:
+            self._counting = False
+
+    async def snapshot(self) -> dict:
+        """Current gauges; resets the max event-loop lag."""
+        gc_objects = await self._gc_objects()
+        max_lag_ms, self.max_lag_ms = self.max_lag_ms, 0.0
+        return {
+            "time": time.time(),
+            "uptime_s": round(time.time() - self.started_at, 1),
+            "rss_mb": round(rss_bytes() / 2**20, 1),
+            "peak_rss_mb": round(_peak_rss_bytes() / 2**20, 1),
+            "device": self._device(),
+            "open_fds": _open_fds(),
+            "threads": threading.active_count(),
+            "asyncio_tasks": len(asyncio.all_tasks()),
+            "gc_objects": gc_objects,
+            "event_loop_lag_ms": {
+                "max": round(max_lag_ms, 2),
+                **{k: v for k, v in telemetry.snapshot()["metrics"].get("event_loop_lag_ms", {}).items()
+                   if k in ("p50", "p99")},
+            },
+            "engines": self._engines(),
+            "quality_sessions": len(quality.sessions),
+            "scheduler_pending": scheduler.status()["pending"],
+            "admission": {"active": admission.active, "queued": admission.queued},
+        }
+
+
+# Global Instance
+runtime = RuntimeMonitor()
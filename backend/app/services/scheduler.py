@@ -0,0 +1,205 @@
+"""
+Deadline-aware frame scheduler with priority tiers.
+
+Every engine call of every session (frame steps and config prefills) is
+submitted here and executed one at a time on a dedicated worker thread, so
+the event loop keeps reading sockets while the model runs and the scheduler
+sees all pending frames when it picks the next one.
+
+Each session belongs to a priority tier (PRIORITY_TIERS, chosen with
+`?priority=<tier>` at connect time) that sets its frame deadline: the time
+from a frame becoming complete to its reply being ready. Jobs run earliest
+deadline first (ties go to the higher tier), with one guard: a job only runs
+ahead of pending higher-tier jobs if, at the measured cost per step, all of
+them can still make their deadlines afterwards. Otherwise the most urgent
+higher-tier job goes first. Under contention the top tier keeps its 80 ms
+budget and the lower tiers absorb the queueing delay.
+
+Per tier the scheduler counts frames and deadline misses and records queue
+wait and lateness into telemetry (`sched_<tier>_wait_ms`, `sched_<tier>_late_ms`).
+"""
+
+import asyncio
+import itertools
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Callable
+
+from backend.app.core.config import PRIORITY_TIERS, DEFAULT_PRIORITY
+from backend.app.services.frame_header import now_ms
+from backend.app.services.telemetry import telemetry
+
+logger = logging.getLogger("PersonaPlex-Scheduler")
+
+EWMA_ALPHA = 0.1  # Smoothing of the per-step cost estimate
+
+
+def parse_tiers(spec: str) -> dict[str, float]:
+    """Parse "premium:80,standard:160" into {tier: deadline_ms}, highest tier first."""
+    tiers = {}
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        name, deadline_ms = item.split(":")
+        tiers[name] = float(deadline_ms)
+    return tiers
+
+
+@dataclass
+class _Job:
+    fn: Callable[[], Any]
+    tier: str
+    rank: int  # 0 = highest tier
+    ready_at: float  # When the frame was complete (monotonic seconds)
+    deadline: float
+    seq: int
+    future: asyncio.Future = field(repr=False, default=None)
+    frame: bool = True  # Frame step (vs. prefill/admin job): only these feed the step cost estimate
+
+
+class TierStats:
+    def __init__(self):
+        self.frames = 0
+        self.misses = 0
+        self.jobs = 0
+
+    def describe(self) -> dict:
+        return {
+            "frames": self.frames,
+            "misses": self.misses,
+            "miss_rate": round(self.misses / self.frames, 4) if self.frames else 0.0,
+            "jobs": self.jobs,
+        }
+
+
+class FrameScheduler:
+    """Single-worker EDF scheduler for engine calls, with tier-aware handling of late jobs."""
+
+    def __init__(self, tiers: dict[str, float] = parse_tiers(PRIORITY_TIERS), default_tier: str = DEFAULT_PRIORITY):
+        if default_tier not in tiers:
+            raise ValueError(f"DEFAULT_PRIORITY '{default_tier}' is not in PRIORITY_TIERS")
+        self.tiers = tiers
+        self.default_tier = default_tier
+        self._rank = {name: rank for rank, name in enumerate(tiers)}
+        self._pending: list[_Job] = []
+        self._seq = itertools.count()
+        self._wakeup: asyncio.Event | None = None
+        self._worker: asyncio.Task | None = None
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="PersonaPlex-Step")
+        self.stats = {name: TierStats() for name in tiers}
+        self.step_seconds = 0.0  # EWMA cost of one engine call (frame jobs)
+
+    def tier(self, name: str | None) -> str:
+        """Validated tier for a connect-time request (unknown or missing -> default tier)."""
+        return name if name in self.tiers else self.default_tier
+
+    async def run(self, tier: str, fn: Callable[[], Any], ready_at: float | None = None,
+                  frame: bool = True) -> tuple[Any, float, float]:
+        """
+        Run `fn` on the engine thread when its turn comes. `ready_at` is when
+        the input became available (defaults to now); non-frame jobs (config
+        prefills) are scheduled the same way but not counted as frames.
+        Returns (result, start_ms, end_ms): wall-clock times of the call (as in the frame header).
+        """
+        self._ensure_worker()
+        ready_at = time.monotonic() if ready_at is None else ready_at
+        job = _Job(fn, tier, self._rank[tier], ready_at, ready_at + self.tiers[tier] / 1000.0,
+                   next(self._seq), asyncio.get_running_loop().create_future(), frame)
+        self._pending.append(job)
+        self._wakeup.set()
+        result, start, end = await job.future
+
+        stats = self.stats[tier]
+        stats.jobs += 1
+        if frame:
+            stats.frames += 1
+            finished = time.monotonic()
+            telemetry.record(f"sched_{tier}_wait_ms", 1000 * (finished - ready_at) - (end - start))
+            if finished > job.deadline:
+                stats.misses += 1
+                telemetry.record(f"sched_{tier}_late_ms", 1000 * (finished - job.deadline))
+        return result, start, end
+
+    def timed_runner(self, loop: asyncio.AbstractEventLoop, tier: str | None = None
+                     ) -> Callable[[Callable[[], Any]], tuple[Any, float]]:
+        """
+        For code running off the event loop (an engine calibrating while the
+        node serves, see PersonaPlexEngine): returns a blocking runner that
+        submits each call as a non-frame job (lowest tier by default) and
+        returns (result, call ms).
+        """
+        tier = tier or next(reversed(self.tiers))
+
+        def run(fn: Callable[[], Any]) -> tuple[Any, float]:
+            result, start, end = asyncio.run_coroutine_threadsafe(self.run(tier, fn, frame=False), loop).result()
+            return result, end - start
+        return run
+
+    def _ensure_worker(self):
+        if self._worker is None or self._worker.done():
+            self._wakeup = asyncio.Event()
+            self._worker = asyncio.create_task(self._work())
+
+    def _pick(self) -> _Job:
+        job = min(self._pending, key=lambda j: (j.deadline, j.rank, j.seq))
+        while True:
+            higher = sorted((j for j in self._pending if j.rank < job.rank), key=lambda j: (j.deadline, j.rank, j.seq))
+            if not higher or self._fits(higher, time.monotonic() + self.step_seconds):
+                break
+            job = higher[0]
+        self._pending.remove(job)
+        return job
+
+    def _fits(self, jobs: list[_Job], start: float) -> bool:
+        """Whether `jobs`, run in order from `start` at the estimated step cost, all make their deadlines."""
+        finish = start
+        for job in jobs:
+            finish += self.step_seconds
+            if finish > job.deadline and job.deadline >= start:
+                return False
+        return True
+
+    async def _work(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            if not self._pending:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+            job = self._pick()
+            if job.future.cancelled():
+                continue
+            try:
+                outcome = await loop.run_in_executor(self._executor, _timed, job.fn)
+            except Exception as e:
+                if not job.future.done():
+                    job.future.set_exception(e)
+                continue
+            _, start_ms, end_ms = outcome
+            if job.frame:
+                # Prefills take seconds; counting them would make _fits() reject every lower-tier job
+                self.step_seconds += EWMA_ALPHA * ((end_ms - start_ms) / 1000 - self.step_seconds)
+            if not job.future.done():
+                job.future.set_result(outcome)
+
+    def status(self) -> dict:
+        return {
+            "default_tier": self.default_tier,
+            "step_ms": round(1000 * self.step_seconds, 2),
+            "pending": len(self._pending),
+            "tiers": {
+                name: {"deadline_ms": deadline_ms, "pending": sum(j.tier == name for j in self._pending),
+                       **self.stats[name].describe()}
+                for name, deadline_ms in self.tiers.items()
+            },
+        }
+
+
+def _timed(fn: Callable[[], Any]) -> tuple[Any, float, float]:
+    start = now_ms()
+    result = fn()
+    return result, start, now_ms()
+
+
+# Global Instance
+scheduler = FrameScheduler()
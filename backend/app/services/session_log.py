@@ -0,0 +1,464 @@
+"""
+Per-session summary log.
+
+Telemetry (telemetry.py) keeps a bounded window of recent samples, and a
+session's own numbers are gone once its socket closes. When a session ends,
+one fixed-size binary record (RECORD_DTYPE) is appended to
+SESSION_LOG_DIR/sessions.bin:
+
+- duration, frames processed, deadline misses (frames finished later than
+  the tier's deadline), bytes in/out, config-to-prefilled time
+- p50/p95/p99 per stage: `queue` (waiting for the engine thread), `compute`
+  (the engine step), `send` (writing the reply) and `total` (complete input
+  frame to reply sent)
+- voice, persona key (hash of the text prompt), tier, model, codes/resumed
+- peak process RSS and device memory allocated while the session ran
+  (node-wide figures, sampled every MEMORY_SAMPLE_FRAMES frames)
+
+Stage latencies are binned into fixed log-spaced histograms as frames come
+in, so a session's bookkeeping stays the same size however long it lasts.
+
+Records are handed to a writer thread, so the event loop never waits on the
+disk. Past SESSION_LOG_ROTATE_MB the file is renamed to
+sessions-<first>-<last>.bin (unix seconds of the earliest and latest end time
+in it) and a new one is started; the newest SESSION_LOG_KEEP rotated files
+are kept. Queries (SessionLog.aggregate) skip files outside the requested
+range by name, memory-map the rest and filter and aggregate them
+CHUNK_RECORDS at a time, so the history is never loaded whole. Nothing
+assumes records are in end-time order (the wall clock can step back).
+
+File layout: HEADER_BYTES header (MAGIC, record size), then records in write
+order. Offline: `np.memmap(path, RECORD_DTYPE, "r", HEADER_BYTES)`.
+"""
+
+import hashlib
+import logging
+import math
+import os
+import queue
+import re
+import struct
+import threading
+import time
+
+import numpy as np
+import torch
+
+from backend.app.core.config import SESSION_LOG_DIR, SESSION_LOG_ROTATE_MB, SESSION_LOG_KEEP
+from backend.app.services.runtime import rss_bytes
+
+logger = logging.getLogger("PersonaPlex-SessionLog")
+
+MAGIC = b"PPXSLOG1"
+HEADER_BYTES = 16
+CURRENT_FILE = "sessions.bin"
+ROTATED_FILE = re.compile(r"sessions-(\d+)-(\d+)(?:-(\d+))?\.bin$")
+
+STAGES = ("queue", "compute", "send", "total")
+PERCENTILES = (50, 95, 99)
+GROUP_FIELDS = ("voice", "persona", "tier", "model")
+
+# Latency histogram: LAT_BINS log-spaced bins from LAT_MIN_MS to LAT_MAX_MS (~6.5% wide)
+LAT_MIN_MS, LAT_MAX_MS, LAT_BINS = 0.01, 1e5, 256
+_LOG_MIN = math.log(LAT_MIN_MS)
+_BIN_WIDTH = (math.log(LAT_MAX_MS) - _LOG_MIN) / LAT_BINS
+BIN_VALUES_MS = np.exp(_LOG_MIN + _BIN_WIDTH * (np.arange(LAT_BINS) + 0.5))  # Geometric bin centres
+
+MEMORY_SAMPLE_FRAMES = 64  # Frames between memory readings
+CHUNK_RECORDS = 65536  # Records aggregated at a time
+MAX_BUCKETS = 2000  # Time buckets per query
+WRITE_QUEUE_MAX = 1024  # Records waiting for the writer thread before new ones are dropped
+
+RECORD_DTYPE = np.dtype([
+    ("ended_at", "<f8"),
+    ("duration_s", "<f4"),
+    ("frames", "<u4"),
+    ("deadline_misses", "<u4"),
+    ("bytes_in", "<u8"),
+    ("bytes_out", "<u8"),
+    ("prefill_ms", "<f4"),
+    ("peak_rss_mb", "<f4"),
+    ("peak_device_mb", "<f4"),
+    *((f"{stage}_ms", "<f4", (len(PERCENTILES),)) for stage in STAGES),
+    ("session", "S16"),
+    ("voice", "S32"),
+    ("persona", "S16"),
+    ("tier", "S16"),
+    ("model", "S64"),
+    ("codes", "?"),
+    ("resumed", "?"),
+])
+
+
+def persona_key(persona: str) -> str:
+    """Short stable key for a text prompt (the prompt itself is not logged)."""
+    return hashlib.blake2b(persona.encode(), digest_size=8).hexdigest()
+
+
+def _bin(ms: float) -> int:
+    if ms <= LAT_MIN_MS:
+        return 0
+    return min(LAT_BINS - 1, int((math.log(ms) - _LOG_MIN) / _BIN_WIDTH))
+
+
+def _bins(ms: np.ndarray) -> np.ndarray:
+    index = (np.log(np.maximum(ms, LAT_MIN_MS)) - _LOG_MIN) / _BIN_WIDTH
+    return np.clip(index.astype(np.int64), 0, LAT_BINS - 1)
+
+
+def _percentiles(hist: np.ndarray, percentiles=PERCENTILES) -> list[float]:
+    """Percentiles (bin centres) of a latency histogram; NaN when it is empty."""
+    total = int(hist.sum())
+    if total == 0:
+        return [math.nan] * len(percentiles)
+    cumulative = np.cumsum(hist)
+    return [float(BIN_VALUES_MS[np.searchsorted(cumulative, math.ceil(total * q / 100))]) for q in percentiles]
+
+
+def _round(value: float) -> float | None:
+    return None if math.isnan(value) else round(value, 2)
+
+
+class SessionSummary:
+    """Running totals for one session, written to the log when it ends."""
+
+    def __init__(self, session_id: str, tier: str, deadline_ms: float, codes: bool, resumed: bool):
+        self.session_id = session_id
+        self.tier = tier
+        self.deadline = deadline_ms / 1000.0
+        self.codes = codes
+        self.resumed = resumed
+        self.started_at = time.time()
+        self.hist = np.zeros((len(STAGES), LAT_BINS), dtype=np.uint32)
+        self.frames = 0
+        self.deadline_misses = 0
+        self.bytes_out = 0
+        self.voice = ""
+        self.persona = ""
+        self.prefill_ms = math.nan
+        self.peak_rss = 0
+        self.peak_device = 0
+        self._cuda = torch.cuda.is_available()
+        self.sample_memory()
+
+    def configured(self, voice: str, persona: str, prefill_ms: float):
+        """Latest config message (voice, persona and how long its prefill took)."""
+        self.voice = voice
+        self.persona = persona_key(persona)
+        self.prefill_ms = prefill_ms
+
+    def frame(self, ready_at: float, finished: float, compute_ms: float, send_ms: float, bytes_out: int):
+        """
+        One engine step. `ready_at` (input frame complete) and `finished`
+        (step result back on the event loop) are time.monotonic() seconds.
+        """
+        elapsed_ms = 1000 * (finished - ready_at)
+        hist = self.hist
+        hist[0, _bin(max(0.0, elapsed_ms - compute_ms))] += 1
+        hist[1, _bin(compute_ms)] += 1
+        hist[2, _bin(send_ms)] += 1
+        hist[3, _bin(elapsed_ms + send_ms)] += 1
+        if finished > ready_at + self.deadline:
+            self.deadline_misses += 1
+        self.frames += 1
+        self.bytes_out += bytes_out
+        if self.frames % MEMORY_SAMPLE_FRAMES == 0:
+            self.sample_memory()
+
+    def sample_memory(self):
+        self.peak_rss = max(self.peak_rss, rss_bytes())
+        if self._cuda:
+            self.peak_device = max(self.peak_device, torch.cuda.memory_allocated())
+
+    def record(self, bytes_in: int, model: str) -> np.ndarray:
+        """The session's log record (a one-element RECORD_DTYPE array)."""
+        self.sample_memory()
+        ended_at = time.time()
+        record = np.zeros(1, dtype=RECORD_DTYPE)
+        record["ended_at"] = ended_at
+        record["duration_s"] = ended_at - self.started_at
+        record["frames"] = self.frames
+        record["deadline_misses"] = self.deadline_misses
+        record["bytes_in"] = bytes_in
+        record["bytes_out"] = self.bytes_out
+        record["prefill_ms"] = self.prefill_ms
+        record["peak_rss_mb"] = self.peak_rss / 2**20
+        record["peak_device_mb"] = self.peak_device / 2**20
+        for index, stage in enumerate(STAGES):
+            record[f"{stage}_ms"] = _percentiles(self.hist[index])
+        record["session"] = self.session_id.encode()
+        record["voice"] = self.voice.encode()
+        record["persona"] = self.persona.encode()
+        record["tier"] = self.tier.encode()
+        record["model"] = model.encode()
+        record["codes"] = self.codes
+        record["resumed"] = self.resumed
+        return record
+
+
+class _Bucket:
+    """Aggregate of the records in one time bucket (and group)."""
+
+    def __init__(self):
+        self.sessions = 0
+        self.totals = dict.fromkeys(("duration_s", "frames", "deadline_misses", "bytes_in", "bytes_out"), 0.0)
+        self.peaks = dict.fromkeys(("peak_rss_mb", "peak_device_mb"), 0.0)
+        # Per stage and session percentile: histogram of that percentile over sessions
+        self.stage_hist = np.zeros((len(STAGES), len(PERCENTILES), LAT_BINS), dtype=np.int64)
+        self.prefill_hist = np.zeros(LAT_BINS, dtype=np.int64)
+
+    def add(self, rows: np.ndarray):
+        self.sessions += len(rows)
+        for name in self.totals:
+            self.totals[name] += float(rows[name].sum(dtype=np.float64))
+        for name in self.peaks:
+            self.peaks[name] = max(self.peaks[name], float(rows[name].max()))
+        for s, stage in enumerate(STAGES):
+            values = rows[f"{stage}_ms"]
+            for p in range(len(PERCENTILES)):
+                column = values[:, p]
+                self.stage_hist[s, p] += np.bincount(_bins(column[~np.isnan(column)]), minlength=LAT_BINS)
+        prefill_ms = rows["prefill_ms"]
+        self.prefill_hist += np.bincount(_bins(prefill_ms[~np.isnan(prefill_ms)]), minlength=LAT_BINS)
+
+    def summary(self) -> dict:
+        frames = self.totals["frames"]
+        stages = {}
+        for s, stage in enumerate(STAGES):
+            # Median over sessions of each session's percentile; p99_tail: 1 in 20 sessions had a p99 above it
+            medians = [_percentiles(self.stage_hist[s, p], (50,))[0] for p in range(len(PERCENTILES))]
+            stages[stage] = {f"p{q}": _round(m) for q, m in zip(PERCENTILES, medians)}
+            stages[stage]["p99_tail"] = _round(_percentiles(self.stage_hist[s, -1], (95,))[0])
+        prefill_p50, prefill_p95 = _percentiles(self.prefill_hist, (50, 95))
+        return {
+            "sessions": self.sessions,
+            "duration_s": {
+                "total": round(self.totals["duration_s"], 1),
+                "mean": round(self.totals["duration_s"] / self.sessions, 1),
+            },
+            "frames": int(frames),
+            "deadline_misses": int(self.totals["deadline_misses"]),
+            "miss_rate": round(self.totals["deadline_misses"] / frames, 4) if frames else 0.0,
+            "bytes_in": int(self.totals["bytes_in"]),
+            "bytes_out": int(self.totals["bytes_out"]),
+            "prefill_ms": {"p50": _round(prefill_p50), "p95": _round(prefill_p95)},
+            "stages_ms": stages,
+            "peak_rss_mb": round(self.peaks["peak_rss_mb"], 1),
+            "peak_device_mb": round(self.peaks["peak_device_mb"], 1),
+        }
+
+
+def _records(path: str) -> np.ndarray | None:
+    """Memory-mapped records of a log file (None if it is not one, or has another layout)."""
+    try:
+        with open(path, "rb") as f:
+            header = f.read(HEADER_BYTES)
+        count = (os.path.getsize(path) - HEADER_BYTES) // RECORD_DTYPE.itemsize
+    except OSError:
+        return None
+    if len(header) < HEADER_BYTES or header[:len(MAGIC)] != MAGIC:
+        return None
+    if struct.unpack_from("<I", header, len(MAGIC))[0] != RECORD_DTYPE.itemsize:
+        return None
+    if count <= 0:
+        return np.empty(0, dtype=RECORD_DTYPE)
+    return np.memmap(path, dtype=RECORD_DTYPE, mode="r", offset=HEADER_BYTES, shape=(count,))
+
+
+class SessionLog:
+    """Append-only, size-rotated log of session summaries, with windowed aggregation."""
+
+    def __init__(self, directory: str = SESSION_LOG_DIR, rotate_mb: float = SESSION_LOG_ROTATE_MB,
+                 keep: int = SESSION_LOG_KEEP):
+        self.directory = directory
+        self.enabled = bool(directory)
+        self.rotate_bytes = int(rotate_mb * 2**20)
+        self.keep = keep
+        self.path = os.path.join(directory, CURRENT_FILE) if self.enabled else None
+        self._file = None
+        self._range: tuple[float, float] | None = None  # Earliest/latest ended_at in the current file
+        self._lock = threading.Lock()
+        self._queue: queue.Queue = queue.Queue(maxsize=WRITE_QUEUE_MAX)
+        self._writer: threading.Thread | None = None
+        self.written = 0
+        self.dropped = 0
+        self.rotations = 0
+        self.errors = 0
+
+    def open(self, session_id: str, tier: str, deadline_ms: float, codes: bool = False,
+             resumed: bool = False) -> SessionSummary:
+        return SessionSummary(session_id, tier, deadline_ms, codes, resumed)
+
+    def write(self, summary: SessionSummary, bytes_in: int, model: str):
+        """Queue the session's record for the writer thread (dropped with a warning if it is backed up)."""
+        if not self.enabled:
+            return
+        if self._writer is None:
+            self._writer = threading.Thread(target=self._write_loop, name="PersonaPlex-SessionLog", daemon=True)
+            self._writer.start()
+        try:
+            self._queue.put_nowait((summary.session_id, summary.record(bytes_in, model)))
+        except queue.Full:
+            self.dropped += 1
+            logger.warning(f"Session log writer is behind, dropped the record of session {summary.session_id}")
+
+    def flush(self):
+        """Block until every queued record is written."""
+        if self._writer is not None:
+            self._queue.join()
+
+    def _write_loop(self):
+        while True:
+            session_id, record = self._queue.get()
+            try:
+                with self._lock:
+                    self._append(record)
+            except OSError as e:
+                self.errors += 1
+                logger.error(f"Could not write session {session_id} to {self.path}: {e}")
+            finally:
+                self._queue.task_done()
+
+    def _append(self, record: np.ndarray):
+        if self._file is None:
+            self._open_current()
+        self._file.write(record.tobytes())
+        self._file.flush()
+        ended_at = float(record["ended_at"][0])
+        first, last = self._range or (ended_at, ended_at)
+        self._range = (min(first, ended_at), max(last, ended_at))
+        self.written += 1
+        if self._file.tell() >= self.rotate_bytes:
+            self._rotate()
+
+    def _open_current(self):
+        os.makedirs(self.directory, exist_ok=True)
+        if os.path.exists(self.path):
+            records = _records(self.path)
+            if records is None:
+                # Older record layout: set it aside so the new file starts clean
+                mtime = os.path.getmtime(self.path)
+                self._range = (mtime, mtime)
+                self._rotate()
+            else:
+                if len(records):
+                    self._range = (float(records["ended_at"].min()), float(records["ended_at"].max()))
+                # Drop a partial record left by a crash mid-write
+                with open(self.path, "r+b") as f:
+                    f.truncate(HEADER_BYTES + len(records) * RECORD_DTYPE.itemsize)
+                del records
+        self._file = open(self.path, "ab")
+        if self._file.tell() == 0:
+            self._file.write(MAGIC + struct.pack("<II", RECORD_DTYPE.itemsize, 0))
+
+    def _rotate(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        first, last = self._range if self._range else (time.time(), time.time())
+        name = f"sessions-{int(first):010d}-{math.ceil(last):010d}"
+        target = os.path.join(self.directory, f"{name}.bin")
+        suffix = 0
+        while os.path.exists(target):
+            suffix += 1
+            target = os.path.join(self.directory, f"{name}-{suffix}.bin")
+        os.replace(self.path, target)
+        self._range = None
+        self.rotations += 1
+        rotated = self._rotated()
+        for _, _, path in rotated[:max(0, len(rotated) - self.keep)]:
+            os.remove(path)
+
+    def _rotated(self) -> list[tuple[int, int, str]]:
+        """Rotated files as (first, last, path), oldest first."""
+        try:
+            names = os.listdir(self.directory)
+        except OSError:
+            return []
+        files = []
+        for name in names:
+            match = ROTATED_FILE.match(name)
+            if match:
+                first, last, suffix = (int(g or 0) for g in match.groups())
+                files.append((first, last, suffix, os.path.join(self.directory, name)))
+        return [(first, last, path) for first, last, _, path in sorted(files)]
+
+    def aggregate(self, since: float | None = None, until: float | None = None, bucket_s: float = 3600,
+                  by: str | None = None) -> dict:
+        """
+        Sessions that ended in [since, until) (default: the last 24 hours),
+        aggregated per `bucket_s` bucket and optionally per `by` (one of
+        GROUP_FIELDS). Stage latencies are medians over sessions of each
+        session's p50/p95/p99, plus `p99_tail`, the 95th percentile of session p99s.
+        """
+        until = time.time() if until is None else until
+        since = until - 86400 if since is None else since
+        if by is not None and by not in GROUP_FIELDS:
+            raise ValueError(f"Cannot group by '{by}' (one of: {', '.join(GROUP_FIELDS)}).")
+        if bucket_s <= 0 or until <= since or (until - since) / bucket_s > MAX_BUCKETS:
+            raise ValueError(f"Need since < until and at most {MAX_BUCKETS} buckets of bucket_s seconds.")
+
+        with self._lock:
+            paths = [path for first, last, path in self._rotated() if last >= since and first < until]
+            if self.enabled and os.path.exists(self.path):
+                paths.append(self.path)
+
+        buckets: dict[tuple[int, bytes], _Bucket] = {}
+        scanned = 0
+        for path in paths:
+            records = _records(path)
+            if records is None or not len(records):
+                continue
+            for start in range(0, len(records), CHUNK_RECORDS):
+                chunk = records[start:start + CHUNK_RECORDS]
+                ended_at = chunk["ended_at"]
+                chunk = chunk[(ended_at >= since) & (ended_at < until)]  # Boolean indexing copies out of the map
+                if len(chunk):
+                    scanned += len(chunk)
+                    self._accumulate(buckets, chunk, bucket_s, by)
+            del records
+
+        rows = []
+        for (index, group), bucket in sorted(buckets.items()):
+            row = {"start": index * bucket_s}
+            if by is not None:
+                row[by] = group.decode(errors="replace")
+            rows.append({**row, **bucket.summary()})
+        return {
+            "since": since,
+            "until": until,
+            "bucket_s": bucket_s,
+            "by": by,
+            "files": len(paths),
+            "sessions": scanned,
+            "buckets": rows,
+        }
+
+    @staticmethod
+    def _accumulate(buckets: dict, chunk: np.ndarray, bucket_s: float, by: str | None):
+        index = (chunk["ended_at"] // bucket_s).astype(np.int64)  # Buckets aligned to multiples of bucket_s
+        groups = chunk[by] if by is not None else np.zeros(len(chunk), dtype="S1")
+        keys, inverse = np.unique(np.rec.fromarrays([index, groups]), return_inverse=True)
+        for k, (bucket_index, group) in enumerate(keys.tolist()):
+            key = (bucket_index, group)
+            if key not in buckets:
+                buckets[key] = _Bucket()
+            buckets[key].add(chunk[inverse.ravel() == k])
+
+    def stats(self) -> dict:
+        current = os.path.getsize(self.path) if self.enabled and os.path.exists(self.path) else 0
+        return {
+            "enabled": self.enabled,
+            "dir": self.directory,
+            "written": self.written,
+            "queued": self._queue.qsize(),
+            "dropped": self.dropped,
+            "rotations": self.rotations,
+            "errors": self.errors,
+            "current_bytes": current,
+            "rotated_files": len(self._rotated()) if self.enabled else 0,
+        }
+
+
+# Global Instance
+session_log = SessionLog()
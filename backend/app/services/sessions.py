@@ -0,0 +1,245 @@
+"""
+Session registry with state swap-out for idle and reconnecting sessions.
+
+The engine has a single streaming slot. Sessions take turns owning it: when a
+session that does not own the slot needs the engine, the current owner's
+state (input residue, Mimi/LMGen streaming state, prompts) is checkpointed to
+host RAM and the new session's checkpoint is restored. This lets idle sessions (mic paused) hold no slot, and lets a client
+whose socket dropped resume with its token within SESSION_RESUME_TTL seconds
+without re-prefilling.
+
+Checkpoints held in RAM are bounded by SESSION_CHECKPOINT_BUDGET_MB, measured
+from each checkpoint's size (a real-model KV cache is around 1.5 GB). Past
+the budget, parked sessions and then the longest-idle connected ones are
+spilled to SESSION_SWAP_DIR; without a swap dir, parked sessions are dropped
+(oldest first) instead.
+
+A swap moves the full streaming state (the LM's KV cache on the real model),
+so the slot only changes hands when its owner is disconnected or has not
+stepped for SESSION_IDLE_SECONDS. A session that needs the engine while
+another one is live gets SlotBusy and is refused. Engines whose state is
+cheap to move (PersonaPlexEngine.interleave_sessions: the stand-in and the
+MOCK engine) swap on every frame instead, so concurrent sessions interleave.
+"""
+
+import logging
+import os
+import secrets
+import time
+from dataclasses import dataclass, field
+
+import torch
+
+from backend.app.core.config import (
+    SESSION_RESUME_TTL, SESSION_CHECKPOINT_BUDGET_MB, SESSION_SWAP_DIR, SESSION_IDLE_SECONDS,
+)
+from backend.app.services.engine import PersonaPlexEngine
+from backend.app.services.streaming_state import state_nbytes
+from backend.app.services.telemetry import telemetry
+
+logger = logging.getLogger("PersonaPlex-Sessions")
+
+
+class SlotBusy(Exception):
+    """The engine slot belongs to another live session (engines that cannot interleave sessions)."""
+
+
+@dataclass
+class Session:
+    token: str
+    created_at: float = field(default_factory=time.time)
+    last_active: float = field(default_factory=time.monotonic)
+    connected: bool = True
+    disconnected_at: float | None = None
+    checkpoint: dict | None = None  # Host-side state while swapped out
+    checkpoint_path: str | None = None  # Set when spilled to disk
+    checkpoint_bytes: int = 0  # Size of the checkpoint (in RAM or on disk)
+    fresh: bool = True  # Never run on the engine yet (needs a reset, not a restore)
+    frame_header: bool = False  # Negotiated per-frame header (kept across resume)
+
+    @property
+    def id(self) -> str:
+        return self.token[:8]
+
+
+class SessionManager:
+    """Tracks sessions and swaps their state in and out of the engine's slot."""
+
+    def __init__(self, engine: PersonaPlexEngine, resume_ttl: float = SESSION_RESUME_TTL,
+                 budget_bytes: int = int(SESSION_CHECKPOINT_BUDGET_MB * 2**20),
+                 swap_dir: str | None = SESSION_SWAP_DIR, idle_seconds: float = SESSION_IDLE_SECONDS):
+        self.engine = engine
+        self.resume_ttl = resume_ttl
+        self.idle_seconds = idle_seconds
+        self.budget_bytes = budget_bytes
+        self.swap_dir = swap_dir
+        self.sessions: dict[str, Session] = {}
+        self.owner: Session | None = None
+        self.swaps_in = 0
+        self.swaps_out = 0
+        self.spilled = 0
+        self.dropped = 0
+        self.refused = 0
+        if swap_dir:
+            os.makedirs(swap_dir, exist_ok=True)
+
+    # --- Lifecycle ---
+
+    def open(self, token: str | None = None) -> tuple[Session, bool]:
+        """Resume the session for `token` if it is still parked, else start a new one."""
+        self.expire()
+        session = self.sessions.get(token) if token else None
+        if session is not None and not session.connected:
+            session.connected = True
+            session.disconnected_at = None
+            session.last_active = time.monotonic()
+            logger.info(f"Session {session.id} resumed")
+            return session, True
+
+        session = Session(token=secrets.token_urlsafe(16))
+        self.sessions[session.token] = session
+        return session, False
+
+    def park(self, session: Session):
+        """Called on disconnect: keep the session resumable for `resume_ttl` seconds."""
+        session.connected = False
+        session.disconnected_at = time.monotonic()
+        self._enforce_budget()  # Parked sessions go first
+
+    def drop(self, session: Session):
+        if self.owner is session:
+            self.owner = None
+        if session.checkpoint_path and os.path.exists(session.checkpoint_path):
+            os.remove(session.checkpoint_path)
+        self.sessions.pop(session.token, None)
+
+    def expire(self):
+        now = time.monotonic()
+        for session in list(self.sessions.values()):
+            if not session.connected and now - session.disconnected_at > self.resume_ttl:
+                logger.info(f"Session {session.id} expired")
+                self.drop(session)
+
+    # --- Slot ownership ---
+
+    def activate(self, session: Session):
+        """Make sure `session` owns the engine slot before it touches the engine (SlotBusy if it cannot)."""
+        now = time.monotonic()
+        if self.owner is session:
+            session.last_active = now
+            return
+        if self.owner is not None and self._live(self.owner, now) and not self.engine.interleave_sessions:
+            self.refused += 1
+            raise SlotBusy(f"engine slot held by live session {self.owner.id}")
+        session.last_active = now
+        if self.owner is not None:
+            self._swap_out(self.owner)
+        self._swap_in(session)
+        self.owner = session
+
+    def _live(self, session: Session, now: float) -> bool:
+        return session.connected and now - session.last_active < self.idle_seconds
+
+    def idle(self) -> int:
+        """Connected sessions that have not stepped for `idle_seconds` (they hold no claim on the slot)."""
+        now = time.monotonic()
+        return sum(s.connected and not self._live(s, now) for s in self.sessions.values())
+
+    def install(self, session: Session, checkpoint: dict):
+        """Hand `session` a state prepared off-slot (batched prefill); it is swapped in on next use."""
+        if self.owner is session:
+            self.owner = None
+        if session.checkpoint_path and os.path.exists(session.checkpoint_path):
+            os.remove(session.checkpoint_path)
+        session.checkpoint_path = None
+        session.checkpoint = checkpoint
+        session.checkpoint_bytes = state_nbytes(checkpoint)
+        session.fresh = False
+        self._enforce_budget()
+
+    def release_slot(self):
+        """Checkpoint the current owner so the engine can be used directly (admin tasks)."""
+        if self.owner is not None:
+            self._swap_out(self.owner)
+            self.owner = None
+
+    def _swap_out(self, session: Session):
+        start = time.perf_counter()
+        session.checkpoint = self.engine.checkpoint()
+        session.checkpoint_bytes = state_nbytes(session.checkpoint)
+        self._enforce_budget()
+        self.swaps_out += 1
+        telemetry.record("session_swap_out_ms", 1000 * (time.perf_counter() - start))
+
+    def ram_bytes(self) -> int:
+        """Host RAM held by swapped-out checkpoints."""
+        return sum(s.checkpoint_bytes for s in self.sessions.values() if s.checkpoint is not None)
+
+    def _enforce_budget(self):
+        """
+        Bring checkpoints in RAM within `budget_bytes`: spill them to `swap_dir`,
+        parked sessions first (they only come back on resume), then the
+        longest-idle connected ones. Without a swap dir, drop parked sessions.
+        """
+        held = self.ram_bytes()
+        if held <= self.budget_bytes:
+            return
+        in_ram = [s for s in self.sessions.values() if s.checkpoint is not None]
+        for session in sorted(in_ram, key=lambda s: (s.connected, s.disconnected_at or s.last_active)):
+            if held <= self.budget_bytes:
+                return
+            freed = session.checkpoint_bytes
+            if self.swap_dir:
+                self._spill(session)
+            elif not session.connected:
+                logger.info(f"Session {session.id} dropped: session checkpoints over budget")
+                self.drop(session)
+                self.dropped += 1
+            else:
+                continue
+            held -= freed
+        if held > self.budget_bytes:
+            logger.warning(f"Session checkpoints hold {held / 2**20:.0f} MiB, over the "
+                           f"{self.budget_bytes / 2**20:.0f} MiB budget (connected sessions, no swap dir)")
+
+    def _spill(self, session: Session):
+        session.checkpoint_path = os.path.join(self.swap_dir, f"{session.token}.pt")
+        torch.save(session.checkpoint, session.checkpoint_path)
+        session.checkpoint = None
+        self.spilled += 1
+
+    def _swap_in(self, session: Session):
+        start = time.perf_counter()
+        if session.fresh:
+            self.engine.reset()
+            session.fresh = False
+            return
+
+        checkpoint = session.checkpoint
+        if checkpoint is None and session.checkpoint_path:
+            checkpoint = torch.load(session.checkpoint_path, weights_only=False)
+            os.remove(session.checkpoint_path)
+            session.checkpoint_path = None
+        self.engine.restore(checkpoint)
+        session.checkpoint = None
+        self.swaps_in += 1
+        telemetry.record("session_swap_in_ms", 1000 * (time.perf_counter() - start))
+
+    def stats(self) -> dict:
+        connected = sum(s.connected for s in self.sessions.values())
+        return {
+            "connected": connected,
+            "parked": len(self.sessions) - connected,
+            "idle": self.idle(),
+            "owner": self.owner.id if self.owner else None,
+            "swaps_in": self.swaps_in,
+            "swaps_out": self.swaps_out,
+            "checkpoint_mb": round(self.ram_bytes() / 2**20, 1),
+            "checkpoint_budget_mb": round(self.budget_bytes / 2**20, 1),
+            "spilled": self.spilled,
+            "dropped": self.dropped,
+            "refused": self.refused,
+            "interleave": self.engine.interleave_sessions,
+            "idle_seconds": self.idle_seconds,
+            "resume_ttl": self.resume_ttl,
+        }
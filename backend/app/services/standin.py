@@ -0,0 +1,210 @@
+"""
+GPU-free stand-in for PersonaPlexWrapper.
+
+Follows the real engine's frame semantics so the scheduler, pacing and
+capacity work can be load-tested on any Linux box:
+
+- one 1920-sample (80 ms) frame in, one frame out
+- the first `delay_frames` steps return None (LMGen acoustic delay)
+- configurable per-frame compute time, either slept or burned on the CPU
+- optional batch-size scaling curve for the per-frame cost
+- a share of that cost scaling with the decoded codebooks (quality ladder)
+- prompt prefill costing one step without decode per prompt step (voice
+  prompt plus one per persona word), alone or batched at the batch cost
+- deterministic output: delayed echo of the input, or a per-voice tone
+"""
+
+import logging
+import time
+from collections import deque
+
+import numpy as np
+import torch
+
+from backend.app.core.config import (
+    SAMPLE_RATE, CHUNK_SIZE, STANDIN_COMPUTE_MS, STANDIN_COMPUTE_MODE,
+    STANDIN_DELAY_FRAMES, STANDIN_OUTPUT, STANDIN_BATCH_SCALING, STANDIN_SEED, STANDIN_MODEL_MB,
+    STANDIN_DECODE_SHARE, STANDIN_VOICE_PROMPT_STEPS, NUM_CODEBOOKS,
+)
+
+logger = logging.getLogger("PersonaPlex-StandIn")
+
+
+def parse_batch_scaling(spec: str) -> list[tuple[int, float]]:
+    """Parse "1:1.0,2:1.3,4:1.9" into sorted (batch_size, cost_factor) points."""
+    points = []
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        size, factor = item.split(":")
+        points.append((int(size), float(factor)))
+    return sorted(points) or [(1, 1.0)]
+
+
+class StandInWrapper:
+    """Latency-simulating drop-in for PersonaPlexWrapper (same interface)."""
+
+    def __init__(
+        self,
+        device: str = "cpu",
+        repo_id: str = "standin",
+        compute_ms: float = STANDIN_COMPUTE_MS,
+        compute_mode: str = STANDIN_COMPUTE_MODE,
+        delay_frames: int = STANDIN_DELAY_FRAMES,
+        output: str = STANDIN_OUTPUT,
+        batch_scaling: str = STANDIN_BATCH_SCALING,
+        seed: int = STANDIN_SEED,
+        decode_share: float = STANDIN_DECODE_SHARE,
+        voice_prompt_steps: int = STANDIN_VOICE_PROMPT_STEPS,
+    ):
+        if compute_mode not in ("sleep", "burn"):
+            raise ValueError(f"Unknown stand-in compute mode: {compute_mode}")
+        if output not in ("echo", "tone"):
+            raise ValueError(f"Unknown stand-in output: {output}")
+
+        self.device = torch.device(device)
+        self.repo_id = repo_id
+        self.frame_size = CHUNK_SIZE
+        self.compute_ms = compute_ms
+        self.compute_mode = compute_mode
+        self.delay_frames = delay_frames
+        self.output = output
+        self.batch_scaling = parse_batch_scaling(batch_scaling)
+        self.batch_sizes = sorted({1, *(size for size, _ in self.batch_scaling)})  # Calibrated at warmup
+        self.batched_prefill = True  # Charges one batched pass over the longest prompt
+        self.interleave_sessions = True  # Per-session state is a few frames of history
+        self.seed = seed
+        self.decode_share = decode_share
+        self.voice_prompt_steps = voice_prompt_steps
+
+        self.text_tokenizer = None
+        self.voice_store = None
+        self.current_voice_prompt = None
+        self.current_text_prompt = None
+
+        self._history = deque()
+        self._step = 0
+        logger.info(
+            f"Stand-in engine: {compute_ms} ms/frame ({compute_mode}), "
+            f"delay {delay_frames} frames, output={output}"
+        )
+
+    # --- Prompt API (recorded; prefill only costs time) ---
+
+    def load_voice_prompt(self, voice_name: str):
+        self.current_voice_prompt = voice_name
+
+    def set_text_prompt(self, text_prompt: str, tokenizer=None):
+        self.current_text_prompt = text_prompt
+
+    def prompt_state(self) -> dict:
+        return {"voice": self.current_voice_prompt, "text": self.current_text_prompt}
+
+    def prompt_steps(self, prompt: dict) -> int:
+        return self.voice_prompt_steps + len((prompt["text"] or "").split())
+
+    def prefill(self):
+        self.reset()
+        self._spend(self.prompt_steps(self.prompt_state()) * self.frame_cost(1) * (1.0 - self.decode_share))
+
+    def prefill_batch(self, prompts: list[dict]) -> list[dict]:
+        """One batched pass over the longest prompt at the batch's step cost."""
+        steps = max(self.prompt_steps(prompt) for prompt in prompts)
+        self._spend(steps * self.frame_cost(len(prompts)) * (1.0 - self.decode_share))
+        self.reset()
+        return [self.get_state() for _ in prompts]
+
+    # --- Timing model ---
+
+    def frame_cost(self, batch_size: int = 1) -> float:
+        """
+        Per-step compute time in seconds for a batch, interpolated from the
+        scaling curve (and extrapolated along its last segment).
+        """
+        sizes = [size for size, _ in self.batch_scaling]
+        factors = [factor for _, factor in self.batch_scaling]
+        factor = float(np.interp(batch_size, sizes, factors))
+        if batch_size > sizes[-1] and len(sizes) > 1:
+            slope = (factors[-1] - factors[-2]) / (sizes[-1] - sizes[-2])
+            factor = factors[-1] + slope * (batch_size - sizes[-1])
+        return self.compute_ms * factor / 1000.0
+
+    def _spend(self, seconds: float):
+        if seconds <= 0:
+            return
+        if self.compute_mode == "sleep":
+            time.sleep(seconds)
+            return
+        deadline = time.perf_counter() + seconds
+        scratch = np.ones(4096, dtype=np.float32)
+        while time.perf_counter() < deadline:
+            np.sqrt(scratch, out=scratch)
+
+    # --- Frame semantics ---
+
+    def _generate(self, audio_tensor: torch.Tensor) -> torch.Tensor | None:
+        self._history.append(audio_tensor.clone())
+        step = self._step
+        self._step += 1
+        if step < self.delay_frames:
+            return None
+
+        if self.output == "echo":
+            return self._history.popleft() * 0.5
+
+        self._history.popleft()
+        voice_offset = sum(map(ord, self.current_voice_prompt or "")) % 200
+        freq = 220.0 + voice_offset + (self.seed % 100)
+        t = (torch.arange(self.frame_size, dtype=torch.float32) + step * self.frame_size) / SAMPLE_RATE
+        return (0.1 * torch.sin(2 * torch.pi * freq * t)).view(1, 1, -1).to(self.device)
+
+    def process(self, audio_tensor: torch.Tensor, batch_size: int = 1,
+                codebooks: int = NUM_CODEBOOKS) -> torch.Tensor | None:
+        """
+        Process a single [1, 1, frame_size] frame; None while still buffering.
+        `batch_size` charges the per-frame cost of a step at that batch size;
+        decoding fewer `codebooks` makes the decode share proportionally cheaper.
+        """
+        decode_scale = 1.0 - self.decode_share * (1.0 - codebooks / NUM_CODEBOOKS)
+        self._spend(self.frame_cost(batch_size) * decode_scale)
+        return self._generate(audio_tensor)
+
+    def step_codes(self, codes: torch.Tensor, batch_size: int = 1) -> torch.Tensor | None:
+        """
+        Codes-in/codes-out step: [1, K, T] Mimi codes in, [1, 1 + K, n] tokens out
+        (text token 0, then the input codes delayed by `delay_frames`).
+        """
+        steps = []
+        for c in range(codes.shape[-1]):
+            self._spend(self.frame_cost(batch_size))
+            self._history.append(codes[:, :, c:c + 1].clone())
+            step = self._step
+            self._step += 1
+            if step < self.delay_frames:
+                continue
+            audio = self._history.popleft()
+            steps.append(torch.cat([torch.zeros_like(audio[:, :1]), audio], dim=1))
+        return torch.cat(steps, dim=-1) if steps else None
+
+    def reset(self):
+        self._history.clear()
+        self._step = 0
+
+    def get_state(self) -> dict:
+        return {"history": [t.clone() for t in self._history], "step": self._step}
+
+    def set_state(self, state: dict):
+        self._history = deque(t.clone() for t in state["history"])
+        self._step = state["step"]
+
+    def warmup(self):
+        logger.info("Warming up stand-in engine...")
+        for _ in range(4):
+            self.process(torch.zeros(1, 1, self.frame_size, dtype=torch.float32, device=self.device))
+        self.reset()
+        logger.info("Warmup complete.")
+
+    def memory_bytes(self) -> int:
+        """Simulated model footprint, for residency/budget testing."""
+        return int(STANDIN_MODEL_MB * 1024 * 1024)
+
+    def close(self):
+        pass
@@ -0,0 +1,200 @@
+"""
+Capture and restore of moshi streaming state (Mimi and LMGen).
+
+Every moshi StreamingModule keeps its per-stream state in `_streaming_state`
+(dataclasses holding tensors, and plain tensor holders such as moshi's
+RingKVCache). A snapshot is a host-side deep copy of those states keyed by
+module name. Restoring copies the saved tensors back *into* the live tensors
+where shapes match, so tensor addresses captured by CUDA graphs stay valid.
+
+A batched stream (batched prompt prefill) is split into per-row snapshots
+against the module's batch-1 state: the batch dimension of each tensor is the
+one where the batch-1 tensor has size 1 (moshi's KV cache keeps it second).
+"""
+
+import copy
+import dataclasses
+from numbers import Number
+
+import numpy as np
+import torch
+from torch import nn
+
+
+def _is_tensor_holder(obj) -> bool:
+    """A plain object holding only tensors and scalars (e.g. moshi's RingKVCache)."""
+    if isinstance(obj, (nn.Module, type)) or dataclasses.is_dataclass(obj) or not hasattr(obj, "__dict__"):
+        return False
+    values = vars(obj).values()
+    return any(isinstance(v, torch.Tensor) for v in values) and all(
+        v is None or isinstance(v, (torch.Tensor, Number, str, torch.dtype, torch.device)) for v in values
+    )
+
+
+def _copy_to(obj, device: torch.device):
+    """Deep-copy plain state containers, moving every tensor to `device`."""
+    if isinstance(obj, torch.Tensor):
+        return obj.detach().to(device, copy=True)
+    if dataclasses.is_dataclass(obj) and not isinstance(obj, type):
+        clone = copy.copy(obj)
+        for f in dataclasses.fields(obj):
+            setattr(clone, f.name, _copy_to(getattr(obj, f.name), device))
+        return clone
+    if _is_tensor_holder(obj):
+        clone = copy.copy(obj)
+        for name, value in vars(obj).items():
+            setattr(clone, name, _copy_to(value, device))
+        return clone
+    if isinstance(obj, dict):
+        return {k: _copy_to(v, device) for k, v in obj.items()}
+    if isinstance(obj, (list, tuple)):
+        return type(obj)(_copy_to(v, device) for v in obj)
+    # Scalars and opaque helpers (e.g. CUDA graph wrappers) are kept by reference
+    return obj
+
+
+def _restore_into(current, saved, device: torch.device):
+    """Write `saved` into `current` in place where possible; returns the new value."""
+    if isinstance(saved, torch.Tensor):
+        if isinstance(current, torch.Tensor) and current.shape == saved.shape and current.dtype == saved.dtype:
+            current.copy_(saved, non_blocking=True)
+            return current
+        return saved.to(device, copy=True)
+    if dataclasses.is_dataclass(saved) and not isinstance(saved, type):
+        if type(current) is not type(saved):
+            return _copy_to(saved, device)
+        for f in dataclasses.fields(saved):
+            setattr(current, f.name, _restore_into(getattr(current, f.name), getattr(saved, f.name), device))
+        return current
+    if _is_tensor_holder(saved):
+        if type(current) is not type(saved):
+            return _copy_to(saved, device)
+        for name, value in vars(saved).items():
+            setattr(current, name, _restore_into(getattr(current, name, None), value, device))
+        return current
+    if isinstance(saved, dict):
+        current = current if isinstance(current, dict) else {}
+        return {k: _restore_into(current.get(k), v, device) for k, v in saved.items()}
+    if isinstance(saved, (list, tuple)):
+        current = current if isinstance(current, (list, tuple)) and len(current) == len(saved) else [None] * len(saved)
+        return type(saved)(_restore_into(c, v, device) for c, v in zip(current, saved))
+    return saved
+
+
+def state_nbytes(obj) -> int:
+    """Bytes of tensor and array data held by a snapshot (or a checkpoint containing snapshots)."""
+    if isinstance(obj, torch.Tensor):
+        return obj.nelement() * obj.element_size()
+    if isinstance(obj, np.ndarray):
+        return obj.nbytes
+    if dataclasses.is_dataclass(obj) and not isinstance(obj, type):
+        return sum(state_nbytes(getattr(obj, f.name)) for f in dataclasses.fields(obj))
+    if _is_tensor_holder(obj):
+        return sum(state_nbytes(v) for v in vars(obj).values())
+    if isinstance(obj, dict):
+        return sum(state_nbytes(v) for v in obj.values())
+    if isinstance(obj, (list, tuple)):
+        return sum(state_nbytes(v) for v in obj)
+    return 0
+
+
+def snapshot_streaming_state(module: nn.Module | object, device: str = "cpu") -> dict:
+    """Return a host copy of the streaming state of `module` and all its submodules."""
+    modules = module.named_modules() if isinstance(module, nn.Module) else [("", module)]
+    return {
+        name: _copy_to(m._streaming_state, torch.device(device))
+        for name, m in modules
+        if getattr(m, "_streaming_state", None) is not None
+    }
+
+
+def restore_streaming_state(module: nn.Module | object, snapshot: dict, device: torch.device):
+    """Restore a snapshot taken with `snapshot_streaming_state` into `module`."""
+    modules = dict(module.named_modules()) if isinstance(module, nn.Module) else {"": module}
+    for name, saved in snapshot.items():
+        target = modules[name]
+        target._streaming_state = _restore_into(target._streaming_state, saved, device)
+    if device.type == "cuda":
+        torch.cuda.current_stream(device).synchronize()
+
+
+def _batch_dim(tensor: torch.Tensor, single: torch.Tensor, batch_size: int) -> int | None:
+    """Dimension of `tensor` holding the batch, by comparison with the same tensor at batch size 1."""
+    if tensor.dim() != single.dim():
+        raise ValueError(f"Cannot split a {tuple(tensor.shape)} state tensor against {tuple(single.shape)}")
+    for dim, (n, one) in enumerate(zip(tensor.shape, single.shape)):
+        if n != one:
+            if n != batch_size or one != 1:
+                raise ValueError(f"Cannot split a {tuple(tensor.shape)} state tensor against {tuple(single.shape)}")
+            return dim
+    return None  # Shared by all rows
+
+
+def _select_row(obj, single, index: int, batch_size: int, device: torch.device):
+    """Host copy of row `index` of a batched state, shaped (and with the helpers of) `single`."""
+    if isinstance(obj, torch.Tensor):
+        dim = _batch_dim(obj, single, batch_size)
+        row = obj if dim is None else obj.narrow(dim, index, 1)
+        return row.detach().to(device, copy=True)
+    if dataclasses.is_dataclass(obj) and not isinstance(obj, type):
+        row = copy.copy(single)
+        for f in dataclasses.fields(obj):
+            setattr(row, f.name, _select_row(getattr(obj, f.name), getattr(single, f.name), index, batch_size, device))
+        return row
+    if _is_tensor_holder(obj):
+        row = copy.copy(single)
+        for name, value in vars(obj).items():
+            setattr(row, name, _select_row(value, getattr(single, name), index, batch_size, device))
+        return row
+    if isinstance(obj, dict):
+        return {k: _select_row(v, single[k], index, batch_size, device) for k, v in obj.items()}
+    if isinstance(obj, (list, tuple)):
+        return type(obj)(_select_row(v, s, index, batch_size, device) for v, s in zip(obj, single))
+    if obj is None or isinstance(obj, (bool, float, str)):
+        return obj
+    if isinstance(obj, int):
+        # Counters run on; the batch size becomes the batch-1 one
+        return single if obj == batch_size and single == 1 else obj
+    # Opaque helpers (CUDA graphs, callbacks) belong to the batch-1 stream
+    return single
+
+
+def split_streaming_state(module: nn.Module | object, single: dict, batch_size: int,
+                          device: str = "cpu") -> list[dict]:
+    """
+    Host snapshots (as snapshot_streaming_state) of each row of the
+    `batch_size` stream `module` is in. `single` holds the module's states
+    at batch size 1 (detach_streaming_state): each tensor is sliced along
+    the dimension where its batch-1 counterpart has size 1 and shared by
+    all rows if the shapes match, and CUDA graphs and other helpers are
+    taken from the batch-1 states.
+    """
+    modules = module.named_modules() if isinstance(module, nn.Module) else [("", module)]
+    states = {name: m._streaming_state for name, m in modules if getattr(m, "_streaming_state", None) is not None}
+    return [
+        {name: _select_row(state, single[name], index, batch_size, torch.device(device))
+         for name, state in states.items()}
+        for index in range(batch_size)
+    ]
+
+
+def detach_streaming_state(module: nn.Module | object) -> dict:
+    """
+    Take the live streaming states off `module` and its submodules (keyed by
+    module name), leaving it out of streaming mode so it can be started at
+    another batch size. attach_streaming_state() puts them back.
+    """
+    modules = module.named_modules() if isinstance(module, nn.Module) else [("", module)]
+    states = {}
+    for name, m in modules:
+        if getattr(m, "_streaming_state", None) is not None:
+            states[name] = m._streaming_state
+            m._streaming_state = None
+    return states
+
+
+def attach_streaming_state(module: nn.Module | object, states: dict):
+    """Reinstate states taken with detach_streaming_state()."""
+    modules = dict(module.named_modules()) if isinstance(module, nn.Module) else {"": module}
+    for name, state in states.items():
+        modules[name]._streaming_state = state
@@ -0,0 +1,63 @@
+"""
+Latency telemetry aggregated across all sessions on this node.
+
+Samples are kept in bounded windows per metric, so percentiles reflect
+recent traffic and memory stays constant regardless of uptime.
+"""
+
+import threading
+import time
+from collections import defaultdict, deque
+
+import numpy as np
+
+WINDOW_SIZE = 10000  # Samples kept per metric
+
+
+class LatencyTelemetry:
+    """Windowed latency samples and monotonically increasing counters."""
+
+    def __init__(self, window_size: int = WINDOW_SIZE):
+        self.window_size = window_size
+        self.started_at = time.time()
+        self._samples: dict[str, deque] = defaultdict(lambda: deque(maxlen=self.window_size))
+        self._counters: dict[str, float] = defaultdict(float)
+        self._lock = threading.Lock()
+
+    def record(self, metric: str, value: float):
+        with self._lock:
+            self._samples[metric].append(value)
+
+    def increment(self, counter: str, amount: float = 1):
+        with self._lock:
+            self._counters[counter] += amount
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            samples = {name: np.fromiter(values, dtype=np.float64) for name, values in self._samples.items()}
+            counters = dict(self._counters)
+
+        metrics = {}
+        for name, values in samples.items():
+            if len(values) == 0:
+                continue
+            p50, p95, p99 = np.percentile(values, [50, 95, 99])
+            metrics[name] = {
+                "count": len(values),
+                "mean": round(float(values.mean()), 3),
+                "p50": round(float(p50), 3),
+                "p95": round(float(p95), 3),
+                "p99": round(float(p99), 3),
+                "max": round(float(values.max()), 3),
+            }
+        return {"since": self.started_at, "metrics": metrics, "counters": counters}
+
+    def reset(self):
+        with self._lock:
+            self._samples.clear()
+            self._counters.clear()
+            self.started_at = time.time()
+
+
+# Global Instance
+telemetry = LatencyTelemetry()
@@ -0,0 +1,271 @@
+"""
+Tiny CPU stand-in for the Mimi codec and the PersonaPlex LM.
+
+Unlike the stand-in engine (standin.py), which only simulates latency, this
+is a real (randomly initialised, seeded) torch model with the same streaming
+interfaces PersonaPlexWrapper drives:
+
+- TinyMimi.encode: [B, 1, T * 1920] PCM -> [B, 8, T] codes
+- TinyMimi.decode: [B, 8, T] codes -> [B, 1, T * 1920] PCM (stateful)
+- TinyLMGen.step: [B, 8, 1] codes -> [B, 17, 1] tokens (text, 8 output and
+  8 input codebooks) or None during the initial acoustic delay
+- TinyLMGen.step_system_prompts: teacher-forced pass over the voice prompt
+  embeddings, silence, the text prompt (with a byte-level TinyTokenizer) and
+  silence, in the segments moshi-personaplex's LMGen runs
+
+Streaming state lives in `_streaming_state` like moshi's StreamingModules
+(with a batch size and an exec mask that freezes rows), so checkpoint/restore,
+batched prefill, the numerical-equivalence harness and other CPU-only tooling
+exercise the real wrapper code paths. Decoding is greedy, so a run is
+fully determined by the seed and the input.
+"""
+
+from dataclasses import dataclass
+
+import torch
+from torch import nn
+
+from backend.app.core.config import SAMPLE_RATE
+
+NUM_CODEBOOKS = 8
+CARDINALITY = 256
+TEXT_VOCAB = 64
+PROMPT_SILENCE_STEPS = 2  # Silent steps before and after the text prompt
+
+
+@dataclass
+class _State:
+    batch_size: int
+
+    def __post_init__(self):
+        # As moshi's State: rows where it is False are not advanced (not a field, never checkpointed)
+        self.exec_mask = torch.ones(self.batch_size, dtype=torch.bool)
+
+
+@dataclass
+class _DecoderState(_State):
+    latent: torch.Tensor  # [B, dim] running decoder latent
+
+
+@dataclass
+class _LMGenState(_State):
+    hidden: torch.Tensor  # [B, dim] recurrent state
+    text: torch.Tensor  # [B] previous text token
+    audio: torch.Tensor  # [B, K] previous output codes
+    offset: int
+
+
+class _Streaming(nn.Module):
+    """Minimal streaming_forever/reset_streaming/set_exec_mask protocol (as in moshi)."""
+
+    def __init__(self):
+        super().__init__()
+        self._streaming_state = None
+
+    def streaming_forever(self, batch_size: int):
+        self._streaming_state = self._init_state(batch_size)
+
+    def reset_streaming(self):
+        self._streaming_state = self._init_state(self._streaming_state.batch_size)
+
+    def set_exec_mask(self, exec_mask: torch.Tensor):
+        self._streaming_state.exec_mask = exec_mask.to(self.device, torch.bool)
+
+    def _init_state(self, batch_size: int):
+        raise NotImplementedError
+
+    @property
+    def device(self) -> torch.device:
+        return next(self.parameters()).device
+
+
+class TinyMimi(_Streaming):
+    """Strided-conv encoder, per-codebook argmax quantizer and a leaky recurrent decoder."""
+
+    sample_rate = SAMPLE_RATE
+    frame_rate = 12.5
+
+    def __init__(self, dim: int = 64, num_codebooks: int = NUM_CODEBOOKS, cardinality: int = CARDINALITY):
+        super().__init__()
+        self.dim = dim
+        self.num_codebooks = num_codebooks
+        self.cardinality = cardinality
+        frame_size = int(self.sample_rate / self.frame_rate)
+        self.encoder = nn.Conv1d(1, dim, kernel_size=frame_size, stride=frame_size)
+        self.quantizer = nn.Linear(dim, num_codebooks * cardinality)
+        self.embed = nn.Embedding(num_codebooks * cardinality, dim)
+        self.decoder = nn.Linear(dim, frame_size)
+
+    def _init_state(self, batch_size: int) -> _DecoderState:
+        return _DecoderState(batch_size, latent=torch.zeros(batch_size, self.dim, device=self.device))
+
+    def _offsets(self, device: torch.device) -> torch.Tensor:
+        return torch.arange(self.num_codebooks, device=device) * self.cardinality
+
+    def encode(self, pcm: torch.Tensor) -> torch.Tensor:
+        z = self.encoder(pcm).transpose(1, 2)  # [B, T, dim]
+        logits = self.quantizer(z).view(z.shape[0], z.shape[1], self.num_codebooks, self.cardinality)
+        return logits.argmax(-1).transpose(1, 2)  # [B, K, T]
+
+    def decode(self, codes: torch.Tensor) -> torch.Tensor:
+        """Streaming decode continues from the saved latent; outside streaming each call starts fresh."""
+        state = self._streaming_state
+        # Fewer codebooks than num_codebooks decode the leading ones (as Mimi's residual quantizer)
+        offsets = self._offsets(codes.device)[:codes.shape[1]]
+        latents = self.embed(codes + offsets[None, :, None]).sum(1)  # [B, T, dim]
+        frames = []
+        latent = state.latent if state is not None else latents.new_zeros(latents.shape[0], self.dim)
+        for t in range(latents.shape[1]):
+            latent = 0.5 * latent + latents[:, t]
+            frames.append(torch.tanh(self.decoder(latent)))
+        if state is not None:
+            state.latent = latent
+        return torch.cat(frames, dim=-1).unsqueeze(1)
+
+
+class TinyBlock(nn.Module):
+    def __init__(self, dim: int):
+        super().__init__()
+        self.norm = nn.LayerNorm(dim)
+        self.up = nn.Linear(dim, 4 * dim)
+        self.down = nn.Linear(4 * dim, dim)
+
+    def forward(self, x: torch.Tensor) -> torch.Tensor:
+        return x + self.down(torch.nn.functional.gelu(self.up(self.norm(x))))
+
+
+class TinyLM(nn.Module):
+    """Recurrent cell followed by a stack of residual MLP layers and text/audio heads."""
+
+    def __init__(self, dim: int = 64, num_layers: int = 4, num_codebooks: int = NUM_CODEBOOKS,
+                 cardinality: int = CARDINALITY, text_vocab: int = TEXT_VOCAB):
+        super().__init__()
+        self.dim = dim
+        self.num_codebooks = num_codebooks
+        self.cardinality = cardinality
+        # Input codes and previously generated codes use separate embedding rows
+        self.audio_emb = nn.Embedding(2 * num_codebooks * cardinality, dim)
+        self.text_emb = nn.Embedding(text_vocab, dim)
+        self.cell = nn.GRUCell(dim, dim)
+        self.layers = nn.ModuleList(TinyBlock(dim) for _ in range(num_layers))
+        self.norm = nn.LayerNorm(dim)
+        self.text_head = nn.Linear(dim, text_vocab)
+        self.audio_head = nn.Linear(dim, num_codebooks * cardinality)
+
+    def forward(self, codes: torch.Tensor, prev_audio: torch.Tensor, prev_text: torch.Tensor,
+                hidden: torch.Tensor, embedding: torch.Tensor | None = None) -> tuple[torch.Tensor, torch.Tensor, torch.Tensor]:
+        offsets = torch.arange(self.num_codebooks, device=codes.device) * self.cardinality
+        x = (
+            self.audio_emb(codes + offsets).sum(1)
+            + self.audio_emb(prev_audio + offsets + self.num_codebooks * self.cardinality).sum(1)
+            + self.text_emb(prev_text)
+        )
+        if embedding is not None:
+            x = x + embedding  # Voice prompt frame
+        hidden = self.cell(x, hidden)
+        x = hidden
+        for layer in self.layers:
+            x = layer(x)
+        x = self.norm(x)
+        audio_logits = self.audio_head(x).view(-1, self.num_codebooks, self.cardinality)
+        return self.text_head(x), audio_logits, hidden
+
+
+class TinyTokenizer:
+    """Byte-level stand-in for the sentencepiece tokenizer (ids folded into TEXT_VOCAB)."""
+
+    def encode(self, text: str) -> list[int]:
+        return [byte % TEXT_VOCAB for byte in text.encode()]
+
+
+class TinyLMGen(_Streaming):
+    """Greedy streaming generator around TinyLM with an initial acoustic delay."""
+
+    def __init__(self, lm: TinyLM, delay_steps: int = 2):
+        super().__init__()
+        self.lm = lm
+        self.delay_steps = delay_steps
+        # Prompt attributes PersonaPlexWrapper sets (voice prompt embeddings [T, dim] and text tokens are used)
+        self.text_prompt_tokens = None
+        self.voice_prompt = None
+        self.voice_prompt_audio = None
+        self.voice_prompt_embeddings = None
+        self.voice_prompt_cache = None
+
+    def _init_state(self, batch_size: int) -> _LMGenState:
+        device = self.device
+        return _LMGenState(
+            batch_size,
+            hidden=torch.zeros(batch_size, self.lm.dim, device=device),
+            text=torch.zeros(batch_size, dtype=torch.long, device=device),
+            audio=torch.zeros(batch_size, self.lm.num_codebooks, dtype=torch.long, device=device),
+            offset=0,
+        )
+
+    def step(self, codes: torch.Tensor) -> torch.Tensor | None:
+        state = self._streaming_state
+        input_codes = codes[:, :, 0]
+        text_logits, audio_logits, state.hidden = self.lm(input_codes, state.audio, state.text, state.hidden)
+        state.text = text_logits.argmax(-1)
+        state.audio = audio_logits.argmax(-1)
+        state.offset += 1
+        if state.offset <= self.delay_steps:
+            return None
+        return torch.cat([state.text[:, None], state.audio, input_codes], dim=1).unsqueeze(-1)
+
+    # --- System prompts ---
+
+    def _prompt_step(self, text: int, embedding: torch.Tensor | None = None):
+        """Teacher-forced step on silent input; rows outside the exec mask keep their state."""
+        state = self._streaming_state
+        text = torch.full_like(state.text, text)
+        _, audio_logits, hidden = self.lm(torch.zeros_like(state.audio), state.audio, text, state.hidden, embedding)
+        active = state.exec_mask.to(state.hidden.device)
+        state.hidden = torch.where(active[:, None], hidden, state.hidden)
+        state.audio = torch.where(active[:, None], audio_logits.argmax(-1), state.audio)
+        state.text = torch.where(active, text, state.text)
+
+    def _step_voice_prompt(self, mimi=None):
+        if self.voice_prompt_embeddings is not None:
+            for embedding in self.voice_prompt_embeddings.to(self.device):
+                self._prompt_step(0, embedding)
+
+    def _step_audio_silence(self):
+        for _ in range(PROMPT_SILENCE_STEPS):
+            self._prompt_step(0)
+
+    def _step_text_prompt(self):
+        for token in self.text_prompt_tokens or []:
+            self._prompt_step(token)
+
+    def step_system_prompts(self, mimi=None):
+        """Run the prompt pass (the acoustic delay only starts counting after it)."""
+        self._step_voice_prompt(mimi)
+        self._step_audio_silence()
+        self._step_text_prompt()
+        self._step_audio_silence()
+
+
+def build_tiny_wrapper(device: str = "cpu", seed: int = 0, dim: int = 64, num_layers: int = 4):
+    """PersonaPlexWrapper around a seeded tiny model (identical weights for identical seeds)."""
+    from backend.app.services.engine import PersonaPlexWrapper
+
+    generator_state = torch.random.get_rng_state()
+    torch.manual_seed(seed)
+    try:
+        mimi = TinyMimi(dim).to(device).eval()
+        lm_gen = TinyLMGen(TinyLM(dim, num_layers).to(device)).eval()
+    finally:
+        torch.random.set_rng_state(generator_state)
+    return PersonaPlexWrapper.from_components(mimi, lm_gen, device=device, repo_id=f"tiny-{seed}",
+                                              text_tokenizer=TinyTokenizer())
+
+
+def build_tiny_mimi(device: str = "cpu", seed: int = 0, dim: int = 64) -> TinyMimi:
+    """The codec half of build_tiny_wrapper() (same weights for the same seed), not in streaming mode."""
+    generator_state = torch.random.get_rng_state()
+    torch.manual_seed(seed)
+    try:
+        return TinyMimi(dim).to(device).eval()
+    finally:
+        torch.random.set_rng_state(generator_state)
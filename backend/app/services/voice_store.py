@@ -0,0 +1,160 @@
+"""
+Content-addressed, versioned store of voice-prompt embeddings.
+
+Layout (one tree per store format version and model checkpoint):
+
+    <VOICE_STORE_DIR>/v<STORE_VERSION>/<model>/
+        index.json                 voice name -> {digest, source, created[, path, size, mtime_ns]}
+        objects/<ab>/<digest>.pt   {"embeddings": Tensor, "cache": Tensor}
+
+Objects are keyed by the SHA-256 of the source (reference WAV or built-in
+.pt file), so enrolling the same audio twice never recomputes anything.
+Built-in voices also record the file they were imported from, so a voice
+pack swap (another voice_prompt_dir, or files replaced in place) re-imports
+them instead of serving the old pack's embeddings.
+The index is kept in memory, and the most recently used embeddings are kept
+device-resident in an LRU so switching voices on the hot path needs no disk I/O.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+
+import torch
+
+logger = logging.getLogger("PersonaPlex-VoiceStore")
+
+STORE_VERSION = 1
+
+
+def content_digest(data: bytes) -> str:
+    """Content address of a voice source."""
+    return hashlib.sha256(data).hexdigest()
+
+
+def _file_source(path: str) -> dict:
+    """Identity of a built-in voice file: absolute path, size and modification time."""
+    stat = os.stat(path)
+    return {"path": os.path.abspath(path), "size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+
+class VoiceStore:
+    """Voice-prompt embedding store with an in-memory index and a device-resident LRU."""
+
+    def __init__(self, root: str, model_id: str, device: torch.device, cache_size: int = 64):
+        self.root = Path(root) / f"v{STORE_VERSION}" / model_id.replace("/", "--")
+        self.objects_dir = self.root / "objects"
+        self.index_path = self.root / "index.json"
+        self.device = device
+        self.cache_size = cache_size
+
+        self.objects_dir.mkdir(parents=True, exist_ok=True)
+        self.index: dict[str, dict] = {}
+        if self.index_path.exists():
+            with open(self.index_path) as f:
+                self.index = json.load(f)
+
+        self._cache: OrderedDict[str, dict] = OrderedDict()  # digest -> device-resident state
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+        logger.info(f"Voice store at {self.root} ({len(self.index)} voices)")
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.index
+
+    def _object_path(self, digest: str) -> Path:
+        return self.objects_dir / digest[:2] / f"{digest}.pt"
+
+    def has_object(self, digest: str) -> bool:
+        return self._object_path(digest).exists()
+
+    def _write_index(self):
+        tmp = self.index_path.with_suffix(".tmp")
+        with open(tmp, "w") as f:
+            json.dump(self.index, f, indent=2)
+        os.replace(tmp, self.index_path)
+
+    def put(self, name: str, digest: str, state: dict | None = None, source: str = "enrolled", **details) -> dict:
+        """
+        Register `name` -> `digest`. `state` may be omitted when the object
+        already exists (e.g. the same reference audio enrolled under a new name).
+        """
+        with self._lock:
+            path = self._object_path(digest)
+            if not path.exists():
+                if state is None:
+                    raise KeyError(f"No stored embedding for digest {digest}")
+                path.parent.mkdir(parents=True, exist_ok=True)
+                host_state = {k: v.detach().cpu() for k, v in state.items()}
+                tmp = path.with_suffix(".tmp")
+                torch.save(host_state, tmp)
+                os.replace(tmp, path)
+
+            entry = {"digest": digest, "source": source, "created": time.time(), **details}
+            self.index[name] = entry
+            self._write_index()
+            return entry
+
+    def import_file(self, name: str, path: str) -> dict:
+        """Import a pre-computed embedding file (e.g. a built-in NATF0.pt)."""
+        source = _file_source(path)
+        with open(path, "rb") as f:
+            data = f.read()
+        digest = content_digest(data)
+        if not self.has_object(digest):
+            state = torch.load(path, map_location="cpu")
+            return self.put(name, digest, state, source="builtin", **source)
+        return self.put(name, digest, source="builtin", **source)
+
+    def imported_from(self, name: str, path: str) -> bool:
+        """Whether `name` is a built-in voice imported from `path` as it is now (same file, size and mtime)."""
+        entry = self.index.get(name)
+        if entry is None or entry["source"] != "builtin":
+            return False
+        try:
+            source = _file_source(path)
+        except OSError:
+            return False
+        return all(entry.get(key) == value for key, value in source.items())
+
+    def get(self, name: str) -> dict:
+        """Return the device-resident embedding state for `name`."""
+        digest = self.index[name]["digest"]
+        with self._lock:
+            state = self._cache.get(digest)
+            if state is not None:
+                self._cache.move_to_end(digest)
+                self.hits += 1
+                return state
+
+            self.misses += 1
+            state = torch.load(self._object_path(digest), map_location=self.device)
+            self._cache[digest] = state
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+            return state
+
+    def remove(self, name: str):
+        """Drop a name from the index. Objects are kept (other names may share them)."""
+        with self._lock:
+            self.index.pop(name, None)
+            self._write_index()
+
+    def list(self) -> list[dict]:
+        return [{"name": name, **entry} for name, entry in sorted(self.index.items())]
+
+    def stats(self) -> dict:
+        return {
+            "voices": len(self.index),
+            "resident": len(self._cache),
+            "cache_size": self.cache_size,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
@@ -0,0 +1,95 @@
+"""
+Benchmark the egress path: legacy per-frame `.cpu().numpy().astype().tobytes()`
+plus `bytes` concatenation vs the EgressStage (on-device conversion, async copy
+into pooled host buffers, one copy out per call).
+
+Counts host-side copies and bytes copied per call, and the time per frame.
+
+Usage:
+    python backend/devtools/bench_egress.py [--device cuda] [--frames-per-call 1] [--calls 500]
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+import numpy as np
+import torch
+
+from backend.app.services.egress import EgressStage
+
+FRAME_SIZE = 1920
+
+
+def sync(device: torch.device):
+    if device.type == "cuda":
+        torch.cuda.synchronize(device)
+
+
+def legacy(frames: list[torch.Tensor]) -> tuple[bytes, int, int]:
+    """The old engine path, instrumented: returns (output, copies, bytes_copied)."""
+    copies = bytes_copied = 0
+    output_audio = b""
+    for out_tensor in frames:
+        host = out_tensor.squeeze().cpu()
+        if out_tensor.device.type != "cpu":
+            copies, bytes_copied = copies + 1, bytes_copied + 4 * host.numel()
+        out_np = host.numpy().astype(np.float32)       # astype copies by default
+        chunk = out_np.tobytes()                        # ndarray -> bytes copy
+        output_audio += chunk                           # re-copies everything so far
+        copies += 3
+        bytes_copied += 2 * len(chunk) + len(output_audio)
+    return output_audio, copies, bytes_copied
+
+
+def run(name: str, fn, frames: list[torch.Tensor], calls: int, device: torch.device):
+    fn(frames)  # warmup
+    sync(device)
+    start = time.perf_counter()
+    copies = bytes_copied = 0
+    for _ in range(calls):
+        _, c, b = fn(frames)
+        copies += c
+        bytes_copied += b
+    sync(device)
+    elapsed = time.perf_counter() - start
+    n = calls * len(frames)
+    print(
+        f"{name:8s} {1e6 * elapsed / n:8.1f} us/frame   "
+        f"{copies / calls:5.1f} copies/call   {bytes_copied / calls / 1024:8.1f} KiB copied/call"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--device", default="cuda" if torch.cuda.is_available() else "cpu")
+    parser.add_argument("--frames-per-call", type=int, default=1)
+    parser.add_argument("--calls", type=int, default=500)
+    args = parser.parse_args()
+
+    device = torch.device(args.device)
+    frames = [torch.randn(1, 1, FRAME_SIZE, device=device) * 0.3 for _ in range(args.frames_per_call)]
+    stage = EgressStage(device, FRAME_SIZE)
+
+    def egress(frames):
+        copies, bytes_copied = stage.copies, stage.bytes_copied
+        stage.begin()
+        for pcm in frames:
+            stage.submit(pcm)
+        data = stage.finish().tobytes()
+        return data, stage.copies - copies, stage.bytes_copied - bytes_copied
+
+    expected, _, _ = legacy(frames)
+    got, _, _ = egress(frames)
+    assert got == np.clip(np.frombuffer(expected, dtype=np.float32), -1, 1).tobytes(), "Egress output mismatch"
+
+    print(f"device={device}, frames/call={args.frames_per_call}, calls={args.calls}")
+    run("legacy", legacy, frames, args.calls, device)
+    run("egress", egress, frames, args.calls, device)
+
+
+if __name__ == "__main__":
+    main()
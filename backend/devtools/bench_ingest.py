@@ -0,0 +1,76 @@
+"""
+Benchmark the WebSocket ingest path: per-message engine calls (old behaviour,
+128-sample worklet messages) vs frame-aligned aggregation.
+
+Reports, per session, the message rate and server CPU time per second of audio.
+Runs against whatever engine loads (PersonaPlex on GPU, or the MOCK fallback).
+
+Usage:
+    python backend/devtools/bench_ingest.py [--seconds 10]
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+import numpy as np
+
+from backend.app.core.config import SAMPLE_RATE
+from backend.app.services.engine import engine
+from backend.app.services.ingest import FrameAggregator
+
+QUANTUM = 128  # AudioWorklet render quantum
+
+
+def make_messages(seconds: float, message_samples: int) -> list[bytes]:
+    rng = np.random.default_rng(0)
+    audio = rng.uniform(-0.1, 0.1, int(seconds * SAMPLE_RATE)).astype(np.float32)
+    return [audio[i:i + message_samples].tobytes() for i in range(0, len(audio), message_samples)]
+
+
+def run(messages: list[bytes], aggregate: bool) -> dict:
+    engine.reset()
+    aggregator = FrameAggregator()
+    engine_calls = 0
+    cpu_start = time.thread_time()
+    for msg in messages:
+        chunk = aggregator.push(msg) if aggregate else msg
+        if chunk is None:
+            continue
+        engine.process_audio_frame(chunk)
+        engine_calls += 1
+    cpu = time.thread_time() - cpu_start
+    audio_seconds = sum(len(m) for m in messages) / 4 / SAMPLE_RATE
+    return {
+        "messages_per_second": len(messages) / audio_seconds,
+        "engine_calls": engine_calls,
+        "cpu_ms_per_audio_second": 1000 * cpu / audio_seconds,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--seconds", type=float, default=10.0, help="Seconds of audio per run")
+    args = parser.parse_args()
+
+    print(f"Engine: {'MOCK' if engine.is_mock else 'PersonaPlex'}")
+    cases = [
+        ("before: 128-sample messages, per-message engine calls", make_messages(args.seconds, QUANTUM), False),
+        ("after:  128-sample messages, server-side aggregation", make_messages(args.seconds, QUANTUM), True),
+        ("after:  1920-sample worklet frames", make_messages(args.seconds, 1920), True),
+    ]
+    for name, messages, aggregate in cases:
+        result = run(messages, aggregate)
+        print(
+            f"{name}\n"
+            f"    messages/s: {result['messages_per_second']:.1f}  "
+            f"engine calls: {result['engine_calls']}  "
+            f"CPU: {result['cpu_ms_per_audio_second']:.2f} ms per audio second"
+        )
+
+
+if __name__ == "__main__":
+    main()
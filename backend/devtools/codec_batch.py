@@ -0,0 +1,92 @@
+"""
+Batch-tokenize audio with the standalone codec (no LM) and report throughput.
+
+Encodes every 24 kHz mono WAV under --input (or --synthetic N clips) to Mimi
+codes, optionally writing one .npy per file and decoding the codes back to
+check the round trip. Prints throughput in audio-hours per hour of compute,
+so CPU boxes can be sized for dataset tokenization.
+
+Usage:
+    python backend/devtools/codec_batch.py --input data/wavs --output data/codes
+    python backend/devtools/codec_batch.py --synthetic 64 --seconds 20 --backend tiny --device cpu --decode
+"""
+
+import argparse
+import os
+import sys
+import time
+import wave
+from pathlib import Path
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+import numpy as np
+
+from backend.app.core.config import SAMPLE_RATE, CODEC_MAX_BATCH
+from backend.app.services.codec import CodecService
+
+
+def read_wav(path: Path) -> np.ndarray:
+    with wave.open(str(path)) as wav_file:
+        if wav_file.getframerate() != SAMPLE_RATE or wav_file.getnchannels() != 1 or wav_file.getsampwidth() != 2:
+            raise ValueError(f"{path}: expected 16-bit mono {SAMPLE_RATE} Hz WAV")
+        frames = wav_file.readframes(wav_file.getnframes())
+    return np.frombuffer(frames, dtype=np.int16).astype(np.float32) / 32768.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--input", type=Path, help="Directory of WAV files (searched recursively)")
+    parser.add_argument("--output", type=Path, help="Write <name>.npy codes here")
+    parser.add_argument("--synthetic", type=int, default=0, help="Encode N synthetic clips instead")
+    parser.add_argument("--seconds", type=float, default=10.0, help="Length of synthetic clips")
+    parser.add_argument("--backend", default=None, help="mimi or tiny (default: CODEC_BACKEND)")
+    parser.add_argument("--device", default=None, help="Default: CODEC_DEVICE")
+    parser.add_argument("--max-batch", type=int, default=CODEC_MAX_BATCH)
+    parser.add_argument("--decode", action="store_true", help="Also decode the codes and report throughput")
+    args = parser.parse_args()
+
+    if args.input:
+        paths = sorted(args.input.rglob("*.wav"))
+        names = [str(p.relative_to(args.input).with_suffix("")) for p in paths]
+        audio = [read_wav(p) for p in paths]
+    elif args.synthetic:
+        rng = np.random.default_rng(0)
+        names = [f"synthetic-{i}" for i in range(args.synthetic)]
+        audio = [
+            rng.normal(0, 0.1, int(args.seconds * SAMPLE_RATE * rng.uniform(0.5, 1.0))).astype(np.float32)
+            for _ in names
+        ]
+    else:
+        parser.error("Pass --input or --synthetic")
+
+    kwargs = {k: v for k, v in (("backend", args.backend), ("device", args.device)) if v}
+    codec = CodecService(max_batch=args.max_batch, **kwargs)
+    audio_hours = sum(len(a) for a in audio) / SAMPLE_RATE / 3600
+
+    start = time.perf_counter()
+    codes = [None] * len(audio)
+    for index, item_codes in codec.iter_encode(audio):
+        codes[index] = item_codes
+        if args.output:
+            target = args.output / f"{names[index]}.npy"
+            target.parent.mkdir(parents=True, exist_ok=True)
+            np.save(target, item_codes)
+    elapsed = time.perf_counter() - start
+    print(f"Encoded {len(audio)} items ({audio_hours * 3600:.1f} s of audio) in {elapsed:.2f} s: "
+          f"{audio_hours / (elapsed / 3600):.1f} audio-hours/hour")
+
+    if args.decode:
+        start = time.perf_counter()
+        decoded = codec.decode(codes)
+        elapsed = time.perf_counter() - start
+        print(f"Decoded {len(decoded)} items in {elapsed:.2f} s: {audio_hours / (elapsed / 3600):.1f} audio-hours/hour")
+
+    for direction, stats in codec.stats.snapshot().items():
+        if stats["batches"]:
+            print(f"{direction}: {stats['batches']} batches, mean batch size {stats['mean_batch_size']}, "
+                  f"{stats['audio_hours_per_hour']} audio-hours/hour (model time only)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,211 @@
+"""
+Reference edge relay for the codes-in / codes-out transport.
+
+Browsers connect to the relay with the normal /ws protocol (float32 PCM,
+JSON text messages, `?resume=`, optional frame header). The relay runs the
+Mimi codec locally and talks to the central server's /ws/codes endpoint,
+which only runs the LM:
+
+    client --PCM--> relay: mimi.encode --codes (16 B/frame)--> central: lm_gen.step
+    client <--PCM-- relay: mimi.decode <--tokens (18 B/step)-- central
+
+One streaming Mimi is shared by all relayed sessions; each session's codec
+state is swapped in before it is used (streaming_state.py). Client PCM goes
+through the server's sanitizer (ingest.sanitize_pcm) before encoding. Codec
+state lives only as long as the client connection: on every session message
+from upstream (connect, resume, model switch) the session's codec is reset,
+so a resumed call gets its LM state back from the server and a fresh codec
+stream here. Text messages
+pass through unchanged. Per-session byte counts are logged on disconnect, to
+compare the upstream bandwidth with what raw PCM would have cost.
+
+Usage:
+    python backend/devtools/edge_relay.py --upstream wss://central:8000/ws/codes --insecure \\
+        --listen 0.0.0.0:8100 --backend mimi --device cpu
+"""
+
+import argparse
+import asyncio
+import itertools
+import json
+import logging
+import os
+import ssl
+import sys
+import threading
+from urllib.parse import urlsplit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+import numpy as np
+import torch
+import websockets
+
+from backend.app.core.config import NUM_CODEBOOKS
+from backend.app.services.codec import load_mimi
+from backend.app.services.frame_header import CLIENT_HEADER, SERVER_HEADER, split_client_frame
+from backend.app.services.ingest import FrameAggregator, sanitize_pcm
+from backend.app.services.streaming_state import snapshot_streaming_state, restore_streaming_state
+
+logger = logging.getLogger("PersonaPlex-Relay")
+
+
+class EdgeCodec:
+    """Streaming Mimi shared by all relayed sessions, with per-session state swapping."""
+
+    def __init__(self, backend: str, device: str):
+        self.device = torch.device(device)
+        self.mimi = load_mimi(backend, device)
+        self.frame_size = int(self.mimi.sample_rate / self.mimi.frame_rate)
+        self.mimi.streaming_forever(batch_size=1)
+        self._initial = snapshot_streaming_state(self.mimi)
+        self._states: dict[int, dict] = {}
+        self._owner: int | None = None
+        self._lock = threading.Lock()
+
+    def _activate(self, session: int):
+        if self._owner == session:
+            return
+        if self._owner is not None:
+            self._states[self._owner] = snapshot_streaming_state(self.mimi)
+        restore_streaming_state(self.mimi, self._states.pop(session, self._initial), self.device)
+        self._owner = session
+
+    def encode(self, session: int, pcm: bytes) -> bytes | None:
+        """float32 PCM (whole frames) -> int16 [frames, 8] codes (None for NaN/Inf input)."""
+        samples = sanitize_pcm(np.frombuffer(pcm, dtype=np.float32))
+        if samples is None:
+            return None
+        audio = torch.from_numpy(samples).view(1, 1, -1).to(self.device)
+        with self._lock, torch.no_grad():
+            self._activate(session)
+            codes = self.mimi.encode(audio)
+        return codes[0].T.to(torch.int16).cpu().numpy().astype("<i2").tobytes()
+
+    def decode(self, session: int, tokens: bytes) -> bytes:
+        """int16 [steps, 9] tokens -> float32 PCM of the 8 audio codebooks."""
+        steps = np.frombuffer(tokens, dtype="<i2").reshape(-1, NUM_CODEBOOKS + 1)
+        codes = torch.from_numpy(steps[:, 1:].T.astype(np.int64)).unsqueeze(0).to(self.device)
+        with self._lock, torch.no_grad():
+            self._activate(session)
+            pcm = self.mimi.decode(codes)
+        return pcm.reshape(-1).to(torch.float32).clamp(-1.0, 1.0).cpu().numpy().tobytes()
+
+    def reset(self, session: int):
+        """Start the session's codec stream over (its next frame runs from the initial state)."""
+        with self._lock:
+            self._states.pop(session, None)
+            if self._owner == session:
+                restore_streaming_state(self.mimi, self._initial, self.device)
+
+    def release(self, session: int):
+        with self._lock:
+            self._states.pop(session, None)
+            if self._owner == session:
+                self._owner = None
+
+
+async def relay(client, codec: EdgeCodec, upstream_url: str, ssl_ctx, session: int):
+    query = urlsplit(client.request.path).query
+    url = f"{upstream_url}?{query}" if query else upstream_url
+    counters = {"client_in": 0, "client_out": 0, "upstream_out": 0, "upstream_in": 0}
+    header = False  # Frame header, switched when the server acknowledges a config (see frame_header.py)
+
+    async with websockets.connect(url, ssl=ssl_ctx, max_size=None, open_timeout=10) as upstream:
+        async def client_to_upstream():
+            aggregator = FrameAggregator(codec.frame_size * 4)
+            async for message in client:
+                if isinstance(message, str):
+                    await upstream.send(message)
+                    continue
+                counters["client_in"] += len(message)
+                payload = message
+                if header:
+                    try:
+                        seq, capture_ts, payload = split_client_frame(message)
+                    except ValueError as e:
+                        logger.warning(f"Session {session}: dropped a binary message ({e})")
+                        continue
+                pcm = aggregator.push(payload)
+                if pcm is None:
+                    continue
+                codes = await asyncio.to_thread(codec.encode, session, pcm)
+                if codes is None:
+                    logger.warning(f"Session {session}: dropped invalid audio (NaN/Inf)")
+                    continue
+                if header:
+                    codes = CLIENT_HEADER.pack(seq, capture_ts) + codes
+                counters["upstream_out"] += len(codes)
+                await upstream.send(codes)
+
+        async def upstream_to_client():
+            nonlocal header
+            async for message in upstream:
+                if isinstance(message, str):
+                    data = json.loads(message)
+                    if data.get("type") == "session":
+                        # New or resumed upstream session: the codec stream starts over explicitly
+                        await asyncio.to_thread(codec.reset, session)
+                    if data.get("type") == "configured" or (data.get("type") == "session" and data.get("resumed")):
+                        header = bool(data.get("frameHeader"))
+                    await client.send(message)
+                    continue
+                counters["upstream_in"] += len(message)
+                head, tokens = (message[:SERVER_HEADER.size], message[SERVER_HEADER.size:]) if header else (b"", message)
+                pcm = await asyncio.to_thread(codec.decode, session, tokens)
+                counters["client_out"] += len(pcm)
+                await client.send(head + pcm)
+
+        tasks = [asyncio.create_task(client_to_upstream()), asyncio.create_task(upstream_to_client())]
+        try:
+            await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            for task in tasks:
+                task.cancel()
+            codec.release(session)
+            pcm_bytes = counters["client_in"] + counters["client_out"]
+            codes_bytes = counters["upstream_out"] + counters["upstream_in"]
+            logger.info(
+                f"Session {session} closed: {counters} "
+                f"(upstream {codes_bytes} B vs {pcm_bytes} B of PCM, {pcm_bytes / max(codes_bytes, 1):.0f}x less)"
+            )
+
+
+async def main_async(args):
+    ssl_ctx = None
+    if args.upstream.startswith("wss://"):
+        ssl_ctx = ssl.create_default_context()
+        if args.insecure:
+            ssl_ctx.check_hostname = False
+            ssl_ctx.verify_mode = ssl.CERT_NONE
+
+    codec = EdgeCodec(args.backend, args.device)
+    session_ids = itertools.count(1)
+
+    async def handler(client):
+        session = next(session_ids)
+        try:
+            await relay(client, codec, args.upstream, ssl_ctx, session)
+        except Exception as e:
+            logger.error(f"Session {session} failed: {e}")
+
+    host, _, port = args.listen.rpartition(":")
+    async with websockets.serve(handler, host or "0.0.0.0", int(port), max_size=None):
+        logger.info(f"Relaying ws://{args.listen} -> {args.upstream} (codec: {args.backend} on {args.device})")
+        await asyncio.Future()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--upstream", default="ws://localhost:8000/ws/codes")
+    parser.add_argument("--listen", default="0.0.0.0:8100")
+    parser.add_argument("--backend", default="mimi", help="Codec backend: mimi or tiny")
+    parser.add_argument("--device", default="cuda" if torch.cuda.is_available() else "cpu")
+    parser.add_argument("--insecure", action="store_true", help="Skip TLS verification (self-signed certs)")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(main_async(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,339 @@
+"""
+Numerical-equivalence harness for engine optimizations.
+
+Runs fixed, seeded input audio through the reference eager path
+(PersonaPlexWrapper.process, one frame per call) and through alternative
+paths, recording the Mimi codes, LM tokens and decoded PCM of every step.
+Each candidate is compared against the reference and accepted only if it
+stays within the configured tolerances:
+
+- Mimi code agreement (fraction of identical codes)
+- LM token agreement (text and audio tokens separately)
+- decoded PCM max abs error and SNR
+
+Built-in candidates:
+    eager       reference path again (determinism check)
+    multiframe  two frames per process() call
+    checkpoint  state swapped out and back in before every frame (sessions.py)
+    engine      PersonaPlexEngine.process_audio_frame (bytes ingress, EgressStage)
+    int8        dynamic int8 quantization of the LM linears (expected to drift)
+
+Plug in your own path with --candidate module:function, where the function
+takes a wrapper and returns (name, prepare, run): `prepare(wrapper)` returns
+the wrapper to use (copy it before changing weights) and `run(wrapper, frames)`
+drives it over the list of [1, 1, frame_size] input frames.
+
+By default everything runs on CPU with the tiny seeded model
+(backend/app/services/tiny_model.py); --model personaplex uses the real
+checkpoint. --save-golden/--golden store and reuse reference outputs, so a
+change can also be checked against results from an earlier commit.
+
+Exit status is 1 if any candidate is rejected.
+
+Usage:
+    python backend/devtools/equivalence.py
+    python backend/devtools/equivalence.py --candidates int8 --min-token-agreement 0.9 --min-snr-db 20
+    python backend/devtools/equivalence.py --save-golden /tmp/golden.pt
+    python backend/devtools/equivalence.py --golden /tmp/golden.pt --candidates eager,engine
+    python backend/devtools/equivalence.py --model personaplex --device cuda --frames 100
+"""
+
+import argparse
+import copy
+import importlib
+import json
+import logging
+import os
+import sys
+import time
+from dataclasses import dataclass, field
+
+# Never load the full model as a side effect of importing the engine module
+os.environ.setdefault("ENGINE_BACKEND", "mock")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+import numpy as np
+import torch
+
+from backend.app.services.egress import EgressStage
+from backend.app.services.engine import PersonaPlexEngine, PersonaPlexWrapper
+from backend.app.services.tiny_model import build_tiny_wrapper
+
+SAMPLE_RATE = 24000
+
+
+# --- Inputs ---
+
+def make_inputs(num_frames: int, frame_size: int, seed: int) -> list[torch.Tensor]:
+    """Speech-like harmonic bursts, noise and silence, identical for identical seeds."""
+    rng = np.random.default_rng(seed)
+    t = np.arange(num_frames * frame_size) / SAMPLE_RATE
+    audio = np.zeros_like(t)
+    segment = 6 * frame_size
+    for start in range(0, len(t), segment):
+        end = min(start + segment, len(t))
+        kind = rng.choice(["voiced", "noise", "silence"], p=[0.5, 0.25, 0.25])
+        if kind == "voiced":
+            f0 = rng.uniform(90, 250)
+            envelope = 0.5 * (1 + np.sin(2 * np.pi * rng.uniform(2, 6) * t[start:end]))
+            audio[start:end] = envelope * sum(
+                0.3 / h * np.sin(2 * np.pi * f0 * h * t[start:end]) for h in range(1, 6)
+            )
+        elif kind == "noise":
+            audio[start:end] = rng.normal(0, 0.05, end - start)
+    frames = audio.astype(np.float32).reshape(num_frames, 1, 1, frame_size)
+    return [torch.from_numpy(f) for f in frames]
+
+
+# --- Recording ---
+
+@dataclass
+class Trace:
+    codes: list = field(default_factory=list)  # [1, K, T] per encode call
+    tokens: list = field(default_factory=list)  # [1, 17, 1] per emitting LM step
+    pcm: list = field(default_factory=list)  # [1, 1, n] per decode call
+    seconds: float = 0.0
+
+    def stacked(self) -> dict:
+        return {
+            "codes": torch.cat(self.codes, dim=-1).cpu() if self.codes else torch.empty(0),
+            "tokens": torch.cat(self.tokens, dim=-1).cpu() if self.tokens else torch.empty(0),
+            "pcm": torch.cat(self.pcm, dim=-1).reshape(-1).float().cpu() if self.pcm else torch.empty(0),
+        }
+
+
+def record(wrapper: PersonaPlexWrapper, trace: Trace):
+    """Intercept encode/step/decode on this wrapper's modules; returns an undo function."""
+    mimi, lm_gen = wrapper.mimi, wrapper.lm_gen
+    encode, step, decode = mimi.encode, lm_gen.step, mimi.decode
+
+    def recorded_encode(pcm):
+        codes = encode(pcm)
+        trace.codes.append(codes.detach().clone())
+        return codes
+
+    def recorded_step(codes):
+        tokens = step(codes)
+        if tokens is not None:
+            trace.tokens.append(tokens.detach().clone())
+        return tokens
+
+    def recorded_decode(codes):
+        pcm = decode(codes)
+        trace.pcm.append(pcm.detach().clone())
+        return pcm
+
+    mimi.encode, lm_gen.step, mimi.decode = recorded_encode, recorded_step, recorded_decode
+
+    def undo():
+        for module, name in ((mimi, "encode"), (lm_gen, "step"), (mimi, "decode")):
+            del module.__dict__[name]
+    return undo
+
+
+# --- Candidate paths ---
+
+def _identity(wrapper):
+    return wrapper
+
+
+def run_eager(wrapper, frames):
+    for frame in frames:
+        wrapper.process(frame.to(wrapper.device))
+
+
+def run_multiframe(wrapper, frames):
+    for i in range(0, len(frames), 2):
+        wrapper.process(torch.cat(frames[i:i + 2], dim=-1).to(wrapper.device))
+
+
+def run_checkpoint(wrapper, frames):
+    for frame in frames:
+        wrapper.set_state(wrapper.get_state())
+        wrapper.process(frame.to(wrapper.device))
+
+
+def run_engine(wrapper, frames):
+    engine = PersonaPlexEngine(backend="mock")
+    engine.wrapper = wrapper
+    engine.egress = EgressStage(wrapper.device, wrapper.frame_size)
+    engine.is_mock = False
+    for frame in frames:
+        engine.process_audio_frame(frame.numpy().tobytes())
+
+
+def prepare_int8(wrapper):
+    wrapper = copy.deepcopy(wrapper)
+    wrapper.lm_gen.lm = wrapper.lm = torch.ao.quantization.quantize_dynamic(
+        wrapper.lm, {torch.nn.Linear}, dtype=torch.qint8
+    )
+    return wrapper
+
+
+CANDIDATES = {
+    "eager": (_identity, run_eager),
+    "multiframe": (_identity, run_multiframe),
+    "checkpoint": (_identity, run_checkpoint),
+    "engine": (_identity, run_engine),
+    "int8": (prepare_int8, run_eager),
+}
+
+
+def load_candidate(spec: str, wrapper) -> tuple[str, callable, callable]:
+    module_name, _, function = spec.partition(":")
+    return getattr(importlib.import_module(module_name), function)(wrapper)
+
+
+def run_path(wrapper, prepare, run, frames, seed: int) -> Trace:
+    wrapper = prepare(wrapper)
+    wrapper.reset()
+    torch.manual_seed(seed)  # Sampling LMs draw from the global generator
+    trace = Trace()
+    undo = record(wrapper, trace)
+    try:
+        start = time.perf_counter()
+        with torch.no_grad():
+            run(wrapper, frames)
+        if wrapper.device.type == "cuda":
+            torch.cuda.synchronize(wrapper.device)
+        trace.seconds = time.perf_counter() - start
+    finally:
+        undo()
+    return trace
+
+
+# --- Comparison ---
+
+def agreement(reference: torch.Tensor, candidate: torch.Tensor) -> tuple[float, int | None]:
+    """Fraction of equal entries over the common length, and the first differing step."""
+    steps = min(reference.shape[-1], candidate.shape[-1])
+    if steps == 0:
+        return (1.0 if reference.shape[-1] == candidate.shape[-1] else 0.0), None
+    equal = reference[..., :steps] == candidate[..., :steps]
+    rate = equal.float().mean().item() * steps / max(reference.shape[-1], candidate.shape[-1])
+    diverged = (~equal).reshape(-1, steps).any(0).nonzero()
+    return rate, (int(diverged[0]) if len(diverged) else None)
+
+
+def compare(reference: dict, candidate: dict) -> dict:
+    code_rate, code_step = agreement(reference["codes"], candidate["codes"])
+    text_rate, text_step = agreement(reference["tokens"][:, :1], candidate["tokens"][:, :1])
+    audio_rate, audio_step = agreement(reference["tokens"][:, 1:9], candidate["tokens"][:, 1:9])
+
+    ref_pcm, cand_pcm = reference["pcm"], candidate["pcm"]
+    n = min(len(ref_pcm), len(cand_pcm))
+    error = (ref_pcm[:n] - cand_pcm[:n]).double()
+    max_abs = float(error.abs().max()) if n else 0.0
+    noise = float((error ** 2).sum())
+    signal = float((ref_pcm[:n].double() ** 2).sum())
+    snr = float("inf") if noise == 0 else 10 * np.log10(max(signal, 1e-20) / noise)
+    return {
+        "code_agreement": round(code_rate, 6),
+        "code_first_divergence": code_step,
+        "text_token_agreement": round(text_rate, 6),
+        "audio_token_agreement": round(audio_rate, 6),
+        "token_first_divergence": min((s for s in (text_step, audio_step) if s is not None), default=None),
+        "pcm_samples": [len(ref_pcm), len(cand_pcm)],
+        "pcm_max_abs_error": max_abs,
+        "pcm_snr_db": snr,
+    }
+
+
+def verdict(result: dict, args) -> list[str]:
+    failures = []
+    if result["code_agreement"] < args.min_code_agreement:
+        failures.append(f"code agreement {result['code_agreement']:.4f} < {args.min_code_agreement}")
+    for key in ("text_token_agreement", "audio_token_agreement"):
+        if result[key] < args.min_token_agreement:
+            failures.append(f"{key.replace('_', ' ')} {result[key]:.4f} < {args.min_token_agreement}")
+    if result["pcm_samples"][0] != result["pcm_samples"][1]:
+        failures.append(f"PCM length {result['pcm_samples'][1]} != {result['pcm_samples'][0]}")
+    if result["pcm_max_abs_error"] > args.pcm_atol and result["pcm_snr_db"] < args.min_snr_db:
+        failures.append(
+            f"PCM error {result['pcm_max_abs_error']:.2e} > {args.pcm_atol} "
+            f"and SNR {result['pcm_snr_db']:.1f} dB < {args.min_snr_db}"
+        )
+    return failures
+
+
+def build_wrapper(args) -> PersonaPlexWrapper:
+    if args.model == "tiny":
+        return build_tiny_wrapper(device=args.device, seed=args.seed)
+    wrapper = PersonaPlexWrapper(device=args.device, repo_id=args.model_id)
+    wrapper.warmup()
+    return wrapper
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model", choices=["tiny", "personaplex"], default="tiny")
+    parser.add_argument("--model-id", default=None, help="Checkpoint for --model personaplex")
+    parser.add_argument("--device", default="cpu")
+    parser.add_argument("--frames", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--candidates", default="eager,multiframe,checkpoint,engine",
+                        help=f"Comma list of {sorted(CANDIDATES)}")
+    parser.add_argument("--candidate", action="append", default=[], metavar="MODULE:FUNCTION",
+                        help="Additional candidate factory (repeatable)")
+    parser.add_argument("--min-code-agreement", type=float, default=1.0)
+    parser.add_argument("--min-token-agreement", type=float, default=1.0)
+    parser.add_argument("--pcm-atol", type=float, default=1e-5)
+    parser.add_argument("--min-snr-db", type=float, default=60.0, help="Accepted when PCM exceeds --pcm-atol")
+    parser.add_argument("--save-golden", help="Write the reference outputs to this file")
+    parser.add_argument("--golden", help="Compare against reference outputs saved earlier")
+    parser.add_argument("--json", help="Write the report as JSON")
+    args = parser.parse_args()
+
+    logging.getLogger("PersonaPlex-Engine").setLevel(logging.WARNING)  # One reset log per run otherwise
+    torch.use_deterministic_algorithms(True, warn_only=True)
+    wrapper = build_wrapper(args)
+    frames = make_inputs(args.frames, wrapper.frame_size, args.seed)
+
+    if args.golden:
+        golden = torch.load(args.golden, weights_only=False)
+        if golden["meta"] != {"model": args.model, "seed": args.seed, "frames": args.frames}:
+            parser.error(f"Golden file was recorded with {golden['meta']}")
+        reference, reference_seconds = golden["outputs"], golden["seconds"]
+    else:
+        trace = run_path(wrapper, _identity, run_eager, frames, args.seed)
+        reference, reference_seconds = trace.stacked(), trace.seconds
+    if args.save_golden:
+        torch.save({
+            "meta": {"model": args.model, "seed": args.seed, "frames": args.frames},
+            "outputs": reference,
+            "seconds": reference_seconds,
+        }, args.save_golden)
+        print(f"Saved reference outputs to {args.save_golden}")
+
+    candidates = [(name, *CANDIDATES[name]) for name in filter(None, args.candidates.split(","))]
+    candidates += [load_candidate(spec, wrapper) for spec in args.candidate]
+
+    report = {"model": args.model, "device": args.device, "frames": args.frames, "seed": args.seed,
+              "reference_ms_per_frame": 1000 * reference_seconds / args.frames, "candidates": {}}
+    rejected = 0
+    print(f"{'candidate':<12} {'codes':>8} {'text':>8} {'audio':>8} {'pcm err':>10} {'snr dB':>8} "
+          f"{'ms/frame':>9} {'speedup':>8}  verdict")
+    for name, prepare, run in candidates:
+        trace = run_path(wrapper, prepare, run, frames, args.seed)
+        result = compare(reference, trace.stacked())
+        result["ms_per_frame"] = 1000 * trace.seconds / args.frames
+        result["speedup"] = reference_seconds / trace.seconds if trace.seconds else None
+        failures = verdict(result, args)
+        result["accepted"], result["failures"] = not failures, failures
+        report["candidates"][name] = result
+        rejected += bool(failures)
+        print(
+            f"{name:<12} {result['code_agreement']:>8.4f} {result['text_token_agreement']:>8.4f} "
+            f"{result['audio_token_agreement']:>8.4f} {result['pcm_max_abs_error']:>10.2e} "
+            f"{result['pcm_snr_db']:>8.1f} {result['ms_per_frame']:>9.2f} {result['speedup'] or 0:>7.2f}x  "
+            + ("ACCEPT" if not failures else "REJECT: " + "; ".join(failures))
+        )
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+    sys.exit(1 if rejected else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+"""
+Local gateway demo: several mock-engine nodes behind one gateway.
+
+Starts N backend nodes (ENGINE_BACKEND=mock by default, or standin) and the
+gateway as subprocesses, opens sessions through the gateway and prints where
+they landed. Then drains the first node and shows that new sessions avoid it
+while its existing sessions keep streaming.
+
+Usage:
+    python backend/devtools/gateway_demo.py --nodes 3 --sessions 9
+    python backend/devtools/gateway_demo.py --backend standin --max-sessions 2
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import time
+
+import httpx
+import numpy as np
+import websockets
+
+ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+FRAME = np.zeros(1920, dtype=np.float32).tobytes()
+
+
+def start(module: str, port: int, env: dict) -> subprocess.Popen:
+    return subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", module, "--port", str(port), "--log-level", "warning"],
+        cwd=ROOT, env={**os.environ, **env},
+    )
+
+
+def wait_until(url: str, timeout: float = 120.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if httpx.get(url, timeout=1).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.5)
+    raise TimeoutError(url)
+
+
+async def open_session(url: str, sessions: list) -> bool:
+    ws = await websockets.connect(url, max_size=None)
+    try:
+        await ws.recv()  # session message
+    except websockets.ConnectionClosed as e:
+        print(f"  session rejected (close code {e.rcvd.code if e.rcvd else None})")
+        return False
+    await ws.send(json.dumps({"type": "config", "persona": "demo", "voice": "NATF0"}))
+    await ws.send(FRAME)
+    sessions.append(ws)
+    return True
+
+
+async def stream(sessions: list, frames: int):
+    """Every session sends `frames` frames and reads whatever comes back."""
+    received = 0
+    for _ in range(frames):
+        for ws in sessions:
+            await ws.send(FRAME)
+        await asyncio.sleep(0.08)
+    for ws in sessions:
+        try:
+            while True:
+                await asyncio.wait_for(ws.recv(), 0.05)
+                received += 1
+        except asyncio.TimeoutError:
+            pass
+    return received
+
+
+def show(gateway: str, title: str):
+    status = httpx.get(f"{gateway}/gateway/nodes").json()
+    print(f"\n{title}")
+    for node in status["nodes"]:
+        print(f"  {node['name']:<18} {node['state']:<8} draining={node['draining']!s:<5} "
+              f"proxied={node['proxied']:<3} reported={node['sessions']:<3} placed={node['placed']}")
+    return status
+
+
+async def demo(args, gateway: str, node_names: list[str]):
+    sessions = []
+    for _ in range(args.sessions):
+        await open_session(gateway.replace("http", "ws") + "/ws", sessions)
+    await asyncio.sleep(args.poll_interval * 2)
+    show(gateway, f"{args.sessions} sessions placed:")
+
+    httpx.post(f"{gateway}/gateway/nodes/{node_names[0]}/drain")
+    print(f"\nDraining {node_names[0]}, opening {args.sessions} more sessions")
+    placed = 0
+    for _ in range(args.sessions):
+        placed += await open_session(gateway.replace("http", "ws") + "/ws", sessions)
+    received = await stream(sessions, 5)
+    show(gateway, f"Placed {placed} more "
+                  f"(all {len(sessions)} sessions still streaming, {received} replies):")
+
+    for ws in sessions:
+        await ws.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--nodes", type=int, default=3)
+    parser.add_argument("--sessions", type=int, default=6)
+    parser.add_argument("--backend", default="mock", choices=["mock", "standin"])
+    parser.add_argument("--max-sessions", type=int, default=0, help="NODE_MAX_SESSIONS advertised by each node")
+    parser.add_argument("--base-port", type=int, default=8100)
+    parser.add_argument("--gateway-port", type=int, default=9000)
+    parser.add_argument("--poll-interval", type=float, default=0.5)
+    args = parser.parse_args()
+
+    node_env = {"ENGINE_BACKEND": args.backend, "DEVICE": "cpu", "STANDIN_COMPUTE_MS": "5",
+                "NODE_MAX_SESSIONS": str(args.max_sessions)}
+    node_urls = [f"http://127.0.0.1:{args.base_port + i}" for i in range(args.nodes)]
+    gateway = f"http://127.0.0.1:{args.gateway_port}"
+
+    processes = [start("backend.app.main:app", args.base_port + i, node_env) for i in range(args.nodes)]
+    try:
+        for url in node_urls:
+            wait_until(f"{url}/api/admin/load")
+        processes.append(start("backend.gateway.main:app", args.gateway_port, {
+            "GATEWAY_NODES": ",".join(node_urls), "GATEWAY_POLL_INTERVAL": str(args.poll_interval),
+        }))
+        wait_until(f"{gateway}/gateway/nodes")
+        asyncio.run(demo(args, gateway, [url.split("//")[1] for url in node_urls]))
+    finally:
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            process.wait()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""
+Layer streaming on CPU with the tiny model.
+
+Runs the same frames through a fully resident tiny wrapper and through
+copies that stream their LM layers from a memory-mapped file
+(services/layer_stream.py): once without prefetch (only the running layer
+resident) and with prefetch at different windows. Checks the output is bit-identical and prints step time, prefetch
+hits/waits, page faults and the resident layer memory.
+
+Usage:
+    python backend/devtools/layer_stream_bench.py
+    python backend/devtools/layer_stream_bench.py --dim 1024 --layers 24 --windows 2,4,8 --frames 100
+"""
+
+import argparse
+import logging
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+import torch
+
+from backend.app.services.tiny_model import build_tiny_wrapper
+
+
+def run(wrapper, frames: list[torch.Tensor]) -> tuple[list[torch.Tensor], float]:
+    wrapper.reset()
+    outputs = []
+    start = time.perf_counter()
+    for frame in frames:
+        out = wrapper.process(frame)
+        if out is not None:
+            outputs.append(out)
+    return outputs, 1000 * (time.perf_counter() - start) / len(frames)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--dim", type=int, default=512)
+    parser.add_argument("--layers", type=int, default=16)
+    parser.add_argument("--windows", default="2,4", help="Comma-separated layer windows to try with prefetch")
+    parser.add_argument("--frames", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    logging.getLogger("PersonaPlex-Engine").setLevel(logging.WARNING)
+
+    generator = torch.Generator().manual_seed(args.seed)
+    frames = [0.1 * torch.randn(1, 1, 1920, generator=generator) for _ in range(args.frames)]
+
+    baseline = build_tiny_wrapper(seed=args.seed, dim=args.dim, num_layers=args.layers)
+    expected, baseline_ms = run(baseline, frames)
+    layer_mb = sum(p.numel() * p.element_size() for p in baseline.lm.layers.parameters()) / 2**20
+    print(f"Tiny LM: {args.layers} layers, {layer_mb:.1f} MiB of layer weights, "
+          f"resident baseline {baseline_ms:.2f} ms/frame\n")
+    print(f"{'window':>6} {'prefetch':>8} {'ms/frame':>9} {'step p95':>9} {'hit rate':>9} {'waits':>6} "
+          f"{'misses':>7} {'maj flt':>8} {'min flt':>8} {'resident MiB':>13} {'identical':>10}")
+
+    with tempfile.TemporaryDirectory() as directory:
+        runs = [(1, False)] + [(window, True) for window in map(int, args.windows.split(","))]
+        for window, prefetch in runs:
+            wrapper = build_tiny_wrapper(seed=args.seed, dim=args.dim, num_layers=args.layers)
+            streamer = wrapper.enable_layer_streaming(window=window, directory=directory, prefetch=prefetch)
+            outputs, ms = run(wrapper, frames)
+            stats = streamer.stats()
+            identical = len(outputs) == len(expected) and all(torch.equal(a, b) for a, b in zip(outputs, expected))
+            print(f"{window:>6} {str(prefetch):>8} {ms:>9.2f} {stats['step_ms']['p95']:>9.2f} "
+                  f"{stats['prefetch_hit_rate']:>9.3f} {stats['waits']:>6} {stats['misses']:>7} "
+                  f"{stats['major_faults']:>8} {stats['minor_faults']:>8} {stats['resident_mb']:>13.1f} "
+                  f"{str(identical):>10}")
+            wrapper.close()
+
+
+if __name__ == "__main__":
+    main()
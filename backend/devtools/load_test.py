@@ -0,0 +1,279 @@
+"""
+Multi-client WebSocket load generator with end-to-end latency measurement.
+
+Opens N concurrent /ws sessions per concurrency level. Each session sends a
+config message and then streams real-time-paced audio (80 ms frames, from a
+WAV file or synthetic). Every frame carries its sequence number in the sign
+pattern of its first samples, so with the stand-in engine (echo output) each
+reply is matched to the exact input frame it echoes. For other engines
+replies are paired with input frames in order, skipping the first
+--delay-frames frames. Either way latency is measured from the send of the
+input frame whose engine step emitted the reply (echoed frame +
+--delay-frames), so the engine's fixed algorithmic delay of --delay-frames
+frames is excluded in both modes and reported separately.
+
+Measured per level: end-to-end latency percentiles, arrival jitter, gaps in
+received audio (playout underruns) and connection failures. Results are
+written as JSON and CSV along with a capacity summary: the highest
+concurrency level that meets the latency SLO.
+
+Usage:
+    ENGINE_BACKEND=standin DEVICE=cpu uvicorn backend.app.main:app --port 8000
+    python backend/devtools/load_test.py --levels 1,2,4,8,16 --duration 20
+"""
+
+import argparse
+import asyncio
+import csv
+import json
+import ssl
+import time
+import wave
+from collections import deque
+
+import numpy as np
+import websockets
+
+SAMPLE_RATE = 24000
+FRAME_SIZE = 1920
+FRAME_PERIOD = FRAME_SIZE / SAMPLE_RATE
+
+# Sequence marker: MARKER_BITS sign-coded samples at the start of each frame
+MARKER_BITS = 24
+MARKER_PREFIX = [1, 0, 1, 1, 0, 0, 1, 0]  # Distinguishes marked frames from model audio
+MARKER_AMPLITUDE = 0.5
+
+
+def load_audio(path: str | None, seconds: float) -> np.ndarray:
+    """Load a mono 16-bit WAV (looped to length) or synthesize speech-like audio."""
+    num_samples = int(seconds * SAMPLE_RATE) + FRAME_SIZE
+    if path:
+        with wave.open(path) as wav_file:
+            if wav_file.getsampwidth() != 2 or wav_file.getframerate() != SAMPLE_RATE:
+                raise ValueError("WAV must be 16-bit PCM at 24 kHz")
+            raw = np.frombuffer(wav_file.readframes(wav_file.getnframes()), dtype=np.int16)
+            audio = raw[::wav_file.getnchannels()].astype(np.float32) / 32768.0
+        return np.resize(audio, num_samples)
+
+    t = np.arange(num_samples) / SAMPLE_RATE
+    envelope = 0.5 * (1 + np.sin(2 * np.pi * 0.5 * t))
+    rng = np.random.default_rng(0)
+    return (0.2 * envelope * np.sin(2 * np.pi * 180 * t) + 0.02 * rng.standard_normal(num_samples)).astype(np.float32)
+
+
+def mark_frame(frame: np.ndarray, seq: int) -> np.ndarray:
+    bits = MARKER_PREFIX + [(seq >> i) & 1 for i in range(MARKER_BITS - len(MARKER_PREFIX))]
+    frame = frame.copy()
+    frame[:MARKER_BITS] = [MARKER_AMPLITUDE if b else -MARKER_AMPLITUDE for b in bits]
+    return frame
+
+
+def read_marker(frame: np.ndarray) -> int | None:
+    if len(frame) < MARKER_BITS:
+        return None
+    bits = [1 if s > 0 else 0 for s in frame[:MARKER_BITS]]
+    head = frame[:MARKER_BITS]
+    if bits[:len(MARKER_PREFIX)] != MARKER_PREFIX or np.abs(head).min() < 0.05:
+        return None
+    return sum(b << i for i, b in enumerate(bits[len(MARKER_PREFIX):]))
+
+
+def match_reply(frame: np.ndarray, pending: deque, delay_frames: int) -> int | None:
+    """
+    Sequence number of the input frame whose engine step emitted this reply
+    frame. Marked (echo) replies carry the echoed frame's number, emitted
+    `delay_frames` steps later; unmarked ones are paired in order with the
+    frames in `pending` (those from `delay_frames` on, in send order).
+    """
+    marker = read_marker(frame)
+    if marker is None:
+        return pending.popleft() if pending else None
+    seq = marker + delay_frames
+    try:
+        pending.remove(seq)
+    except ValueError:
+        pass
+    return seq
+
+
+class SessionResult:
+    def __init__(self):
+        self.latencies_ms: list[float] = []
+        self.arrivals: list[float] = []
+        self.gap_ms = 0.0
+        self.underruns = 0
+        self.audio_received_s = 0.0
+        self.frames_sent = 0
+        self.failed = False
+        self.error = ""
+
+
+async def run_session(url: str, audio: np.ndarray, duration: float, args, ssl_ctx) -> SessionResult:
+    result = SessionResult()
+    send_times: dict[int, float] = {}
+    pending: deque[int] = deque()  # In-order pairing fallback
+    playout_end = None
+
+    try:
+        async with websockets.connect(url, ssl=ssl_ctx, max_size=None, open_timeout=10) as ws:
+            await ws.send(json.dumps({"type": "config", "persona": args.persona, "voice": args.voice}))
+
+            async def sender():
+                start = time.perf_counter()
+                num_frames = int(duration / FRAME_PERIOD)
+                for seq in range(num_frames):
+                    target = start + seq * FRAME_PERIOD
+                    delay = target - time.perf_counter()
+                    if delay > 0:
+                        await asyncio.sleep(delay)
+                    frame = mark_frame(audio[seq * FRAME_SIZE:(seq + 1) * FRAME_SIZE], seq)
+                    send_times[seq] = time.perf_counter()
+                    if seq >= args.delay_frames:
+                        pending.append(seq)
+                    await ws.send(frame.tobytes())
+                    result.frames_sent += 1
+                # Let in-flight replies drain
+                await asyncio.sleep(args.drain)
+
+            async def receiver():
+                nonlocal playout_end
+                async for message in ws:
+                    if not isinstance(message, bytes):
+                        continue
+                    now = time.perf_counter()
+                    pcm = np.frombuffer(message, dtype=np.float32)
+                    result.arrivals.append(now)
+
+                    for offset in range(0, len(pcm), FRAME_SIZE):
+                        seq = match_reply(pcm[offset:offset + FRAME_SIZE], pending, args.delay_frames)
+                        if seq is not None and seq in send_times:
+                            result.latencies_ms.append(1000 * (now - send_times[seq]))
+
+                    duration_s = len(pcm) / SAMPLE_RATE
+                    result.audio_received_s += duration_s
+                    if playout_end is None:
+                        playout_end = now + args.jitter_buffer_ms / 1000
+                    elif now > playout_end:
+                        result.underruns += 1
+                        result.gap_ms += 1000 * (now - playout_end)
+                        playout_end = now
+                    playout_end += duration_s
+
+            receive_task = asyncio.create_task(receiver())
+            try:
+                await sender()
+            finally:
+                receive_task.cancel()
+                try:
+                    await receive_task
+                except asyncio.CancelledError:
+                    pass
+    except Exception as e:
+        result.failed = True
+        result.error = f"{type(e).__name__}: {e}"
+    return result
+
+
+def percentile(values: list[float], q: float) -> float | None:
+    return float(np.percentile(values, q)) if values else None
+
+
+def summarize(level: int, results: list[SessionResult], duration: float, delay_frames: int) -> dict:
+    latencies = [x for r in results for x in r.latencies_ms]
+    jitters = []
+    for r in results:
+        if len(r.arrivals) > 2:
+            jitters.append(float(np.std(np.diff(r.arrivals))) * 1000)
+    audio_expected = sum(r.frames_sent for r in results) * FRAME_PERIOD
+    return {
+        "sessions": level,
+        "failures": sum(r.failed for r in results),
+        "errors": sorted({r.error for r in results if r.error}),
+        "latency_p50_ms": percentile(latencies, 50),
+        "latency_p95_ms": percentile(latencies, 95),
+        "latency_p99_ms": percentile(latencies, 99),
+        "latency_max_ms": max(latencies) if latencies else None,
+        "algorithmic_delay_ms": delay_frames * FRAME_PERIOD * 1000,  # Not included in the latencies
+        "jitter_ms": float(np.mean(jitters)) if jitters else None,
+        "underruns": sum(r.underruns for r in results),
+        "gap_ratio": sum(r.gap_ms for r in results) / 1000 / audio_expected if audio_expected else None,
+        "audio_received_ratio": sum(r.audio_received_s for r in results) / audio_expected if audio_expected else None,
+        "duration_s": duration,
+    }
+
+
+def within_slo(row: dict, args) -> bool:
+    return (
+        row["failures"] == 0
+        and row["latency_p95_ms"] is not None
+        and row["latency_p95_ms"] <= args.slo_p95_ms
+        and (row["gap_ratio"] or 0) <= args.max_gap_ratio
+    )
+
+
+async def main_async(args):
+    ssl_ctx = None
+    if args.url.startswith("wss://"):
+        ssl_ctx = ssl.create_default_context()
+        if args.insecure:
+            ssl_ctx.check_hostname = False
+            ssl_ctx.verify_mode = ssl.CERT_NONE
+
+    audio = load_audio(args.wav, args.duration)
+    rows = []
+    for level in [int(x) for x in args.levels.split(",")]:
+        print(f"--- {level} concurrent sessions ({args.duration:.0f}s) ---")
+        tasks = []
+        for i in range(level):
+            tasks.append(asyncio.create_task(run_session(args.url, audio, args.duration, args, ssl_ctx)))
+            await asyncio.sleep(args.stagger)
+        results = await asyncio.gather(*tasks)
+        row = summarize(level, results, args.duration, args.delay_frames)
+        row["within_slo"] = within_slo(row, args)
+        rows.append(row)
+        print(json.dumps(row, indent=2))
+        if args.stop_on_breach and not row["within_slo"]:
+            break
+
+    passing = [row["sessions"] for row in rows if row["within_slo"]]
+    report = {
+        "url": args.url,
+        "slo": {"latency_p95_ms": args.slo_p95_ms, "max_gap_ratio": args.max_gap_ratio},
+        "levels": rows,
+        "capacity": {"max_sessions_within_slo": max(passing) if passing else 0},
+    }
+
+    with open(f"{args.out}.json", "w") as f:
+        json.dump(report, f, indent=2)
+    with open(f"{args.out}.csv", "w", newline="") as f:
+        fields = [k for k in rows[0] if k != "errors"]
+        writer = csv.DictWriter(f, fieldnames=fields, extrasaction="ignore")
+        writer.writeheader()
+        writer.writerows(rows)
+
+    print(f"Capacity: {report['capacity']['max_sessions_within_slo']} sessions within "
+          f"p95 <= {args.slo_p95_ms} ms (report: {args.out}.json / {args.out}.csv)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="ws://localhost:8000/ws")
+    parser.add_argument("--levels", default="1,2,4,8", help="Comma-separated concurrency ramp")
+    parser.add_argument("--duration", type=float, default=20.0, help="Seconds of audio per session")
+    parser.add_argument("--wav", default=None, help="Mono 16-bit 24 kHz WAV (default: synthetic)")
+    parser.add_argument("--persona", default="You enjoy having a good conversation.")
+    parser.add_argument("--voice", default="NATF0")
+    parser.add_argument("--delay-frames", type=int, default=2, help="Engine output delay in frames (excluded from latency)")
+    parser.add_argument("--jitter-buffer-ms", type=float, default=0.0, help="Simulated playout buffer")
+    parser.add_argument("--stagger", type=float, default=0.05, help="Seconds between session starts")
+    parser.add_argument("--drain", type=float, default=1.0, help="Seconds to wait for replies after sending")
+    parser.add_argument("--slo-p95-ms", type=float, default=250.0)
+    parser.add_argument("--max-gap-ratio", type=float, default=0.01)
+    parser.add_argument("--stop-on-breach", action="store_true", help="Stop ramping at the first SLO breach")
+    parser.add_argument("--insecure", action="store_true", help="Skip TLS verification (self-signed certs)")
+    parser.add_argument("--out", default="load_report", help="Output path prefix for .json/.csv")
+    asyncio.run(main_async(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
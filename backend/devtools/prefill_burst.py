@@ -0,0 +1,198 @@
+"""
+Burst of simultaneous session starts: batched vs. serial prompt prefill.
+
+1. Tiny model (in process): prefills prompts of different lengths one by
+   one and as one batch (PersonaPlexWrapper.prefill_batch), then runs the
+   same frames from every resulting state and checks the audio matches.
+2. Server: starts a stand-in node (subprocess) once with batching off
+   (PREFILL_BATCH_WINDOW_MS=0) and once with --window-ms, connects
+   --sessions clients within --spread seconds, and measures each client's
+   time to first audio from its config message (the client streams
+   real-time audio from then on).
+
+Usage:
+    python backend/devtools/prefill_burst.py
+    python backend/devtools/prefill_burst.py --sessions 32 --compute-ms 20 --batch-scaling 1:1.0,8:1.8,32:4.0
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import subprocess
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+import httpx
+import numpy as np
+import torch
+import websockets
+
+from backend.app.services.tiny_model import build_tiny_wrapper
+
+ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+FRAME = np.zeros(1920, dtype=np.float32)
+PERSONAS = [
+    "You enjoy having a good conversation.",
+    "You are a helpful customer service agent for an internet provider. Keep answers short and friendly.",
+    "You are a wise and friendly teacher. Answer questions or provide advice in a clear and engaging way, "
+    "and check that the student has understood before moving on.",
+    "Chat.",
+]
+
+
+# --- Tiny model check ---
+
+def check_tiny(num_prompts: int, frames: int, seed: int):
+    wrapper = build_tiny_wrapper(seed=seed, dim=256, num_layers=8)
+    prompts, serial = [], []
+    start = time.perf_counter()
+    for i in range(num_prompts):
+        wrapper.set_text_prompt(PERSONAS[i % len(PERSONAS)], wrapper.text_tokenizer)
+        prompts.append(wrapper.prompt_state())
+        wrapper.prefill()
+        serial.append(wrapper.get_state())
+    serial_ms = 1000 * (time.perf_counter() - start)
+    start = time.perf_counter()
+    batched = wrapper.prefill_batch(prompts)
+    batched_ms = 1000 * (time.perf_counter() - start)
+
+    generator = torch.Generator().manual_seed(seed)
+    inputs = [0.1 * torch.randn(1, 1, 1920, generator=generator) for _ in range(frames)]
+
+    def run(state):
+        wrapper.set_state(state)
+        return [wrapper.process(frame) for frame in inputs]
+
+    identical, max_diff = True, 0.0
+    for a, b in zip(serial, batched):
+        for x, y in zip(run(a), run(b)):
+            if x is None or y is None:
+                identical &= x is None and y is None
+                continue
+            identical &= torch.equal(x, y)
+            max_diff = max(max_diff, (x - y).abs().max().item())
+    lengths = sorted({len(p["text_prompt_tokens"]) for p in prompts})
+    print(f"Tiny model: {num_prompts} prompts ({lengths[0]}-{lengths[-1]} tokens), "
+          f"serial {serial_ms:.0f} ms, batched {batched_ms:.0f} ms; "
+          f"audio identical over {frames} frames: {identical} (max diff {max_diff:.2e})\n")
+
+
+# --- Server burst ---
+
+def start_node(port: int, window_ms: float, args) -> subprocess.Popen:
+    env = {
+        "ENGINE_BACKEND": "standin", "DEVICE": "cpu",
+        "STANDIN_COMPUTE_MS": str(args.compute_ms), "STANDIN_BATCH_SCALING": args.batch_scaling,
+        "NODE_MAX_SESSIONS": str(args.sessions), "PREFILL_BATCH_WINDOW_MS": str(window_ms),
+        "PREFILL_BATCH_MAX": str(args.max_batch),
+    }
+    return subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "backend.app.main:app", "--port", str(port), "--log-level", "warning"],
+        cwd=ROOT, env={**os.environ, **env},
+    )
+
+
+def wait_until(url: str, timeout: float = 120.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if httpx.get(url, timeout=1).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.5)
+    raise TimeoutError(url)
+
+
+async def client(url: str, index: int, delay: float, timeout: float) -> float | None:
+    """Seconds from the config message to the first audio reply (None on timeout)."""
+    await asyncio.sleep(delay)
+    async with websockets.connect(url, max_size=None) as ws:
+        while json.loads(await ws.recv())["type"] != "session":
+            pass
+        sent = time.perf_counter()
+        await ws.send(json.dumps({"type": "config", "persona": PERSONAS[index % len(PERSONAS)], "voice": "NATF0"}))
+
+        async def sender():
+            next_send = sent
+            while True:
+                await ws.send(FRAME.tobytes())
+                next_send += 0.08
+                await asyncio.sleep(max(0.0, next_send - time.perf_counter()))
+
+        sending = asyncio.create_task(sender())
+        try:
+            async def first_audio():
+                while not isinstance(await ws.recv(), bytes):
+                    pass
+            await asyncio.wait_for(first_audio(), timeout)
+            return time.perf_counter() - sent
+        except asyncio.TimeoutError:
+            return None
+        finally:
+            sending.cancel()
+
+
+async def burst(url: str, args) -> list[float | None]:
+    delays = np.linspace(0, args.spread, args.sessions)
+    return await asyncio.gather(*(client(url, i, d, args.timeout) for i, d in enumerate(delays)))
+
+
+def run_mode(name: str, port: int, window_ms: float, args) -> dict:
+    node = start_node(port, window_ms, args)
+    try:
+        wait_until(f"http://localhost:{port}/api/admin/health")
+        results = asyncio.run(burst(f"ws://localhost:{port}/ws", args))
+        stats = httpx.get(f"http://localhost:{port}/api/admin/prefill").json()
+    finally:
+        node.terminate()
+        node.wait()
+    ttfa = np.array([1000 * r for r in results if r is not None])
+    return {
+        "mode": name,
+        "ok": len(ttfa),
+        "p50": float(np.percentile(ttfa, 50)) if len(ttfa) else None,
+        "p95": float(np.percentile(ttfa, 95)) if len(ttfa) else None,
+        "max": float(ttfa.max()) if len(ttfa) else None,
+        "jobs": stats["jobs"],
+        "mean_batch": stats["mean_batch"],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sessions", type=int, default=24, help="Clients in the burst")
+    parser.add_argument("--spread", type=float, default=2.0, help="Seconds over which the clients connect")
+    parser.add_argument("--window-ms", type=float, default=50.0, help="Batching window of the batched run")
+    parser.add_argument("--max-batch", type=int, default=16)
+    parser.add_argument("--compute-ms", type=float, default=20.0, help="Stand-in step cost at batch size 1")
+    parser.add_argument("--batch-scaling", default="1:1.0,8:1.8,32:4.0", help="Stand-in batch cost curve")
+    parser.add_argument("--timeout", type=float, default=120.0, help="Give up on a client's first audio")
+    parser.add_argument("--port", type=int, default=8071)
+    parser.add_argument("--tiny-prompts", type=int, default=8, help="Prompts in the tiny-model check (0 = skip)")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    logging.getLogger("PersonaPlex-Engine").setLevel(logging.WARNING)
+
+    if args.tiny_prompts:
+        check_tiny(args.tiny_prompts, frames=8, seed=args.seed)
+
+    print(f"Burst: {args.sessions} sessions within {args.spread:.1f} s, stand-in {args.compute_ms} ms/step "
+          f"({args.batch_scaling})")
+    rows = [
+        run_mode("serial", args.port, 0, args),
+        run_mode(f"batched ({args.window_ms:.0f} ms)", args.port + 1, args.window_ms, args),
+    ]
+    print(f"\n{'prefill':>16} {'ok':>4} {'TTFA p50':>9} {'p95':>8} {'max':>8} {'jobs':>5} {'mean batch':>11}")
+    for row in rows:
+        fmt = lambda v: f"{v:.0f}" if v is not None else "-"
+        print(f"{row['mode']:>16} {row['ok']:>4} {fmt(row['p50']):>9} {fmt(row['p95']):>8} {fmt(row['max']):>8} "
+              f"{row['jobs']:>5} {str(row['mean_batch']):>11}")
+
+
+if __name__ == "__main__":
+    main()
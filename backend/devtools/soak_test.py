@@ -0,0 +1,338 @@
+"""
+Long-duration soak test: randomized session churn with leak and drift detection.
+
+Runs --clients concurrent client loops against a server (stand-in engine or
+a small model) for --duration seconds. Each loop keeps starting sessions:
+connect (sometimes resuming a dropped session, with a random priority tier),
+send a config, stream real-time-paced audio for a random length with random
+config changes and idle pauses, then either close cleanly or drop the socket
+mid-stream. Every --sample-interval seconds the server's runtime gauges
+(GET /api/admin/runtime: RSS, device memory, open fds, threads, tasks, GC
+objects, event-loop lag, engine state sizes) are sampled together with the
+client-side per-frame latency and churn counters of the interval.
+
+Samples are appended to <out>.jsonl as they are taken, so a long run can be
+inspected while it is going. At the end each series is split into
+--segments segments after a warmup share; a series whose segment medians
+never decrease and whose growth exceeds its noise tolerance is flagged as
+monotonic growth, and its least-squares slope per hour is reported. The
+summary goes to <out>.json; the exit code is 1 when anything was flagged.
+
+Usage:
+    ENGINE_BACKEND=standin DEVICE=cpu STANDIN_COMPUTE_MS=10 uvicorn backend.app.main:app --port 8000
+    python backend/devtools/soak_test.py --duration 600 --clients 4
+    python backend/devtools/soak_test.py --duration 14400 --clients 8 --sample-interval 30 --out soak_4h
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import ssl
+import sys
+import time
+from collections import deque
+from urllib.parse import urlsplit, urlunsplit
+
+import httpx
+import numpy as np
+import websockets
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from load_test import FRAME_PERIOD, FRAME_SIZE, load_audio, mark_frame, match_reply
+
+PERSONAS = [
+    "You enjoy having a good conversation.",
+    "You are a helpful customer service agent for an internet provider.",
+    "You are a wise and friendly teacher. Answer questions or provide advice in a clear and engaging way.",
+]
+VOICES = ["NATF0", "NATF2", "NATM0", "NATM1", "VARF1", "VARM2"]
+
+# Series checked for growth: (label, extractor, absolute tolerance)
+SERIES = [
+    ("rss_mb", lambda s: s["server"]["rss_mb"], 16.0),
+    ("device_allocated_mb", lambda s: (s["server"]["device"] or {}).get("allocated_mb"), 16.0),
+    ("device_reserved_mb", lambda s: (s["server"]["device"] or {}).get("reserved_mb"), 64.0),
+    ("open_fds", lambda s: s["server"]["open_fds"], 4),
+    ("threads", lambda s: s["server"]["threads"], 2),
+    ("asyncio_tasks", lambda s: s["server"]["asyncio_tasks"], 8),
+    ("gc_objects", lambda s: s["server"]["gc_objects"], 5000),
+    ("engine_buffer_samples", lambda s: sum(e["buffer_samples"] for e in s["server"]["engines"]), FRAME_SIZE),
+    ("engine_sessions", lambda s: sum(e["sessions"] for e in s["server"]["engines"]), 4),
+    ("checkpoints_in_ram", lambda s: sum(e["checkpoints_in_ram"] for e in s["server"]["engines"]), 4),
+    ("loop_lag_max_ms", lambda s: s["server"]["event_loop_lag_ms"]["max"], 10.0),
+    ("frame_p50_ms", lambda s: s["client"]["latency_p50_ms"], 10.0),
+    ("frame_p95_ms", lambda s: s["client"]["latency_p95_ms"], 10.0),
+]
+RELATIVE_TOLERANCE = 0.02  # Growth below 2% of the starting level is noise
+
+
+class Churn:
+    """Client-side counters and per-frame latencies (drained at every sample)."""
+
+    def __init__(self):
+        self.counters = {key: 0 for key in (
+            "connects", "resumes", "clean_closes", "drops", "config_changes", "pauses",
+            "queued", "rejected", "failures", "frames_sent", "frames_received",
+        )}
+        self.latencies_ms: list[float] = []
+        self.errors: deque[str] = deque(maxlen=20)
+
+    def drain(self) -> list[float]:
+        latencies, self.latencies_ms = self.latencies_ms, []
+        return latencies
+
+
+async def run_session(url: str, audio: np.ndarray, rng: random.Random, churn: Churn, args,
+                      ssl_ctx, resume: str | None) -> str | None:
+    """One randomized session. Returns the session token if the socket was dropped (resumable)."""
+    query = [f"priority={rng.choice(args.priorities)}"]
+    if resume:
+        query.append(f"resume={resume}")
+    token = None
+    retry_after = None
+    send_times: dict[int, float] = {}
+    pending: deque[int] = deque()  # In-order pairing when replies carry no marker
+
+    async with websockets.connect(f"{url}?{'&'.join(query)}", ssl=ssl_ctx, max_size=None, open_timeout=10) as ws:
+        churn.counters["connects"] += 1
+        session_ready = asyncio.Event()
+
+        async def receiver():
+            nonlocal token, retry_after
+            async for message in ws:
+                now = time.perf_counter()
+                if isinstance(message, str):
+                    data = json.loads(message)
+                    if data["type"] == "session":
+                        token = data["token"]
+                        churn.counters["resumes"] += data["resumed"]
+                        session_ready.set()
+                    elif data["type"] == "queued":
+                        churn.counters["queued"] += 1
+                    elif data["type"] == "rejected":
+                        churn.counters["rejected"] += 1
+                        retry_after = data["retryAfter"]
+                    continue
+                pcm = np.frombuffer(message, dtype=np.float32)
+                for offset in range(0, len(pcm), FRAME_SIZE):
+                    churn.counters["frames_received"] += 1
+                    seq = match_reply(pcm[offset:offset + FRAME_SIZE], pending, args.delay_frames)
+                    if seq is not None and seq in send_times:
+                        churn.latencies_ms.append(1000 * (now - send_times.pop(seq)))
+
+        receive_task = asyncio.create_task(receiver())
+        try:
+            ready = asyncio.create_task(session_ready.wait())
+            await asyncio.wait({ready, receive_task}, timeout=args.admission_timeout,
+                               return_when=asyncio.FIRST_COMPLETED)
+            ready.cancel()
+            if not session_ready.is_set():
+                # Rejected, closed or still queued: back off before the next attempt
+                await asyncio.sleep(min(retry_after or 1, args.max_think))
+                return None
+            await ws.send(json.dumps({"type": "config", "persona": rng.choice(PERSONAS), "voice": rng.choice(VOICES)}))
+
+            end = time.perf_counter() + rng.uniform(args.min_session, args.max_session)
+            next_send = time.perf_counter()
+            seq = 0
+            while time.perf_counter() < end:
+                if rng.random() < args.config_change_rate * FRAME_PERIOD:
+                    await ws.send(json.dumps({"type": "config", "persona": rng.choice(PERSONAS),
+                                              "voice": rng.choice(VOICES)}))
+                    churn.counters["config_changes"] += 1
+                if rng.random() < args.pause_rate * FRAME_PERIOD:
+                    churn.counters["pauses"] += 1
+                    await asyncio.sleep(rng.uniform(0.5, args.max_pause))
+                    next_send = time.perf_counter()  # Resume at real time, no catch-up burst
+                offset = (seq * FRAME_SIZE) % (len(audio) - FRAME_SIZE)
+                frame = mark_frame(audio[offset:offset + FRAME_SIZE], seq)
+                send_times[seq] = time.perf_counter()
+                if seq >= args.delay_frames:
+                    pending.append(seq)
+                await ws.send(frame.tobytes())
+                churn.counters["frames_sent"] += 1
+                seq += 1
+                # Stale entries (frames whose reply never comes) must not grow without bound
+                while len(pending) > 100:
+                    send_times.pop(pending.popleft(), None)
+                next_send += FRAME_PERIOD
+                await asyncio.sleep(max(0.0, next_send - time.perf_counter()))
+
+            if rng.random() < args.drop_prob:
+                # Mid-stream drop: no close handshake, frames still in flight
+                ws.transport.abort()
+                churn.counters["drops"] += 1
+                return token
+            await ws.close()
+            churn.counters["clean_closes"] += 1
+            return None
+        finally:
+            receive_task.cancel()
+            try:
+                await receive_task
+            except (asyncio.CancelledError, websockets.ConnectionClosed):
+                pass
+
+
+async def client_loop(worker: int, url: str, audio: np.ndarray, churn: Churn, args, ssl_ctx, deadline: float):
+    rng = random.Random(args.seed * 1000 + worker)
+    resume = None
+    while time.monotonic() < deadline:
+        token = None
+        try:
+            token = await run_session(url, audio, rng, churn, args, ssl_ctx,
+                                      resume if resume and rng.random() < args.resume_prob else None)
+        except Exception as e:
+            churn.counters["failures"] += 1
+            churn.errors.append(f"{type(e).__name__}: {e}")
+        resume = token
+        await asyncio.sleep(rng.uniform(0, args.max_think))
+
+
+async def sampler(admin_url: str, churn: Churn, args, deadline: float, samples: list[dict]):
+    start = time.monotonic()
+    async with httpx.AsyncClient(verify=not args.insecure, timeout=10) as client:
+        with open(f"{args.out}.jsonl", "w") as log:
+            while True:
+                try:
+                    response = await client.get(admin_url)
+                    response.raise_for_status()
+                    server = response.json()
+                except Exception as e:
+                    churn.errors.append(f"sampler: {type(e).__name__}: {e}")
+                    server = None
+                latencies = churn.drain()
+                if server is not None:
+                    sample = {
+                        "t": round(time.monotonic() - start, 1),
+                        "server": server,
+                        "client": {
+                            "latency_p50_ms": _percentile(latencies, 50),
+                            "latency_p95_ms": _percentile(latencies, 95),
+                            "latency_p99_ms": _percentile(latencies, 99),
+                            "frames": len(latencies),
+                            **churn.counters,
+                        },
+                    }
+                    samples.append(sample)
+                    log.write(json.dumps(sample) + "\n")
+                    log.flush()
+                    print(f"t={sample['t']:>7.0f}s rss={server['rss_mb']:>8.1f}MB fds={server['open_fds']} "
+                          f"threads={server['threads']} tasks={server['asyncio_tasks']} "
+                          f"lag_max={server['event_loop_lag_ms']['max']:.1f}ms "
+                          f"p95={sample['client']['latency_p95_ms']}ms "
+                          f"connects={churn.counters['connects']} drops={churn.counters['drops']} "
+                          f"failures={churn.counters['failures']}")
+                if time.monotonic() >= deadline:
+                    return
+                await asyncio.sleep(min(args.sample_interval, max(0.0, deadline - time.monotonic())))
+
+
+def _percentile(values: list[float], q: float) -> float | None:
+    return round(float(np.percentile(values, q)), 2) if values else None
+
+
+def analyze(samples: list[dict], warmup: float, segments: int) -> dict:
+    """Per-series start/end level, slope per hour and monotonic-growth flag after the warmup share."""
+    steady = samples[int(len(samples) * warmup):]
+    trends = {}
+    for label, extract, tolerance in SERIES:
+        points = [(s["t"], extract(s)) for s in steady]
+        points = [(t, v) for t, v in points if v is not None]
+        if len(points) < segments:
+            continue
+        times = np.array([t for t, _ in points])
+        values = np.array([v for _, v in points], dtype=np.float64)
+        medians = [float(np.median(chunk)) for chunk in np.array_split(values, segments)]
+        growth = medians[-1] - medians[0]
+        slope = float(np.polyfit(times / 3600, values, 1)[0]) if np.ptp(times) > 0 else 0.0
+        monotonic = all(b >= a for a, b in zip(medians, medians[1:]))
+        trends[label] = {
+            "start": round(medians[0], 2),
+            "end": round(medians[-1], 2),
+            "growth": round(growth, 2),
+            "slope_per_hour": round(slope, 2),
+            "segment_medians": [round(m, 2) for m in medians],
+            "flagged": monotonic and growth > max(tolerance, RELATIVE_TOLERANCE * abs(medians[0])),
+        }
+    return trends
+
+
+async def main_async(args) -> int:
+    ssl_ctx = None
+    if args.url.startswith("wss://"):
+        ssl_ctx = ssl.create_default_context()
+        if args.insecure:
+            ssl_ctx.check_hostname = False
+            ssl_ctx.verify_mode = ssl.CERT_NONE
+    parts = urlsplit(args.url)
+    admin_url = args.admin_url or urlunsplit(
+        ("https" if parts.scheme == "wss" else "http", parts.netloc, "/api/admin/runtime", "", ""))
+
+    audio = load_audio(args.wav, 30.0)
+    churn = Churn()
+    samples: list[dict] = []
+    deadline = time.monotonic() + args.duration
+    clients = [asyncio.create_task(client_loop(i, args.url, audio, churn, args, ssl_ctx, deadline))
+               for i in range(args.clients)]
+    await sampler(admin_url, churn, args, deadline, samples)
+    await asyncio.gather(*clients)
+
+    trends = analyze(samples, args.warmup, args.segments)
+    flagged = [label for label, trend in trends.items() if trend["flagged"]]
+    report = {
+        "url": args.url,
+        "duration_s": args.duration,
+        "clients": args.clients,
+        "samples": len(samples),
+        "churn": churn.counters,
+        "errors": list(churn.errors),
+        "trends": trends,
+        "flagged": flagged,
+    }
+    with open(f"{args.out}.json", "w") as f:
+        json.dump(report, f, indent=2)
+
+    print(f"\n{'series':>22} {'start':>10} {'end':>10} {'slope/h':>10}  flagged")
+    for label, trend in trends.items():
+        print(f"{label:>22} {trend['start']:>10} {trend['end']:>10} {trend['slope_per_hour']:>10}  "
+              f"{'MONOTONIC GROWTH' if trend['flagged'] else '-'}")
+    print(f"\nChurn: {json.dumps(churn.counters)}")
+    print(f"{'Flagged: ' + ', '.join(flagged) if flagged else 'No monotonic growth detected'} "
+          f"(samples: {args.out}.jsonl, report: {args.out}.json)")
+    return 1 if flagged else 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="ws://localhost:8000/ws")
+    parser.add_argument("--admin-url", default=None, help="Runtime endpoint (default: derived from --url)")
+    parser.add_argument("--duration", type=float, default=3600.0, help="Seconds to run")
+    parser.add_argument("--clients", type=int, default=4, help="Concurrent client loops")
+    parser.add_argument("--sample-interval", type=float, default=10.0, help="Seconds between samples")
+    parser.add_argument("--min-session", type=float, default=2.0, help="Shortest session (seconds of audio)")
+    parser.add_argument("--max-session", type=float, default=30.0, help="Longest session (seconds of audio)")
+    parser.add_argument("--config-change-rate", type=float, default=0.05, help="Config changes per second")
+    parser.add_argument("--pause-rate", type=float, default=0.03, help="Idle pauses per second")
+    parser.add_argument("--max-pause", type=float, default=3.0, help="Longest idle pause (seconds)")
+    parser.add_argument("--drop-prob", type=float, default=0.4, help="Share of sessions dropped mid-stream")
+    parser.add_argument("--resume-prob", type=float, default=0.5, help="Share of drops resumed on reconnect")
+    parser.add_argument("--max-think", type=float, default=2.0, help="Longest pause between sessions")
+    parser.add_argument("--priorities", default="premium,standard,internal",
+                        type=lambda s: s.split(","), help="Comma-separated tiers to pick from")
+    parser.add_argument("--admission-timeout", type=float, default=120.0, help="Give up waiting for a slot")
+    parser.add_argument("--delay-frames", type=int, default=2, help="Engine output delay in frames (excluded from latency)")
+    parser.add_argument("--wav", default=None, help="Mono 16-bit 24 kHz WAV (default: synthetic)")
+    parser.add_argument("--warmup", type=float, default=0.1, help="Share of samples ignored by the trend check")
+    parser.add_argument("--segments", type=int, default=5, help="Segments compared by the trend check")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--insecure", action="store_true", help="Skip TLS verification (self-signed certs)")
+    parser.add_argument("--out", default="soak_report", help="Output path prefix for .jsonl/.json")
+    sys.exit(asyncio.run(main_async(parser.parse_args())))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,100 @@
+"""
+Batched prompt prefill through PersonaPlexWrapper.prefill_batch on the tiny
+CPU model (tiny_model.py), which runs moshi-personaplex's system-prompt
+segments and exec mask: every batched row must produce exactly the audio the
+same prompt produces when prefilled alone.
+
+Usage:
+    python -m pytest backend/devtools/test_batched_prefill.py
+    python backend/devtools/test_batched_prefill.py
+"""
+
+import os
+import sys
+
+os.environ.setdefault("ENGINE_BACKEND", "mock")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+import torch
+
+from backend.app.services.streaming_state import detach_streaming_state, split_streaming_state
+from backend.app.services.tiny_model import build_tiny_wrapper
+
+PERSONAS = ["You enjoy having a good conversation.", "Chat.", "You enjoy having a good conversation.",
+            "You are a wise and friendly teacher.", ""]
+
+
+def _prompts(wrapper) -> list[dict]:
+    generator = torch.Generator().manual_seed(1)
+    voices = {name: torch.randn(length, wrapper.lm.dim, generator=generator) for name, length in
+              (("NATF0", 3), ("NATM1", 5))}
+    prompts = []
+    for i, persona in enumerate(PERSONAS):
+        name = ("NATF0", "NATM1", None)[i % 3]
+        prompts.append({
+            "voice_prompt": name,
+            "voice_prompt_audio": None,
+            "voice_prompt_embeddings": voices[name].clone() if name else None,
+            "voice_prompt_cache": None,
+            "text_prompt_tokens": wrapper.text_tokenizer.encode(persona) if persona else None,
+        })
+    return prompts
+
+
+def _run(wrapper, state, frames: list[torch.Tensor]) -> list[torch.Tensor | None]:
+    wrapper.set_state(state)
+    return [wrapper.process(frame) for frame in frames]
+
+
+def test_batched_prefill_matches_serial():
+    wrapper = build_tiny_wrapper(seed=0)
+    assert wrapper.batched_prefill
+    prompts = _prompts(wrapper)
+    serial = []
+    for prompt in prompts:
+        for name, value in prompt.items():
+            setattr(wrapper.lm_gen, name, value)
+        wrapper.prefill()
+        serial.append(wrapper.get_state())
+    before = wrapper.prompt_state()
+
+    batched = wrapper.prefill_batch(prompts)
+
+    assert wrapper.lm_gen._streaming_state.batch_size == 1
+    assert all(wrapper.prompt_state()[name] is value for name, value in before.items())
+    generator = torch.Generator().manual_seed(2)
+    frames = [0.1 * torch.randn(1, 1, wrapper.frame_size, generator=generator) for _ in range(6)]
+    for alone, row in zip(serial, batched):
+        assert row["lm_gen"][""].batch_size == 1
+        for x, y in zip(_run(wrapper, alone, frames), _run(wrapper, row, frames)):
+            assert (x is None and y is None) or torch.equal(x, y)
+
+
+class _KVCache:
+    """Plain tensor holder with the batch in the second dimension (as moshi's RingKVCache)."""
+
+    def __init__(self, batch_size: int):
+        self.capacity = 4
+        self.cache = torch.arange(2 * batch_size * 4, dtype=torch.float32).view(2, batch_size, 4)
+        self.end_offset = torch.arange(batch_size)
+
+
+class _Holder:
+    def __init__(self, batch_size: int):
+        self._streaming_state = _KVCache(batch_size)
+
+
+def test_split_follows_batch_one_shapes():
+    single = detach_streaming_state(_Holder(1))
+    rows = split_streaming_state(_Holder(3), single, 3)
+    assert len(rows) == 3
+    for index, row in enumerate(rows):
+        cache = row[""]
+        assert cache.cache.shape == (2, 1, 4) and cache.end_offset.tolist() == [index]
+        assert torch.equal(cache.cache, _KVCache(3).cache[:, index:index + 1])
+
+
+if __name__ == "__main__":
+    test_batched_prefill_matches_serial()
+    test_split_follows_batch_one_shapes()
+    print("Batched prefill matches serial prefill.")
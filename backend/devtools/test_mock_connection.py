@@ -10,6 +10,10 @@ async def test_connection():
         async with websockets.connect(uri) as websocket:
             print("Connected!")
             
+            # 0. Session handshake (resume token)
+            session = json.loads(await websocket.recv())
+            print(f"Session: {session}")
+            
             # 1. Send Config
             config = {
                 "type": "config",
@@ -20,8 +24,9 @@ async def test_connection():
             print("Sent Config.")
             
             # 2. Send Mock Audio
-            # Generate 1024 bytes of dummy audio
-            dummy_audio = np.random.bytes(1024)
+            # The server aggregates input into whole frames (1920 float32 samples)
+            # before replying, so send exactly one frame of low-volume noise.
+            dummy_audio = np.random.uniform(-0.1, 0.1, 1920).astype(np.float32).tobytes()
             await websocket.send(dummy_audio)
             print("Sent Audio Chunk.")
             
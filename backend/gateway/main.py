@@ -0,0 +1,147 @@
+"""
+Load-aware gateway in front of several backend nodes (backend/app/main.py).
+
+Clients connect to the gateway exactly as they would to a node (/ws,
+/ws/codes, `?resume=`). Each new session is placed on the least-loaded ready
+node (see nodes.py) and proxied frame by frame: binary messages are forwarded
+as-is without parsing or re-framing, and per-message compression is off on
+the upstream leg. Resumed sessions go back to the node that owns their token.
+When no node can take a session the client is closed with 1013 (try again
+later).
+
+Admin API:
+    GET  /gateway/nodes                 node states, load and proxied sessions
+    POST /gateway/nodes/{name}/drain    stop placing new sessions on a node
+    POST /gateway/nodes/{name}/undrain  put it back in rotation
+
+Usage:
+    GATEWAY_NODES=http://gpu1:8000,http://gpu2:8000 uvicorn backend.gateway.main:app --port 9000
+"""
+
+import asyncio
+import json
+import logging
+import ssl
+from contextlib import asynccontextmanager
+
+import websockets
+from fastapi import FastAPI, HTTPException, WebSocket, WebSocketDisconnect
+
+from backend.gateway.nodes import NodePool
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger("PersonaPlex-Gateway")
+
+pool = NodePool()
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    await pool.poll_once()
+    pool.start()
+    yield
+    await pool.stop()
+
+
+app = FastAPI(title="PersonaPlex Gateway", lifespan=lifespan)
+
+
+async def _pump_to_node(client: WebSocket, upstream):
+    while True:
+        message = await client.receive()
+        if message["type"] == "websocket.disconnect":
+            return
+        if message.get("bytes") is not None:
+            await upstream.send(message["bytes"])
+        elif message.get("text") is not None:
+            await upstream.send(message["text"])
+
+
+async def _pump_to_client(upstream, client: WebSocket, node):
+    async for message in upstream:
+        if isinstance(message, bytes):
+            await client.send_bytes(message)
+            continue
+        # Only text (control) messages are inspected: remember which node owns the session
+        if '"session"' in message:
+            data = json.loads(message)
+            if data.get("type") == "session":
+                pool.remember(data["token"], node)
+        await client.send_text(message)
+
+
+async def proxy(client: WebSocket):
+    await client.accept()
+    node = pool.pick(client.query_params.get("resume"))
+    if node is None:
+        logger.warning("No node available; rejecting session")
+        await client.close(code=1013)  # Try again later
+        return
+
+    node.proxied += 1
+    node.placed += 1
+    close_code = 1000
+    url = node.ws_url(client.url.path, client.url.query)
+    try:
+        async with websockets.connect(url, max_size=None, compression=None, open_timeout=10,
+                                      ssl=_insecure_ssl() if url.startswith("wss") else None) as upstream:
+            tasks = [
+                asyncio.create_task(_pump_to_node(client, upstream)),
+                asyncio.create_task(_pump_to_client(upstream, client, node)),
+            ]
+            try:
+                await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+            finally:
+                for task in tasks:
+                    task.cancel()
+            # Pass the node's close code through (e.g. 1012 when it drains a replica)
+            close_code = upstream.close_code or 1000
+    except WebSocketDisconnect:
+        pass
+    except Exception as e:
+        logger.error(f"Proxy to {node.name} failed: {e!r}")
+        close_code = 1011
+    finally:
+        node.proxied -= 1
+    try:
+        await client.close(code=close_code)
+    except Exception:
+        pass
+
+
+def _insecure_ssl():
+    # Nodes typically run with self-signed certificates (certs/)
+    ctx = ssl.create_default_context()
+    ctx.check_hostname = False
+    ctx.verify_mode = ssl.CERT_NONE
+    return ctx
+
+
+@app.websocket("/ws")
+async def websocket_proxy(websocket: WebSocket):
+    await proxy(websocket)
+
+
+@app.websocket("/ws/codes")
+async def codes_websocket_proxy(websocket: WebSocket):
+    await proxy(websocket)
+
+
+@app.get("/gateway/nodes")
+async def node_status():
+    return pool.status()
+
+
+@app.post("/gateway/nodes/{name}/drain")
+async def drain_node(name: str):
+    """Stop placing new sessions on a node; its live sessions continue until they end."""
+    if name not in pool.nodes:
+        raise HTTPException(status_code=404, detail=f"Unknown node: {name}")
+    return pool.set_draining(name, True).describe()
+
+
+@app.post("/gateway/nodes/{name}/undrain")
+async def undrain_node(name: str):
+    if name not in pool.nodes:
+        raise HTTPException(status_code=404, detail=f"Unknown node: {name}")
+    return pool.set_draining(name, False).describe()
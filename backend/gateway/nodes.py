@@ -0,0 +1,148 @@
+"""
+Backend node registry for the gateway.
+
+Each node is polled on GET /api/admin/load. A node only receives new
+sessions while it is reachable, reports ready, is not loading a model and is
+not being drained. Among those the least-loaded one wins, where load is the
+node's session count (the higher of what it reports and what the gateway is
+proxying to it right now) relative to its advertised capacity.
+"""
+
+import asyncio
+import logging
+import time
+from urllib.parse import urlsplit, urlunsplit
+
+import httpx
+
+from backend.app.core.config import GATEWAY_NODES, GATEWAY_POLL_INTERVAL, GATEWAY_NODE_TIMEOUT
+
+logger = logging.getLogger("PersonaPlex-Gateway")
+
+MAX_TOKENS = 10000  # Resume tokens remembered for sticky routing
+
+
+class Node:
+    def __init__(self, url: str):
+        self.url = url.rstrip("/")
+        self.name = urlsplit(self.url).netloc
+        self.state = "unknown"  # "unknown", "ready", "loading" or "down"
+        self.draining = False
+        self.reported_sessions = 0
+        self.max_sessions: int | None = None
+        self.proxied = 0  # Sessions the gateway is proxying to this node right now
+        self.placed = 0  # Total sessions placed here
+        self.last_poll: float | None = None
+        self.error: str | None = None
+
+    @property
+    def available(self) -> bool:
+        return self.state == "ready" and not self.draining and not self.full
+
+    @property
+    def sessions(self) -> int:
+        return max(self.reported_sessions, self.proxied)
+
+    @property
+    def full(self) -> bool:
+        return self.max_sessions is not None and self.sessions >= self.max_sessions
+
+    @property
+    def load(self) -> float:
+        return self.sessions / self.max_sessions if self.max_sessions else float(self.sessions)
+
+    def ws_url(self, path: str, query: str) -> str:
+        scheme, netloc = urlsplit(self.url)[:2]
+        return urlunsplit(("wss" if scheme == "https" else "ws", netloc, path, query, ""))
+
+    def describe(self) -> dict:
+        return {
+            "name": self.name,
+            "url": self.url,
+            "state": self.state,
+            "draining": self.draining,
+            "sessions": self.sessions,
+            "proxied": self.proxied,
+            "max_sessions": self.max_sessions,
+            "load": round(self.load, 3),
+            "placed": self.placed,
+            "last_poll_age_s": round(time.monotonic() - self.last_poll, 1) if self.last_poll else None,
+            "error": self.error,
+        }
+
+
+class NodePool:
+    """Polls the backend nodes and places new sessions on the least-loaded ready one."""
+
+    def __init__(self, urls: list[str] = GATEWAY_NODES, poll_interval: float = GATEWAY_POLL_INTERVAL,
+                 timeout: float = GATEWAY_NODE_TIMEOUT):
+        self.nodes = {node.name: node for node in map(Node, urls)}
+        self.poll_interval = poll_interval
+        self.timeout = timeout
+        self._tokens: dict[str, Node] = {}  # Resume token -> node that owns the session
+        self._task: asyncio.Task | None = None
+
+    # --- Polling ---
+
+    async def _poll_node(self, client: httpx.AsyncClient, node: Node):
+        try:
+            response = await client.get(f"{node.url}/api/admin/load", timeout=self.timeout)
+            response.raise_for_status()
+            load = response.json()
+        except Exception as e:
+            if node.state != "down":
+                logger.warning(f"Node {node.name} down: {e!r}")
+            node.state, node.error = "down", repr(e)
+            return
+        node.state = "loading" if load.get("loading") or not load.get("ready") else "ready"
+        node.reported_sessions = load.get("sessions", 0)
+        node.max_sessions = load.get("max_sessions")
+        node.last_poll = time.monotonic()
+        node.error = None
+
+    async def poll_once(self):
+        async with httpx.AsyncClient(verify=False) as client:
+            await asyncio.gather(*(self._poll_node(client, node) for node in self.nodes.values()))
+
+    async def _poll_forever(self):
+        while True:
+            await self.poll_once()
+            await asyncio.sleep(self.poll_interval)
+
+    def start(self):
+        self._task = asyncio.create_task(self._poll_forever())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+
+    # --- Placement ---
+
+    def pick(self, resume_token: str | None = None) -> Node | None:
+        """Node for a new connection: the resumed session's node if usable, else the least loaded."""
+        if resume_token:
+            node = self._tokens.get(resume_token)
+            if node is not None and node.state == "ready":
+                return node
+        candidates = [node for node in self.nodes.values() if node.available]
+        if not candidates:
+            return None
+        return min(candidates, key=lambda node: (node.load, node.placed))
+
+    def remember(self, token: str, node: Node):
+        if len(self._tokens) >= MAX_TOKENS:
+            self._tokens.pop(next(iter(self._tokens)))
+        self._tokens[token] = node
+
+    def set_draining(self, name: str, draining: bool) -> Node:
+        node = self.nodes[name]
+        node.draining = draining
+        logger.info(f"Node {name} {'draining' if draining else 'back in rotation'}")
+        return node
+
+    def status(self) -> dict:
+        return {
+            "nodes": [node.describe() for node in self.nodes.values()],
+            "available": sum(node.available for node in self.nodes.values()),
+            "sessions": sum(node.proxied for node in self.nodes.values()),
+        }
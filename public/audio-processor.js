@@ -1,10 +1,34 @@
+// Batches the 128-sample render quanta into whole model frames (1920 samples
+// = 80 ms at 24 kHz) so the socket carries ~12.5 messages/s instead of ~190.
+const DEFAULT_FRAME_SIZE = 1920;
+
 class AudioProcessor extends AudioWorkletProcessor {
+    constructor(options) {
+        super();
+        const opts = (options && options.processorOptions) || {};
+        this.frameSize = opts.frameSize || DEFAULT_FRAME_SIZE;
+        this.frame = new Float32Array(this.frameSize);
+        this.offset = 0;
+    }
+
     process(inputs, outputs, parameters) {
         const input = inputs[0];
         if (input && input.length > 0) {
             const inputChannel = input[0];
-            // Post raw float32 data to the main React thread
-            this.port.postMessage(inputChannel);
+            let read = 0;
+            while (read < inputChannel.length) {
+                const count = Math.min(this.frameSize - this.offset, inputChannel.length - read);
+                this.frame.set(inputChannel.subarray(read, read + count), this.offset);
+                this.offset += count;
+                read += count;
+
+                if (this.offset === this.frameSize) {
+                    // Transfer the full frame to the main React thread (zero-copy)
+                    this.port.postMessage(this.frame, [this.frame.buffer]);
+                    this.frame = new Float32Array(this.frameSize);
+                    this.offset = 0;
+                }
+            }
         }
         return true;
     }
@@ -0,0 +1,144 @@
+// Playback worklet: ring-buffered output with an adaptive jitter buffer.
+//
+// Audio reaches the ring buffer either through a SharedArrayBuffer written by
+// the main thread (when the page is cross-origin isolated) or through port
+// messages copied into a local ring. Control words in the shared case:
+//   control[0] = write index (samples, modulo 2 * capacity)
+//   control[1] = read index  (samples, modulo 2 * capacity)
+// Indices wrap at twice the ring size, so they never overflow the Int32
+// control words and write - read still tells a full ring from an empty one.
+//
+// The target buffer depth adapts to measured arrival jitter (RFC 3550 style
+// estimator): it grows immediately on underruns/jitter spikes and shrinks
+// slowly by dropping 1 of every SKIP_INTERVAL samples while over target.
+const WRITE = 0;
+const READ = 1;
+const SKIP_INTERVAL = 64;
+const REPORT_INTERVAL_S = 1.0;
+
+class PlaybackProcessor extends AudioWorkletProcessor {
+    constructor(options) {
+        super();
+        const opts = (options && options.processorOptions) || {};
+        this.minTarget = Math.round((opts.minTargetMs || 40) * sampleRate / 1000);
+        this.maxTarget = Math.round((opts.maxTargetMs || 400) * sampleRate / 1000);
+        this.target = Math.round((opts.initialTargetMs || 80) * sampleRate / 1000);
+
+        if (opts.sharedData && opts.sharedControl) {
+            this.data = new Float32Array(opts.sharedData);
+            this.control = new Int32Array(opts.sharedControl);
+            this.shared = true;
+        } else {
+            this.data = new Float32Array(opts.capacity || sampleRate * 2);
+            this.control = new Int32Array(2);
+            this.shared = false;
+            this.port.onmessage = (event) => this.write(event.data);
+        }
+        this.capacity = this.data.length;
+        this.wrap = 2 * this.capacity;
+
+        this.playing = false;
+        this.skipCounter = 0;
+        this.lastWrite = 0;
+        this.lastArrival = -1;
+        this.jitter = 0; // samples
+
+        this.underruns = 0;
+        this.underrunSamples = 0;
+        this.droppedSamples = 0;
+        this.lastReport = currentTime;
+    }
+
+    // Port mode only: copy a chunk into the local ring.
+    write(chunk) {
+        let w = this.control[WRITE];
+        const free = this.capacity - this.distance(w, this.control[READ]);
+        const count = Math.min(chunk.length, free);
+        for (let i = 0; i < count; i++) {
+            this.data[(w + i) % this.capacity] = chunk[i];
+        }
+        this.control[WRITE] = (w + count) % this.wrap;
+    }
+
+    // Samples from index b to index a (both modulo 2 * capacity).
+    distance(a, b) {
+        return (a - b + this.wrap) % this.wrap;
+    }
+
+    observeArrivals(writeIndex) {
+        if (writeIndex === this.lastWrite) return;
+        const now = currentTime * sampleRate;
+        if (this.lastArrival >= 0) {
+            const transit = (now - this.lastArrival) - this.distance(writeIndex, this.lastWrite);
+            this.jitter += (Math.abs(transit) - this.jitter) / 16;
+        }
+        this.lastArrival = now;
+        this.lastWrite = writeIndex;
+
+        // Target: minimum depth plus two jitter deviations. Grow immediately,
+        // decay by at most one sample per render quantum.
+        const wanted = Math.min(this.maxTarget, Math.max(this.minTarget, Math.round(this.minTarget + 2 * this.jitter)));
+        if (wanted > this.target) {
+            this.target = wanted;
+        } else {
+            this.target = Math.max(wanted, this.target - 1);
+        }
+    }
+
+    process(inputs, outputs) {
+        const out = outputs[0][0];
+        const writeIndex = this.shared ? Atomics.load(this.control, WRITE) : this.control[WRITE];
+        let readIndex = this.shared ? Atomics.load(this.control, READ) : this.control[READ];
+        this.observeArrivals(writeIndex);
+
+        let available = this.distance(writeIndex, readIndex);
+        if (!this.playing && available >= this.target) {
+            this.playing = true;
+        }
+
+        let i = 0;
+        if (this.playing) {
+            const shrink = available > this.target * 1.5;
+            while (i < out.length && available > 0) {
+                if (shrink && ++this.skipCounter % SKIP_INTERVAL === 0 && available > 1) {
+                    readIndex = (readIndex + 1) % this.wrap;
+                    available--;
+                    this.droppedSamples++;
+                }
+                out[i++] = this.data[readIndex % this.capacity];
+                readIndex = (readIndex + 1) % this.wrap;
+                available--;
+            }
+            if (i < out.length) {
+                // Underrun: re-buffer and grow the target.
+                this.underruns++;
+                this.underrunSamples += out.length - i;
+                this.playing = false;
+                this.target = Math.min(this.maxTarget, this.target + Math.round(0.02 * sampleRate));
+            }
+        }
+        out.fill(0, i);
+        for (let ch = 1; ch < outputs[0].length; ch++) outputs[0][ch].set(out);
+
+        if (this.shared) {
+            Atomics.store(this.control, READ, readIndex);
+        } else {
+            this.control[READ] = readIndex;
+        }
+
+        if (currentTime - this.lastReport >= REPORT_INTERVAL_S) {
+            this.lastReport = currentTime;
+            this.port.postMessage({
+                type: 'stats',
+                bufferMs: 1000 * this.distance(writeIndex, readIndex) / sampleRate,
+                targetMs: 1000 * this.target / sampleRate,
+                jitterMs: 1000 * this.jitter / sampleRate,
+                underruns: this.underruns,
+                underrunMs: 1000 * this.underrunSamples / sampleRate,
+                droppedMs: 1000 * this.droppedSamples / sampleRate,
+            });
+        }
+        return true;
+    }
+}
+registerProcessor('playback-processor', PlaybackProcessor);
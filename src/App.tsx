@@ -17,6 +17,7 @@ function App() {
         inputVolume,
         outputVolume,
         error,
+        queue,
         connect,
         disconnect,
         startMic,
@@ -67,6 +68,7 @@ function App() {
                     isConnected={isConnected}
                     toggleConnection={handleToggleConnection}
                     error={error}
+                    queue={queue}
                 />
 
                 <SettingsCard
@@ -0,0 +1,105 @@
+// Per-frame seq/timestamp header (see backend/app/services/frame_header.py).
+//
+// Negotiated with `frameHeader: true` in the config message and switched on
+// when the server acknowledges it with a `configured` message. Client frames
+// carry [u32 seq, f64 captureTs]; server frames echo them followed by the
+// server receive/compute/send timestamps. All little-endian, times in ms.
+
+export const CLIENT_HEADER_BYTES = 12;
+export const SERVER_HEADER_BYTES = 44;
+
+// How often collected samples are posted to the server
+const REPORT_INTERVAL_MS = 5000;
+const MAX_SAMPLES = 1000;
+
+export interface ServerFrame {
+    seq: number;
+    captureTs: number;
+    serverRecv: number;
+    computeStart: number;
+    computeEnd: number;
+    serverSend: number;
+    pcm: Float32Array;
+}
+
+export const wallClockMs = () => performance.timeOrigin + performance.now();
+
+export const encodeClientFrame = (seq: number, pcm: Float32Array): ArrayBuffer => {
+    const buffer = new ArrayBuffer(CLIENT_HEADER_BYTES + pcm.byteLength);
+    const view = new DataView(buffer);
+    view.setUint32(0, seq, true);
+    view.setFloat64(4, wallClockMs(), true);
+    new Float32Array(buffer, CLIENT_HEADER_BYTES).set(pcm);
+    return buffer;
+};
+
+export const decodeServerFrame = (buffer: ArrayBuffer): ServerFrame => {
+    const view = new DataView(buffer);
+    return {
+        seq: view.getUint32(0, true),
+        captureTs: view.getFloat64(4, true),
+        serverRecv: view.getFloat64(12, true),
+        computeStart: view.getFloat64(20, true),
+        computeEnd: view.getFloat64(28, true),
+        serverSend: view.getFloat64(36, true),
+        pcm: new Float32Array(buffer, SERVER_HEADER_BYTES),
+    };
+};
+
+type Metric = 'rttMs' | 'networkMs' | 'serverMs' | 'computeMs' | 'playoutMs' | 'endToEndMs';
+
+// Collects the per-frame breakdown and posts it to /api/admin/latency/frames
+// so the server can compute fleet-wide percentiles.
+export class FrameLatencyReporter {
+    private samples: Record<Metric, number[]> = {
+        rttMs: [], networkMs: [], serverMs: [], computeMs: [], playoutMs: [], endToEndMs: [],
+    };
+    private timer: number;
+
+    constructor(private endpoint: string) {
+        this.timer = window.setInterval(() => this.flush(), REPORT_INTERVAL_MS);
+    }
+
+    // playoutMs: audio queued ahead of this frame plus the device output latency
+    record(frame: ServerFrame, playoutMs: number) {
+        const rtt = wallClockMs() - frame.captureTs;
+        const server = frame.serverSend - frame.serverRecv;
+        this.push('rttMs', rtt);
+        this.push('serverMs', server);
+        this.push('computeMs', frame.computeEnd - frame.computeStart);
+        this.push('networkMs', rtt - server);
+        this.push('playoutMs', playoutMs);
+        this.push('endToEndMs', rtt + playoutMs);
+    }
+
+    private push(metric: Metric, value: number) {
+        const values = this.samples[metric];
+        if (values.length < MAX_SAMPLES) values.push(value);
+    }
+
+    flush() {
+        if (this.samples.rttMs.length === 0) return;
+        const body = JSON.stringify(this.samples);
+        for (const values of Object.values(this.samples)) values.length = 0;
+        fetch(this.endpoint, {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body,
+            keepalive: true,
+        }).catch(() => { /* Telemetry is best-effort */ });
+    }
+
+    stop() {
+        window.clearInterval(this.timer);
+        this.flush();
+    }
+}
+
+// ws(s)://host/ws -> http(s)://host/api/admin/latency/frames
+export const latencyReportUrl = (wsUrl: string) => {
+    const url = new URL(wsUrl);
+    url.protocol = url.protocol === 'wss:' ? 'https:' : 'http:';
+    url.pathname = '/api/admin/latency/frames';
+    url.search = '';
+    return url.toString();
+};
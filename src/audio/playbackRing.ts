@@ -0,0 +1,91 @@
+// Main-thread side of the playback worklet (public/playback-processor.js).
+//
+// When the page is cross-origin isolated the ring buffer lives in a
+// SharedArrayBuffer and received audio is written straight into it without
+// posting messages. Otherwise chunks are transferred to the worklet's local ring.
+
+const WRITE = 0;
+const READ = 1;
+
+export interface PlayoutStats {
+    bufferMs: number;
+    targetMs: number;
+    jitterMs: number;
+    underruns: number;
+    underrunMs: number;
+    droppedMs: number;
+}
+
+export interface PlaybackOptions {
+    capacitySeconds?: number;
+    minTargetMs?: number;
+    maxTargetMs?: number;
+    initialTargetMs?: number;
+}
+
+export class PlaybackRing {
+    readonly node: AudioWorkletNode;
+    readonly shared: boolean;
+    overflowSamples = 0;
+    private data: Float32Array | null = null;
+    private control: Int32Array | null = null;
+
+    constructor(ctx: AudioContext, options: PlaybackOptions = {}) {
+        const capacity = Math.round(ctx.sampleRate * (options.capacitySeconds ?? 2));
+        this.shared = typeof SharedArrayBuffer !== 'undefined' && window.crossOriginIsolated;
+
+        let sharedData: SharedArrayBuffer | undefined;
+        let sharedControl: SharedArrayBuffer | undefined;
+        if (this.shared) {
+            sharedData = new SharedArrayBuffer(capacity * Float32Array.BYTES_PER_ELEMENT);
+            sharedControl = new SharedArrayBuffer(2 * Int32Array.BYTES_PER_ELEMENT);
+            this.data = new Float32Array(sharedData);
+            this.control = new Int32Array(sharedControl);
+        }
+
+        this.node = new AudioWorkletNode(ctx, 'playback-processor', {
+            numberOfInputs: 0,
+            outputChannelCount: [1],
+            processorOptions: {
+                capacity,
+                sharedData,
+                sharedControl,
+                minTargetMs: options.minTargetMs,
+                maxTargetMs: options.maxTargetMs,
+                initialTargetMs: options.initialTargetMs,
+            },
+        });
+    }
+
+    push(chunk: Float32Array) {
+        if (!this.data || !this.control) {
+            this.node.port.postMessage(chunk, [chunk.buffer]);
+            return;
+        }
+
+        // Indices wrap at 2 * capacity (see playback-processor.js)
+        const capacity = this.data.length;
+        const wrap = 2 * capacity;
+        const w = Atomics.load(this.control, WRITE);
+        const free = capacity - (w - Atomics.load(this.control, READ) + wrap) % wrap;
+        const count = Math.min(chunk.length, free);
+        this.overflowSamples += chunk.length - count;
+
+        const start = w % capacity;
+        const head = Math.min(count, capacity - start);
+        this.data.set(chunk.subarray(0, head), start);
+        this.data.set(chunk.subarray(head, count), 0);
+        Atomics.store(this.control, WRITE, (w + count) % wrap);
+    }
+
+    onStats(callback: (stats: PlayoutStats) => void) {
+        this.node.port.onmessage = (event) => {
+            if (event.data?.type === 'stats') callback(event.data as PlayoutStats);
+        };
+    }
+
+    disconnect() {
+        this.node.port.onmessage = null;
+        this.node.disconnect();
+    }
+}
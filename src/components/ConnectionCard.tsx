@@ -1,5 +1,6 @@
 import React from 'react';
 import { Server } from 'lucide-react';
+import { QueueStatus } from '../hooks/usePersonaAudio';
 
 interface ConnectionCardProps {
     serverUrl: string;
@@ -7,6 +8,7 @@ interface ConnectionCardProps {
     isConnected: boolean;
     toggleConnection: () => void;
     error: string | null;
+    queue?: QueueStatus | null;
 }
 
 export const ConnectionCard: React.FC<ConnectionCardProps> = ({
@@ -14,7 +16,8 @@ export const ConnectionCard: React.FC<ConnectionCardProps> = ({
     setServerUrl,
     isConnected,
     toggleConnection,
-    error
+    error,
+    queue
 }) => {
     return (
         <div className="bg-slate-800 rounded-xl p-6 border border-slate-700 shadow-xl">
@@ -46,6 +49,14 @@ export const ConnectionCard: React.FC<ConnectionCardProps> = ({
                 </button>
             </div>
 
+            {
+                queue && (
+                    <div className="mt-4 p-3 bg-amber-900/50 border border-amber-700/50 rounded-lg text-amber-200 text-xs text-center">
+                        Node busy: you are #{queue.position} in line (about {queue.etaSeconds}s)
+                    </div>
+                )
+            }
+
             {
                 error && (
                     <div className="mt-4 p-3 bg-red-900/50 border border-red-700/50 rounded-lg text-red-200 text-xs text-center">
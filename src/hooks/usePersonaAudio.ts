@@ -1,15 +1,32 @@
 import { useState, useRef, useCallback, useEffect } from 'react';
+import { PlaybackRing, PlayoutStats } from '../audio/playbackRing';
+import {
+    FrameLatencyReporter, decodeServerFrame, encodeClientFrame, latencyReportUrl,
+} from '../audio/frameHeader';
+
+// Model frame size: 80 ms at 24 kHz. The worklet batches mic audio to this size.
+const FRAME_SIZE = 1920;
+
+// Server keeps a dropped session resumable for this long (SESSION_RESUME_TTL)
+const RESUME_WINDOW_MS = 30000;
 
 export interface AudioConfig {
     persona: string;
     voice: string;
 }
 
+// Position in the server's admission queue while the node is at capacity
+export interface QueueStatus {
+    position: number;
+    etaSeconds: number;
+}
+
 export const usePersonaAudio = () => {
     // State
     const [isConnected, setIsConnected] = useState(false);
     const [isRecording, setIsRecording] = useState(false);
     const [error, setError] = useState<string | null>(null);
+    const [queue, setQueue] = useState<QueueStatus | null>(null);
     const [inputVolume, setInputVolume] = useState(0);
     const [outputVolume, setOutputVolume] = useState(0);
 
@@ -19,33 +36,43 @@ export const usePersonaAudio = () => {
     const workletNode = useRef<AudioWorkletNode | null>(null);
     const inputAnalyser = useRef<AnalyserNode | null>(null);
     const outputAnalyser = useRef<AnalyserNode | null>(null);
-    const nextStartTime = useRef(0);
+    const playback = useRef<PlaybackRing | null>(null);
+    const resumeToken = useRef<{ token: string; droppedAt: number } | null>(null);
+    const frameHeader = useRef(false);
+    // Config sent, server acknowledgement not yet received: mic frames are held back
+    const configPending = useRef(false);
+    const frameSeq = useRef(0);
+    const latencyReporter = useRef<FrameLatencyReporter | null>(null);
+    const playoutMs = useRef(0);
     const animationFrameId = useRef<number | null>(null);
 
     // --- AUDIO HELPERS ---
 
 
 
-    const playAudioChunk = (ctx: AudioContext, float32Data: Float32Array) => {
-        const buffer = ctx.createBuffer(1, float32Data.length, 24000);
-        buffer.getChannelData(0).set(float32Data);
+    const initPlayback = (ctx: AudioContext, ws: WebSocket) => {
+        const ring = new PlaybackRing(ctx);
 
-        const source = ctx.createBufferSource();
-        source.buffer = buffer;
+        outputAnalyser.current = ctx.createAnalyser();
+        outputAnalyser.current.fftSize = 64;
+        outputAnalyser.current.connect(ctx.destination);
+        ring.node.connect(outputAnalyser.current);
 
-        if (!outputAnalyser.current) {
-            outputAnalyser.current = ctx.createAnalyser();
-            outputAnalyser.current.fftSize = 64;
-            outputAnalyser.current.connect(ctx.destination);
-        }
-
-        source.connect(outputAnalyser.current);
-
-        const currentTime = ctx.currentTime;
-        const startTime = Math.max(currentTime, nextStartTime.current);
+        // Report playout health to the server for the latency dashboards
+        ring.onStats((stats: PlayoutStats) => {
+            if (ws.readyState !== WebSocket.OPEN) return;
+            const outputLatencyMs = 1000 * (ctx.outputLatency || ctx.baseLatency || 0);
+            playoutMs.current = stats.bufferMs + outputLatencyMs;
+            ws.send(JSON.stringify({
+                type: 'playout_stats',
+                ...stats,
+                outputLatencyMs,
+                playoutLatencyMs: stats.bufferMs + outputLatencyMs,
+                overflowMs: 1000 * ring.overflowSamples / ctx.sampleRate,
+            }));
+        });
 
-        source.start(startTime);
-        nextStartTime.current = startTime + buffer.duration;
+        playback.current = ring;
     };
 
     const initAudio = async () => {
@@ -53,8 +80,9 @@ export const usePersonaAudio = () => {
             // Requirement: Sample Rate 24000
             const ctx = new (window.AudioContext || (window as any).webkitAudioContext)({ sampleRate: 24000 });
 
-            // Load Worklet
+            // Load Worklets (mic capture + ring-buffered playback)
             await ctx.audioWorklet.addModule('/audio-processor.js');
+            await ctx.audioWorklet.addModule('/playback-processor.js');
 
             audioContext.current = ctx;
             return ctx;
@@ -118,29 +146,61 @@ export const usePersonaAudio = () => {
         const ctx = await initAudio();
         if (!ctx) return;
 
-        const ws = new WebSocket(url);
+        // Resume the previous session (no re-prefill) if it dropped recently
+        const resume = resumeToken.current;
+        const canResume = resume !== null && Date.now() - resume.droppedAt < RESUME_WINDOW_MS;
+        const ws = new WebSocket(canResume ? `${url}?resume=${encodeURIComponent(resume.token)}` : url);
+        ws.binaryType = 'arraybuffer';
         setError(null);
+        frameHeader.current = false;
+        configPending.current = false;
+        latencyReporter.current = new FrameLatencyReporter(latencyReportUrl(url));
+        initPlayback(ctx, ws);
 
         ws.onopen = () => {
             console.log("Connected to PersonaPlex Backend");
             setIsConnected(true);
-
-            ws.send(JSON.stringify({
-                type: 'config',
-                persona: config.persona,
-                voice: config.voice
-            }));
         };
 
-        ws.onmessage = async (event) => {
-            if (event.data instanceof Blob) {
-                const arrayBuffer = await event.data.arrayBuffer();
-                const float32Data = new Float32Array(arrayBuffer);
-                playAudioChunk(ctx, float32Data);
+        ws.onmessage = (event) => {
+            if (event.data instanceof ArrayBuffer) {
+                if (frameHeader.current) {
+                    const frame = decodeServerFrame(event.data);
+                    latencyReporter.current?.record(frame, playoutMs.current);
+                    playback.current?.push(frame.pcm);
+                } else {
+                    playback.current?.push(new Float32Array(event.data));
+                }
             } else {
                 try {
                     const data = JSON.parse(event.data);
                     console.log("Server Msg:", data);
+                    if (data.type === 'queued') {
+                        setQueue({ position: data.position, etaSeconds: data.etaSeconds });
+                    } else if (data.type === 'rejected') {
+                        setQueue(null);
+                        setError(`Server at capacity. Try again in ${data.retryAfter}s.`);
+                    }
+                    if (data.type === 'session') {
+                        setQueue(null);
+                        resumeToken.current = { token: data.token, droppedAt: Infinity };
+                        // A resumed session keeps its prompts, streaming state and header setting
+                        if (data.resumed) {
+                            frameHeader.current = data.frameHeader;
+                        } else {
+                            ws.send(JSON.stringify({
+                                type: 'config',
+                                persona: config.persona,
+                                voice: config.voice,
+                                frameHeader: true
+                            }));
+                            configPending.current = true;
+                        }
+                    } else if (data.type === 'configured') {
+                        // Server frames after this message (and ours from now on) use the negotiated format
+                        frameHeader.current = data.frameHeader;
+                        configPending.current = false;
+                    }
                 } catch (e) { }
             }
         };
@@ -159,14 +219,24 @@ export const usePersonaAudio = () => {
         socket.current = ws;
     };
 
-    const handleDisconnect = () => {
+    const handleDisconnect = (userInitiated = false) => {
+        if (resumeToken.current) {
+            resumeToken.current = userInitiated ? null : { ...resumeToken.current, droppedAt: Date.now() };
+        }
         setIsConnected(false);
         setIsRecording(false);
+        setQueue(null);
         stopMic();
 
         socket.current?.close();
         socket.current = null;
 
+        latencyReporter.current?.stop();
+        latencyReporter.current = null;
+
+        playback.current?.disconnect();
+        playback.current = null;
+
         audioContext.current?.close();
         audioContext.current = null;
 
@@ -175,7 +245,7 @@ export const usePersonaAudio = () => {
     };
 
     const disconnect = () => {
-        handleDisconnect();
+        handleDisconnect(true);
     };
 
     const startMic = async () => {
@@ -197,14 +267,18 @@ export const usePersonaAudio = () => {
             inputAnalyser.current.fftSize = 64;
             source.connect(inputAnalyser.current);
 
-            workletNode.current = new AudioWorkletNode(audioContext.current, 'audio-processor');
+            workletNode.current = new AudioWorkletNode(audioContext.current, 'audio-processor', {
+                processorOptions: { frameSize: FRAME_SIZE }
+            });
             source.connect(workletNode.current);
 
             workletNode.current.port.onmessage = (event) => {
-                if (socket.current?.readyState === WebSocket.OPEN) {
-                    const pcmData = event.data; // Float32Array
+                if (socket.current?.readyState === WebSocket.OPEN && !configPending.current) {
+                    const pcmData = event.data; // Float32Array, one full model frame
                     // Send as Float32 directly to match backend expectation
-                    socket.current.send(pcmData);
+                    socket.current.send(
+                        frameHeader.current ? encodeClientFrame(frameSeq.current++, pcmData) : pcmData
+                    );
                 }
             };
 
@@ -230,6 +304,7 @@ export const usePersonaAudio = () => {
         inputVolume,
         outputVolume,
         error,
+        queue,
         connect,
         disconnect,
         startMic,
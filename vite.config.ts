@@ -9,6 +9,11 @@ export default defineConfig({
         https: {
             key: './certs/key.pem',
             cert: './certs/cert.pem'
+        },
+        // Cross-origin isolation enables SharedArrayBuffer for the playback ring
+        headers: {
+            'Cross-Origin-Opener-Policy': 'same-origin',
+            'Cross-Origin-Embedder-Policy': 'require-corp'
         }
     }
 })